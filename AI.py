@@ -24,6 +24,14 @@ kitt_config = types.GenerateContentConfig(
 # List to manually maintain conversation history
 # Each element will be in format {"role": "user/model", "parts": [{"text": "..."}]}.
 conversation_history = []
+MAX_HISTORY_MESSAGES = 20 # Only the latest messages are kept (and sent), so long sessions do not grow without bound
+
+def trim_conversation_history(history, max_messages=MAX_HISTORY_MESSAGES):
+    """Drops the oldest messages beyond max_messages; the kept history still starts with a user message."""
+    if len(history) > max_messages:
+        del history[:len(history) - max_messages]
+    while history and history[0]["role"] != "user":
+        del history[0]
 
 print("KITT: Ready Michael. Awaiting your commands. (Type 'end' to exit)")
 
@@ -40,6 +48,7 @@ while True:
 
     # 1. Add user's message to history
     conversation_history.append({"role": "user", "parts": [{"text": user_input}]})
+    trim_conversation_history(conversation_history)
 
     try:
         # 2. Send request to API
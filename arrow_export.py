@@ -0,0 +1,260 @@
+# arrow_export.py
+#
+# Exports recorded runs (recorder.py) to Parquet or Arrow IPC files for bulk analysis
+# (see trajectory_analytics.py). Every run is one episode; all runs go to the same files:
+#   vehicles.<ext>  one row per AI vehicle per tick: run, tick, time_s, vehicle_id, kind, lane, position_m, speed_kmh
+#   kitt.<ext>      one row per tick: run, tick, time_s, lane, position_m, speed_kmh, damage, score, ai_vehicles
+#   events.<ext>    commands and simulation events: run, tick, time_s, kind, text, kitt_lane, kitt_position_m
+#   episodes.<ext>  one row per run: distance, score, damage, collisions, end reason, time to goal...
+# Recordings are read chunk by chunk and rows are written in row groups (record batches for
+# Arrow IPC) of at most ROW_GROUP_ROWS, so memory stays bounded however long the runs are.
+# Needs pyarrow and numpy (optional dependencies, only used here and in trajectory_analytics.py).
+#   python arrow_export.py runs/*.kittrec --out exports --format parquet
+
+import os
+
+try:
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError: # Export disabled; the rest of the simulation does not need these
+    np = pa = None
+
+from recorder import TrajectoryReader
+from vehicles import Car, Truck, Motorcycle
+
+FORMAT_EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow"}
+ROW_GROUP_ROWS = 256 * 1024 # Rows buffered per table before a row group is written
+PARQUET_COMPRESSION = "zstd"
+KIND_NAMES = {0: "Other", **{vehicle_class.kind_code: vehicle_class.__name__ for vehicle_class in (Car, Truck, Motorcycle)}}
+
+# Table columns: (name, pyarrow type name)
+TABLE_COLUMNS = {
+    "vehicles": [("run", "uint32"), ("tick", "uint32"), ("time_s", "float32"), ("vehicle_id", "uint32"),
+                 ("kind", "uint8"), ("lane", "uint8"), ("position_m", "float32"), ("speed_kmh", "float32")],
+    "kitt": [("run", "uint32"), ("tick", "uint32"), ("time_s", "float32"), ("lane", "uint8"), ("position_m", "float32"),
+             ("speed_kmh", "float32"), ("damage", "float32"), ("score", "int32"), ("ai_vehicles", "uint32")],
+    "events": [("run", "uint32"), ("tick", "uint32"), ("time_s", "float32"), ("kind", "string"), ("text", "string"),
+               ("kitt_lane", "uint8"), ("kitt_position_m", "float32")],
+    "episodes": [("run", "uint32"), ("run_name", "string"), ("source", "string"), ("road_length_m", "float32"),
+                 ("time_step_s", "float32"), ("ticks", "uint32"), ("duration_s", "float32"), ("distance_m", "float32"),
+                 ("final_score", "int32"), ("final_damage", "float32"), ("collisions", "uint32"), ("end_reason", "string"),
+                 ("time_to_goal_s", "float32"), ("mean_speed_kmh", "float32"), ("max_speed_kmh", "float32"),
+                 ("mean_ai_vehicles", "float32")],
+}
+
+
+def require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Arrow/Parquet export needs pyarrow and numpy (pip install pyarrow numpy)")
+
+
+def table_schema(table):
+    require_pyarrow()
+    return pa.schema([(name, getattr(pa, type_name)()) for name, type_name in TABLE_COLUMNS[table]])
+
+
+def table_path(directory, table, file_format="parquet"):
+    return os.path.join(directory, table + FORMAT_EXTENSIONS[file_format])
+
+
+class TableSink:
+    """Streams record batches of one table to a Parquet or Arrow IPC file in row groups of up to ROW_GROUP_ROWS."""
+    def __init__(self, path, schema, file_format="parquet", row_group_rows=ROW_GROUP_ROWS):
+        self.schema = schema
+        self.row_group_rows = int(row_group_rows)
+        self.rows_written = 0
+        self._pending = []
+        self._pending_rows = 0
+        if file_format == "parquet":
+            self._writer = pa.parquet.ParquetWriter(path, schema, compression=PARQUET_COMPRESSION)
+        else:
+            self._writer = pa.ipc.new_file(path, schema)
+
+    def write(self, columns):
+        """Appends one batch given as a list of arrays in schema order."""
+        batch = pa.record_batch(columns, schema=self.schema)
+        if not batch.num_rows:
+            return
+        self._pending.append(batch)
+        self._pending_rows += batch.num_rows
+        if self._pending_rows >= self.row_group_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        table = pa.Table.from_batches(self._pending, schema=self.schema).combine_chunks()
+        if isinstance(self._writer, pa.parquet.ParquetWriter):
+            self._writer.write_table(table, row_group_size=len(table))
+        else:
+            self._writer.write_table(table, max_chunksize=len(table))
+        self.rows_written += len(table)
+        self._pending = []
+        self._pending_rows = 0
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+
+class ArrowExporter:
+    """Writes any number of recorded runs to the tables of one export directory."""
+    def __init__(self, directory, file_format="parquet", row_group_rows=ROW_GROUP_ROWS):
+        require_pyarrow()
+        if file_format not in FORMAT_EXTENSIONS:
+            raise ValueError(f"Unknown format '{file_format}' (use {', '.join(FORMAT_EXTENSIONS)})")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.file_format = file_format
+        self.sinks = {table: TableSink(table_path(directory, table, file_format), table_schema(table), file_format, row_group_rows)
+                      for table in TABLE_COLUMNS if table != "episodes"}
+        self.episodes = {name: [] for name, _ in TABLE_COLUMNS["episodes"]} # One row per run: small, written at close
+        self.run_count = 0
+
+    def add_recording(self, recording_path, run_name=None):
+        """Exports one recording (TrajectoryRecorder file) as the next run. Returns its episode summary."""
+        run = self.run_count
+        run_name = run_name or os.path.splitext(os.path.basename(recording_path))[0]
+        with TrajectoryReader(recording_path) as reader:
+            header = reader.header
+            time_step_s = float(header["time_step_s"])
+            episode = _EpisodeSummary(float(header["road_length_m"]), time_step_s)
+            for first_tick, columns in reader.chunks():
+                self._add_chunk(run, time_step_s, first_tick, columns, episode)
+        summary = episode.finish(run, run_name, recording_path)
+        for name, value in summary.items():
+            self.episodes[name].append(value)
+        self.run_count += 1
+        return summary
+
+    def _add_chunk(self, run, time_step_s, first_tick, columns, episode):
+        row_offsets = np.frombuffer(columns["row_offsets"], dtype=np.uint32)
+        tick_count = len(row_offsets) - 1
+        ticks = np.arange(first_tick, first_tick + tick_count, dtype=np.uint32)
+        times = (ticks * time_step_s).astype(np.float32)
+        vehicles_per_tick = np.diff(row_offsets)
+
+        # Vehicle rows: each tick's rows follow the vehicle list it refers to (see recorder.py)
+        row_count = int(row_offsets[-1])
+        list_offsets = np.frombuffer(columns["list_offsets"], dtype=np.uint32)
+        list_refs = np.frombuffer(columns["list_refs"], dtype=np.uint32)
+        membership = np.frombuffer(columns["membership"], dtype=np.uint32)
+        row_starts = np.repeat(row_offsets[:-1], vehicles_per_tick)
+        refs = list_refs[np.repeat(list_offsets[membership], vehicles_per_tick) + (np.arange(row_count, dtype=np.uint32) - row_starts)]
+        self.sinks["vehicles"].write([
+            np.full(row_count, run, dtype=np.uint32), np.repeat(ticks, vehicles_per_tick), np.repeat(times, vehicles_per_tick),
+            np.frombuffer(columns["id_numbers"], dtype=np.uint32)[refs], np.frombuffer(columns["id_kinds"], dtype=np.uint8)[refs],
+            np.frombuffer(columns["lane"], dtype=np.uint8), np.frombuffer(columns["position"], dtype=np.float32),
+            np.frombuffer(columns["speed"], dtype=np.float32)])
+
+        kitt_lane = np.frombuffer(columns["kitt_lane"], dtype=np.uint8)
+        kitt_position = np.frombuffer(columns["kitt_position"], dtype=np.float32)
+        kitt_speed = np.frombuffer(columns["kitt_speed"], dtype=np.float32)
+        kitt_damage = np.frombuffer(columns["kitt_damage"], dtype=np.float32)
+        kitt_score = np.frombuffer(columns["kitt_score"], dtype=np.int32)
+        self.sinks["kitt"].write([np.full(tick_count, run, dtype=np.uint32), ticks, times, kitt_lane, kitt_position,
+                                  kitt_speed, kitt_damage, kitt_score, vehicles_per_tick])
+
+        event_ticks, event_kinds, event_texts = [], [], []
+        for tick, events in sorted(columns["events"].items()):
+            for kind, text in events:
+                event_ticks.append(tick)
+                event_kinds.append(kind)
+                event_texts.append(text)
+        event_ticks = np.array(event_ticks, dtype=np.uint32)
+        local_ticks = np.minimum(event_ticks - first_tick, tick_count - 1) # Commands may name the tick after the chunk
+        self.sinks["events"].write([np.full(len(event_ticks), run, dtype=np.uint32), event_ticks,
+                                    (event_ticks * time_step_s).astype(np.float32), pa.array(event_kinds, pa.string()),
+                                    pa.array(event_texts, pa.string()), kitt_lane[local_ticks], kitt_position[local_ticks]])
+        episode.add_chunk(first_tick, kitt_position, kitt_speed, kitt_damage, kitt_score, vehicles_per_tick, event_ticks, event_kinds)
+
+    def close(self):
+        """Writes the episode table and closes every file. Returns {table: rows written}."""
+        for sink in self.sinks.values():
+            sink.close()
+        episodes = pa.table(self.episodes, schema=table_schema("episodes"))
+        path = table_path(self.directory, "episodes", self.file_format)
+        if self.file_format == "parquet":
+            pa.parquet.write_table(episodes, path, compression=PARQUET_COMPRESSION)
+        else:
+            with pa.ipc.new_file(path, episodes.schema) as writer:
+                writer.write_table(episodes)
+        rows = {table: sink.rows_written for table, sink in self.sinks.items()}
+        rows["episodes"] = len(episodes)
+        return rows
+
+
+class _EpisodeSummary:
+    """Running per-run aggregates, updated chunk by chunk."""
+    def __init__(self, road_length_m, time_step_s):
+        self.road_length_m = road_length_m
+        self.time_step_s = time_step_s
+        self.ticks = 0
+        self.start_position_m = None
+        self.final = (0.0, 0.0, 0) # KITT position, damage, score at the last tick
+        self.max_speed_kmh = 0.0
+        self.vehicle_ticks = 0
+        self.collisions = 0
+        self.end_reason = None
+        self.end_tick = None
+
+    def add_chunk(self, first_tick, kitt_position, kitt_speed, kitt_damage, kitt_score, vehicles_per_tick, event_ticks, event_kinds):
+        if not len(kitt_position):
+            return
+        if self.start_position_m is None:
+            self.start_position_m = float(kitt_position[0])
+        self.ticks = first_tick + len(kitt_position)
+        self.final = (float(kitt_position[-1]), float(kitt_damage[-1]), int(kitt_score[-1]))
+        self.max_speed_kmh = max(self.max_speed_kmh, float(kitt_speed.max()))
+        self.vehicle_ticks += int(vehicles_per_tick.sum())
+        for tick, kind in zip(event_ticks.tolist(), event_kinds):
+            if kind == "collision":
+                self.collisions += 1
+            elif kind in ("end_of_road", "kitt_destroyed") and self.end_reason is None:
+                self.end_reason, self.end_tick = kind, tick
+
+    def finish(self, run, run_name, source):
+        duration_s = self.ticks * self.time_step_s
+        final_position_m, final_damage, final_score = self.final
+        distance_m = final_position_m - (self.start_position_m or 0.0)
+        return {
+            "run": run, "run_name": run_name, "source": str(source), "road_length_m": self.road_length_m,
+            "time_step_s": self.time_step_s, "ticks": self.ticks, "duration_s": duration_s, "distance_m": distance_m,
+            "final_score": final_score, "final_damage": final_damage, "collisions": self.collisions,
+            "end_reason": self.end_reason,
+            "time_to_goal_s": self.end_tick * self.time_step_s if self.end_reason == "end_of_road" else None,
+            "mean_speed_kmh": distance_m / duration_s * 3.6 if duration_s else 0.0,
+            "max_speed_kmh": self.max_speed_kmh,
+            "mean_ai_vehicles": self.vehicle_ticks / self.ticks if self.ticks else 0.0,
+        }
+
+
+def export_recordings(recording_paths, directory, file_format="parquet", row_group_rows=ROW_GROUP_ROWS):
+    """Exports recordings as consecutive runs into directory. Returns {table: rows written}."""
+    exporter = ArrowExporter(directory, file_format, row_group_rows)
+    try:
+        for recording_path in recording_paths:
+            exporter.add_recording(recording_path)
+    finally:
+        rows = exporter.close()
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Export recorded KITT runs to Parquet or Arrow IPC tables.")
+    parser.add_argument("recordings", nargs="+", help="Recording files (python main_simulation.py --record PATH)")
+    parser.add_argument("--out", default="exports", help="Output directory")
+    parser.add_argument("--format", choices=tuple(FORMAT_EXTENSIONS), default="parquet", help="Parquet (default) or Arrow IPC files")
+    parser.add_argument("--row-group-rows", type=int, default=ROW_GROUP_ROWS, help="Rows per row group / record batch")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    rows = export_recordings(args.recordings, args.out, args.format, args.row_group_rows)
+    print(f"Exported {len(args.recordings)} runs to {args.out} in {time.perf_counter() - start_time:.2f} s: "
+          + ", ".join(f"{table} {count} rows" for table, count in rows.items()))
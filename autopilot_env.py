@@ -0,0 +1,344 @@
+# autopilot_env.py
+#
+# Vectorized training environment for autopilot policies: num_envs independent roads with
+# KITT, all stepped at once as numpy arrays (one row per environment, one column per AI
+# vehicle slot), in the style of a gym vector environment.
+#   env = VectorAutopilotEnv(num_envs=1024, seed=0)
+#   observations, infos = env.reset()
+#   observations, rewards, terminated, truncated, infos = env.step(actions) # actions: index into ACTIONS
+# Finished environments are reset within step(); their last observation is in infos.
+# Dynamics follow Road.advance_simulation_step and KITT: AI speed behaviour around KITT,
+# spawning near KITT, collision damage through the shield, turbo with cooldown. Collisions
+# are checked over the whole tick (linear motion), like the road's adaptive sub-steps.
+#   python autopilot_env.py --envs 1024 --steps 500   (throughput with a random policy)
+# numpy is optional for the rest of the simulation and only needed here.
+
+import argparse
+import time
+
+try:
+    import numpy as np
+except ImportError: # The environment needs numpy: pip install numpy
+    np = None
+
+from main_simulation import ROAD_LENGTH_M, LANE_COUNT, ROAD_SPEED_LIMIT_KMH, SIM_TIME_STEP_S
+from road_management import COLLISION_DISTANCE_M
+from spawn_catalogue import get_catalogue
+
+ACTIONS = ("keep", "accelerate", "brake", "change_left", "change_right", "turbo")
+SPEED_CHANGE_KMH = 10 # Of the accelerate and brake actions
+OBSERVATION_RANGE_M = 200.0 # Gaps in observations are clipped to this
+SPAWN_GAP_M = 40 # As Road.add_random_ai_vehicle
+SPAWN_ATTEMPTS = 8 # Placement attempts per spawn (all environments at once)
+KITT_MAX_SPEED_KMH = 320
+TURBO_SPEED_INCREASE_KMH = 150
+TURBO_DURATION_STEPS = 3
+TURBO_COOLDOWN_STEPS = 10
+TURBO_SCORE = 25
+DEFAULT_REWARD_WEIGHTS = {
+    "progress_per_m": 0.01,
+    "score_per_point": 0.01,
+    "damage_per_point": 0.05, # Damage that got through the shield
+    "shield_per_point": 0.02, # Shield power lost in collisions
+}
+# Observation features per environment: KITT's state, then leader and follower in the lanes left of, at and right of KITT
+KITT_FEATURES = ("speed", "lane", "can_change_left", "can_change_right", "damage", "shield_power", "turbo_ready", "road_left")
+NEIGHBOUR_FEATURES = ("leader_gap", "leader_closing_speed", "follower_gap", "follower_closing_speed")
+OBSERVATION_FEATURES = KITT_FEATURES + tuple(f"{side}_{feature}" for side in ("left", "own", "right") for feature in NEIGHBOUR_FEATURES)
+
+
+class VectorAutopilotEnv:
+    """
+    num_envs independent Road + KITT episodes as batched arrays. step() takes one action per
+    environment and returns float32 observations (num_envs, len(OBSERVATION_FEATURES)), rewards
+    from progress, KITT's score, damage and shield loss, and terminated (destroyed or end of road)
+    and truncated (max_steps) flags. Every array operation covers all environments.
+    """
+    def __init__(self, num_envs=256, road_length_m=ROAD_LENGTH_M, lane_count=LANE_COUNT,
+                 speed_limit_kmh=ROAD_SPEED_LIMIT_KMH, max_ai_vehicles=12, initial_vehicles=6,
+                 spawn_probability=0.1, time_step_s=SIM_TIME_STEP_S, max_steps=500, start_speed_kmh=60.0,
+                 vehicle_mix=None, reward_weights=None, seed=None):
+        if np is None:
+            raise RuntimeError("VectorAutopilotEnv needs numpy (pip install numpy)")
+        self.num_envs = int(num_envs)
+        self.road_length_m = float(road_length_m)
+        self.lane_count = int(lane_count)
+        self.speed_limit_kmh = float(speed_limit_kmh)
+        self.max_ai_vehicles = int(max_ai_vehicles)
+        self.initial_vehicles = int(initial_vehicles)
+        self.spawn_probability = float(spawn_probability)
+        self.time_step_s = float(time_step_s)
+        self.max_steps = int(max_steps)
+        self.start_speed_kmh = float(start_speed_kmh)
+        self.reward_weights = dict(DEFAULT_REWARD_WEIGHTS, **(reward_weights or {}))
+        self.rng = np.random.default_rng(seed)
+        self.action_count = len(ACTIONS)
+        self.observation_size = len(OBSERVATION_FEATURES)
+
+        # Vehicle max speeds are drawn like the road's spawns: catalogue entry by cumulative weight
+        catalogue = get_catalogue()
+        self._spawn_weights = np.array(catalogue.cumulative_weights(vehicle_mix))
+        self._spawn_min_speeds = np.array(catalogue.min_speeds, dtype=float)
+        self._spawn_max_speeds = np.array(catalogue.max_speeds, dtype=float)
+
+        shape = (self.num_envs, self.max_ai_vehicles)
+        self.ai_position = np.zeros(shape)
+        self.ai_speed = np.zeros(shape)
+        self.ai_max_speed = np.zeros(shape)
+        self.ai_lane = np.zeros(shape, dtype=np.int64)
+        self.ai_active = np.zeros(shape, dtype=bool)
+
+        self.kitt_position = np.zeros(self.num_envs)
+        self.kitt_speed = np.zeros(self.num_envs)
+        self.kitt_lane = np.ones(self.num_envs, dtype=np.int64)
+        self.kitt_max_speed = np.full(self.num_envs, float(KITT_MAX_SPEED_KMH))
+        self.damage = np.zeros(self.num_envs)
+        self.shield_power = np.zeros(self.num_envs)
+        self.shield_active = np.zeros(self.num_envs, dtype=bool)
+        self.score = np.zeros(self.num_envs)
+        self.turbo_remaining_steps = np.zeros(self.num_envs, dtype=np.int64)
+        self.turbo_cooldown_steps = np.zeros(self.num_envs, dtype=np.int64)
+        self.episode_steps = np.zeros(self.num_envs, dtype=np.int64)
+        self.episode_return = np.zeros(self.num_envs)
+        self.episode_collisions = np.zeros(self.num_envs, dtype=np.int64)
+
+    # --- Episodes ---
+    def reset(self, seed=None):
+        """Starts every environment over. Returns (observations, infos)."""
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self._reset_envs(np.arange(self.num_envs))
+        return self._observations(), {}
+
+    def _reset_envs(self, env_indexes):
+        self.kitt_position[env_indexes] = 50.0
+        self.kitt_speed[env_indexes] = self.start_speed_kmh
+        self.kitt_lane[env_indexes] = self.rng.integers(1, self.lane_count + 1, len(env_indexes))
+        self.kitt_max_speed[env_indexes] = KITT_MAX_SPEED_KMH
+        self.damage[env_indexes] = 0.0
+        self.shield_power[env_indexes] = 100.0
+        self.shield_active[env_indexes] = True
+        self.score[env_indexes] = 0.0
+        self.turbo_remaining_steps[env_indexes] = 0
+        self.turbo_cooldown_steps[env_indexes] = 0
+        self.episode_steps[env_indexes] = 0
+        self.episode_return[env_indexes] = 0.0
+        self.episode_collisions[env_indexes] = 0
+        self.ai_active[env_indexes] = False
+        for _ in range(self.initial_vehicles):
+            self._spawn(env_indexes)
+
+    def _spawn(self, env_indexes):
+        """Adds one AI vehicle near KITT to each of env_indexes that has a free slot and a free spot."""
+        env_indexes = env_indexes[(~self.ai_active[env_indexes]).any(axis=1)]
+        for _ in range(SPAWN_ATTEMPTS):
+            if not len(env_indexes):
+                return
+            count = len(env_indexes)
+            kitt_position = self.kitt_position[env_indexes]
+            low = np.maximum(0.0, kitt_position - 250)
+            high = np.minimum(self.road_length_m - 50, kitt_position + 250)
+            near_end = low >= high # As on the road: anywhere in the first 70% instead
+            low = np.where(near_end, 0.0, low)
+            high = np.where(near_end, self.road_length_m * 0.7, high)
+            position = np.floor(self.rng.uniform(low, high + 1))
+            lane = self.rng.integers(1, self.lane_count + 1, count)
+
+            blocked = (self.kitt_lane[env_indexes] == lane) & (np.abs(kitt_position - position) < SPAWN_GAP_M)
+            blocked |= (self.ai_active[env_indexes] & (self.ai_lane[env_indexes] == lane[:, None])
+                        & (np.abs(self.ai_position[env_indexes] - position[:, None]) < SPAWN_GAP_M)).any(axis=1)
+            placed = ~blocked
+            rows = env_indexes[placed]
+            slots = np.argmin(self.ai_active[rows], axis=1) # First free slot
+            entries = np.searchsorted(self._spawn_weights, self.rng.uniform(0.0, self._spawn_weights[-1], len(rows)), side="right")
+            entries = np.minimum(entries, len(self._spawn_weights) - 1)
+            max_speed = self._spawn_min_speeds[entries] + np.floor(self.rng.random(len(rows)) * (
+                self._spawn_max_speeds[entries] - self._spawn_min_speeds[entries] + 1))
+            self.ai_position[rows, slots] = position[placed]
+            self.ai_lane[rows, slots] = lane[placed]
+            self.ai_max_speed[rows, slots] = max_speed
+            self.ai_speed[rows, slots] = np.floor(self.rng.uniform(np.floor(max_speed * 0.3), np.floor(max_speed * 0.7) + 1))
+            self.ai_active[rows, slots] = True
+            env_indexes = env_indexes[blocked]
+
+    # --- Stepping ---
+    def step(self, actions):
+        """
+        Applies one action per environment and advances every environment by one tick.
+        Returns (observations, rewards, terminated, truncated, infos); infos has "final_observation",
+        "episode_return", "episode_length" and "episode_collisions" for the environments that
+        finished (listed in "done_indexes"), which are already reset in observations.
+        """
+        actions = np.asarray(actions)
+        previous_position = self.kitt_position.copy()
+        previous_score = self.score.copy()
+        previous_damage = self.damage.copy()
+        previous_shield_power = self.shield_power.copy()
+
+        self._apply_actions(actions)
+        collisions = self._advance()
+        self._update_ai_speeds()
+        spawning = self.rng.random(self.num_envs) < self.spawn_probability
+        if spawning.any():
+            self._spawn(np.flatnonzero(spawning))
+        self._update_turbo()
+
+        weights = self.reward_weights
+        rewards = ((self.kitt_position - previous_position) * weights["progress_per_m"]
+                   + (self.score - previous_score) * weights["score_per_point"]
+                   - (self.damage - previous_damage) * weights["damage_per_point"]
+                   - np.maximum(previous_shield_power - self.shield_power, 0.0) * weights["shield_per_point"])
+        self.episode_steps += 1
+        self.episode_return += rewards
+        self.episode_collisions += collisions
+        terminated = (self.damage >= 100) | (self.kitt_position >= self.road_length_m)
+        truncated = ~terminated & (self.episode_steps >= self.max_steps)
+
+        observations = self._observations()
+        infos = {}
+        done_indexes = np.flatnonzero(terminated | truncated)
+        if len(done_indexes):
+            infos = {
+                "done_indexes": done_indexes,
+                "final_observation": observations[done_indexes],
+                "episode_return": self.episode_return[done_indexes].copy(),
+                "episode_length": self.episode_steps[done_indexes].copy(),
+                "episode_collisions": self.episode_collisions[done_indexes].copy(),
+            }
+            self._reset_envs(done_indexes)
+            observations[done_indexes] = self._observations(done_indexes)
+        return observations, rewards.astype(np.float32), terminated, truncated, infos
+
+    def _apply_actions(self, actions):
+        """The KITT commands: accelerate, brake, lane change and turbo (as KITT's methods)."""
+        speed = self.kitt_speed
+        accelerate = actions == 1
+        speed[accelerate] = np.minimum(speed[accelerate] + SPEED_CHANGE_KMH, self.kitt_max_speed[accelerate])
+        brake = actions == 2
+        speed[brake] = np.maximum(speed[brake] - SPEED_CHANGE_KMH, 0.0)
+        lane_change = np.where(actions == 3, -1, np.where(actions == 4, 1, 0))
+        new_lane = self.kitt_lane + lane_change
+        self.kitt_lane = np.where((new_lane >= 1) & (new_lane <= self.lane_count), new_lane, self.kitt_lane)
+
+        turbo = (actions == 5) & (self.turbo_cooldown_steps == 0) & (self.turbo_remaining_steps == 0)
+        self.kitt_max_speed[turbo] = KITT_MAX_SPEED_KMH + TURBO_SPEED_INCREASE_KMH
+        speed[turbo] = np.minimum(speed[turbo] + TURBO_SPEED_INCREASE_KMH, self.kitt_max_speed[turbo])
+        self.turbo_remaining_steps[turbo] = TURBO_DURATION_STEPS
+        self.score[turbo] += TURBO_SCORE
+
+    def _advance(self):
+        """Moves every vehicle, handles KITT's collisions and vehicles leaving the road. Returns collisions per environment."""
+        meters_per_kmh = self.time_step_s / 3.6
+        previous_offset = self.ai_position - self.kitt_position[:, None]
+        self.kitt_position += self.kitt_speed * meters_per_kmh
+        self.ai_position += np.where(self.ai_active, self.ai_speed * meters_per_kmh, 0.0)
+
+        # A collision is any approach closer than COLLISION_DISTANCE_M during the tick, including passing through
+        offset = self.ai_position - self.kitt_position[:, None]
+        hit = (self.ai_active & (self.ai_lane == self.kitt_lane[:, None])
+               & ((np.abs(offset) < COLLISION_DISTANCE_M) | (np.sign(offset) != np.sign(previous_offset))))
+        collisions = hit.sum(axis=1)
+        if collisions.any():
+            damage = np.where(hit, 20 + 0.5 * np.abs(self.kitt_speed[:, None] - self.ai_speed), 0.0).sum(axis=1)
+            absorbed = np.where(self.shield_active, np.minimum(self.shield_power, damage), 0.0)
+            self.shield_power -= absorbed
+            self.shield_active &= self.shield_power > 0
+            self.damage = np.minimum(self.damage + damage - absorbed, 100.0)
+            self.ai_active &= ~hit
+
+        self.ai_active &= (self.ai_position < self.road_length_m + 100) & (self.ai_position >= -150)
+        return collisions
+
+    def _update_ai_speeds(self):
+        """The road's AI speed behaviour: drift towards the speed limit, adapt to KITT within 100 m."""
+        shape = self.ai_speed.shape
+        rng = self.rng
+        kitt_speed = self.kitt_speed[:, None]
+        offset = self.ai_position - self.kitt_position[:, None]
+        target = self.speed_limit_kmh - rng.integers(0, 31, shape)
+        ahead_target = np.where(kitt_speed > 40, np.maximum(30, kitt_speed - rng.integers(5, 16, shape)), kitt_speed + 5)
+        behind_target = np.minimum(self.ai_max_speed, kitt_speed + rng.integers(0, 11, shape))
+        near = np.abs(offset) < 100
+        target = np.where(near & (offset > 0), ahead_target, np.where(near, behind_target, target))
+
+        change = rng.integers(3, 9, shape)
+        draw = rng.random(shape)
+        accelerate = self.ai_active & (self.ai_speed < target - 5) & (draw < 0.1)
+        brake = self.ai_active & ~accelerate & (self.ai_speed > target + 5) & (draw < 0.15)
+        self.ai_speed = np.where(accelerate, np.minimum(self.ai_speed + change, self.ai_max_speed),
+                                 np.where(brake, np.maximum(self.ai_speed - change, 0.0), self.ai_speed))
+
+    def _update_turbo(self):
+        """As KITT.update_turbo_step."""
+        self.turbo_cooldown_steps -= self.turbo_cooldown_steps > 0
+        active = self.turbo_remaining_steps > 0
+        self.turbo_remaining_steps -= active
+        ended = active & (self.turbo_remaining_steps == 0)
+        self.kitt_max_speed[ended] = KITT_MAX_SPEED_KMH
+        self.kitt_speed[ended] = np.minimum(self.kitt_speed[ended], KITT_MAX_SPEED_KMH + 20)
+        self.turbo_cooldown_steps[ended] = TURBO_COOLDOWN_STEPS
+
+    # --- Observations ---
+    def _observations(self, env_indexes=slice(None)):
+        """float32 (environments, OBSERVATION_FEATURES) for all environments or the given ones."""
+        kitt_position = self.kitt_position[env_indexes]
+        kitt_speed = self.kitt_speed[env_indexes]
+        kitt_lane = self.kitt_lane[env_indexes]
+        ai_active = self.ai_active[env_indexes]
+        ai_lane = self.ai_lane[env_indexes]
+        ai_speed = self.ai_speed[env_indexes]
+        offset = self.ai_position[env_indexes] - kitt_position[:, None]
+
+        columns = [
+            kitt_speed / KITT_MAX_SPEED_KMH,
+            (kitt_lane - 1) / max(self.lane_count - 1, 1),
+            kitt_lane > 1,
+            kitt_lane < self.lane_count,
+            self.damage[env_indexes] / 100.0,
+            self.shield_power[env_indexes] / 100.0,
+            (self.turbo_cooldown_steps[env_indexes] == 0) & (self.turbo_remaining_steps[env_indexes] == 0),
+            (self.road_length_m - kitt_position) / self.road_length_m,
+        ]
+        rows = np.arange(len(kitt_position))
+        for lane_offset in (-1, 0, 1):
+            lane = kitt_lane + lane_offset
+            lane_exists = (lane >= 1) & (lane <= self.lane_count)
+            in_lane = ai_active & (ai_lane == lane[:, None])
+            for side, gaps in ((1, offset), (-1, -offset)): # Leader ahead, follower behind
+                gaps = np.where(in_lane & (gaps >= 0), gaps, np.inf)
+                nearest = np.argmin(gaps, axis=1)
+                gap = gaps[rows, nearest]
+                found = np.isfinite(gap)
+                # Closing speed: how fast the gap shrinks (KITT faster than its leader, follower faster than KITT)
+                closing_speed = np.where(found, side * (kitt_speed - ai_speed[rows, nearest]), 0.0)
+                columns.append(np.where(lane_exists, np.minimum(gap, OBSERVATION_RANGE_M) / OBSERVATION_RANGE_M, 0.0))
+                columns.append(np.where(lane_exists, closing_speed / 100.0, 0.0))
+        return np.stack(columns, axis=1).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized autopilot environment throughput with a random policy")
+    parser.add_argument("--envs", type=int, default=1024)
+    parser.add_argument("--steps", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    env = VectorAutopilotEnv(num_envs=args.envs, seed=args.seed)
+    env.reset()
+    episode_returns = []
+    collisions = 0
+    start_time = time.perf_counter()
+    for _ in range(args.steps):
+        _, _, _, _, infos = env.step(env.rng.integers(0, env.action_count, env.num_envs))
+        if infos:
+            episode_returns.extend(infos["episode_return"].tolist())
+            collisions += int(infos["episode_collisions"].sum())
+    elapsed_s = time.perf_counter() - start_time
+    print(f"{args.envs * args.steps} env-steps in {elapsed_s:.2f} s: {args.envs * args.steps / elapsed_s:,.0f} env-steps/s")
+    if episode_returns:
+        print(f"{len(episode_returns)} episodes finished, mean return {sum(episode_returns) / len(episode_returns):.2f}, "
+              f"{collisions / len(episode_returns):.2f} collisions per episode")
+
+
+if __name__ == "__main__":
+    main()
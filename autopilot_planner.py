@@ -0,0 +1,185 @@
+# autopilot_planner.py
+
+import math
+import time
+
+COLLISION_DISTANCE_M = 15 # road_management.COLLISION_DISTANCE_M: KITT collides closer than this (same lane)
+
+# Tunable planner parameters (see AutopilotPlanner)
+DEFAULT_PLANNER_PARAMETERS = {
+    "horizon_steps": 10, # Lookahead in simulation steps
+    "step_seconds": 0.4, # Length of one lookahead step (the simulation time step)
+    "min_ttc_s": 3.0, # Time-to-collision below this (with any neighbour) is unsafe
+    "headway_s": 0.8, # Gap to the vehicle ahead must stay above COLLISION_DISTANCE_M + headway
+    "rear_margin_m": 10.0, # Extra gap to the vehicle behind after a lane change
+    "lane_change_penalty_m": 8.0, # Progress a lane change must gain to be preferred
+    "turbo_penalty_m": 60.0, # Progress turbo must gain (it has a cooldown) to be used
+    "brake_penalty_m": 2.0,
+    "soft_brake_kmh": 10.0, # Speed change per step of each speed profile
+    "hard_brake_kmh": 25.0,
+    "accelerate_kmh": 10.0,
+    "cruise_accelerate_kmh": 5.0,
+    "time_budget_ms": 1.0, # Candidates are evaluated until this is used up (keep and hard brake always are)
+}
+
+
+class PlannedAction:
+    """Result of one planning step."""
+    __slots__ = ("name", "lane", "speed_change_kmh", "use_turbo", "progress_m", "min_ttc_s", "min_margin_m", "safe")
+
+    def __init__(self, name, lane, speed_change_kmh=0.0, use_turbo=False):
+        self.name = name
+        self.lane = lane
+        self.speed_change_kmh = speed_change_kmh
+        self.use_turbo = use_turbo
+        self.progress_m = 0.0
+        self.min_ttc_s = math.inf
+        self.min_margin_m = math.inf
+        self.safe = False
+
+
+class AutopilotPlanner:
+    """
+    Picks KITT's next autopilot action by predicting each candidate (keep lane, change
+    left/right, accelerate, soft/hard brake, turbo) over a short horizon against the
+    leader and follower in the candidate's lane (constant speed prediction). Among the
+    candidates that keep time-to-collision and gaps safe it takes the one with the most
+    progress; if none is safe, the one with the largest safety margin.
+    Neighbours come from the road's lane index, so a plan costs O(log n) in traffic.
+    """
+    def __init__(self, **parameters):
+        unknown = set(parameters) - set(DEFAULT_PLANNER_PARAMETERS)
+        if unknown:
+            raise ValueError(f"Unknown planner parameters: {', '.join(sorted(unknown))}")
+        self.parameters = dict(DEFAULT_PLANNER_PARAMETERS, **parameters)
+        self.last_action = None
+        self.last_plan_ns = 0
+        self.plan_count = 0
+        self.budget_exhausted_count = 0 # Plans that skipped candidates to stay within time_budget_ms
+
+    def _neighbours(self, road, lane, position):
+        """((leader position, speed) or None, (follower position, speed) or None) in lane."""
+        lane_index = road.lane_index
+        # A vehicle at exactly KITT's position counts as leader (gap 0, unsafe)
+        leader = lane_index.leader(lane, math.nextafter(position, -math.inf))
+        follower = lane_index.follower(lane, position)
+        return ((leader.position, leader.speed) if leader else None,
+                (follower.position, follower.speed) if follower else None)
+
+    def speed_profile(self, kitt, action, cruise_speed_kmh):
+        """KITT's speed in each lookahead step for an action."""
+        parameters = self.parameters
+        speed = kitt.speed
+        max_speed = kitt.max_speed
+        profile = []
+        for step in range(parameters["horizon_steps"]):
+            if action.use_turbo:
+                if step < kitt.turbo_duration_steps:
+                    speed = min(kitt.speed + kitt.turbo_speed_increase, kitt.normal_max_speed + kitt.turbo_speed_increase)
+                else:
+                    speed = min(speed, kitt.normal_max_speed + 20)
+            elif action.speed_change_kmh < 0:
+                speed = max(speed + action.speed_change_kmh, 0.0)
+            else:
+                change_kmh = action.speed_change_kmh or parameters["cruise_accelerate_kmh"]
+                if speed < cruise_speed_kmh:
+                    speed = min(speed + change_kmh, cruise_speed_kmh, max_speed)
+                elif speed > cruise_speed_kmh + 5 and not action.speed_change_kmh:
+                    speed = max(speed - change_kmh, cruise_speed_kmh)
+            profile.append(speed)
+        return profile
+
+    def _evaluate(self, action, start_position, profile, leader, follower):
+        parameters = self.parameters
+        distance_factor = parameters["step_seconds"] / 3.6
+        headway_s = parameters["headway_s"]
+        rear_gap_min_m = COLLISION_DISTANCE_M + (parameters["rear_margin_m"] if action.name.startswith("change") else 0.0)
+        position = start_position
+        leader_position, leader_speed = leader if leader else (math.inf, 0.0)
+        follower_position, follower_speed = follower if follower else (-math.inf, 0.0)
+        min_ttc_s = math.inf
+        min_margin_m = math.inf
+        for speed in profile:
+            position += speed * distance_factor
+            leader_position += leader_speed * distance_factor
+            follower_position += follower_speed * distance_factor
+
+            front_gap_m = leader_position - position
+            min_margin_m = min(min_margin_m, front_gap_m - (COLLISION_DISTANCE_M + headway_s * speed / 3.6))
+            closing_mps = (speed - leader_speed) / 3.6
+            if closing_mps > 0:
+                min_ttc_s = min(min_ttc_s, max(0.0, front_gap_m - COLLISION_DISTANCE_M) / closing_mps)
+
+            rear_gap_m = position - follower_position
+            min_margin_m = min(min_margin_m, rear_gap_m - rear_gap_min_m)
+            closing_mps = (follower_speed - speed) / 3.6
+            if closing_mps > 0:
+                min_ttc_s = min(min_ttc_s, max(0.0, rear_gap_m - COLLISION_DISTANCE_M) / closing_mps)
+
+        action.progress_m = position - start_position
+        action.min_ttc_s = min_ttc_s
+        action.min_margin_m = min_margin_m
+        action.safe = min_margin_m >= 0 and min_ttc_s >= parameters["min_ttc_s"]
+        return action
+
+    def _candidates(self, kitt, road):
+        parameters = self.parameters
+        lane = kitt.lane
+        # Cheapest safe fallbacks first: they are always evaluated, the rest only within the time budget
+        candidates = [
+            PlannedAction("keep", lane),
+            PlannedAction("brake_hard", lane, -parameters["hard_brake_kmh"]),
+            PlannedAction("brake_soft", lane, -parameters["soft_brake_kmh"]),
+        ]
+        if lane > 1:
+            candidates.append(PlannedAction("change_left", lane - 1))
+        if lane < road.lane_count:
+            candidates.append(PlannedAction("change_right", lane + 1))
+        candidates.append(PlannedAction("accelerate", lane, parameters["accelerate_kmh"]))
+        if not kitt.turbo_active and kitt.turbo_cooldown_steps <= 0:
+            candidates.append(PlannedAction("turbo", lane, use_turbo=True))
+        return candidates
+
+    def _score(self, action):
+        parameters = self.parameters
+        score = action.progress_m
+        if action.name.startswith("change"):
+            score -= parameters["lane_change_penalty_m"]
+        elif action.name == "turbo":
+            score -= parameters["turbo_penalty_m"]
+        elif action.name.startswith("brake"):
+            score -= parameters["brake_penalty_m"]
+        return score
+
+    def plan(self, kitt, road):
+        """Returns the PlannedAction for this tick."""
+        start_ns = time.perf_counter_ns()
+        budget_ns = self.parameters["time_budget_ms"] * 1e6
+        cruise_speed_kmh = kitt.autopilot_target_speed
+        neighbours_by_lane = {}
+        evaluated = []
+        for index, action in enumerate(self._candidates(kitt, road)):
+            if index >= 2 and time.perf_counter_ns() - start_ns > budget_ns:
+                self.budget_exhausted_count += 1
+                break
+            neighbours = neighbours_by_lane.get(action.lane)
+            if neighbours is None:
+                neighbours = neighbours_by_lane[action.lane] = self._neighbours(road, action.lane, kitt.position)
+            profile = self.speed_profile(kitt, action, cruise_speed_kmh)
+            evaluated.append(self._evaluate(action, kitt.position, profile, *neighbours))
+
+        safe_actions = [action for action in evaluated if action.safe]
+        if safe_actions:
+            best_action = max(safe_actions, key=self._score)
+        else: # Nothing is safe: minimise the danger
+            best_action = max(evaluated, key=lambda action: (action.min_margin_m, action.min_ttc_s))
+        self.last_action = best_action
+        self.plan_count += 1
+        self.last_plan_ns = time.perf_counter_ns() - start_ns
+        return best_action
+
+    def clear_ahead(self, kitt, road):
+        """True if there is no vehicle within the lookahead distance ahead of KITT in its lane."""
+        leader, _ = self._neighbours(road, kitt.lane, kitt.position)
+        lookahead_m = kitt.speed / 3.6 * self.parameters["step_seconds"] * self.parameters["horizon_steps"]
+        return leader is None or leader[0] - kitt.position > max(lookahead_m, 4 * COLLISION_DISTANCE_M)
@@ -0,0 +1,249 @@
+# autopilot_tuning.py
+#
+# Tunes the autopilot planner parameters (see autopilot_planner.py) on headless episodes.
+#   python autopilot_tuning.py --param min_ttc_s=2,3,4 --param headway_s=0.5,0.8,1.2
+#   python autopilot_tuning.py --search random --samples 30 --param min_ttc_s=1.5:5 --param lane_change_penalty_m=0:30
+# Every (parameter set, seed) episode is run once: results are cached in
+# autopilot_tuning_cache.jsonl, so repeated or extended sweeps only run new work.
+
+import argparse
+import contextlib
+import hashlib
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import statistics
+import time
+
+from autopilot_planner import AutopilotPlanner, DEFAULT_PLANNER_PARAMETERS
+from events import EventBus, EventCounter, Collision, KittDestroyed
+from instrumentation import PhaseProfiler
+from main_simulation import ROAD_SPEED_LIMIT_KMH, SIM_TIME_STEP_S, run_simulation_step
+from road_management import Road
+from vehicles import KITT
+
+CACHE_FILE = "autopilot_tuning_cache.jsonl"
+CACHE_VERSION = 4 # Bump when episode results change for the same parameters (simulation changes)
+COLLISION_PENALTY_M = 1000 # Score = mean distance - penalty per collision
+
+DEFAULT_EPISODE_SETTINGS = {
+    "ticks": 500,
+    "time_step_s": SIM_TIME_STEP_S,
+    "road_length_m": 50000,
+    "lane_count": 3,
+    "initial_vehicles": 6,
+    "max_ai_vehicles": 12,
+    "spawn_probability": 0.1,
+    "start_speed_kmh": 60.0,
+}
+
+
+def run_episode(parameters, seed, settings=None):
+    """Runs one headless autopilot episode and returns its metrics."""
+    settings = dict(DEFAULT_EPISODE_SETTINGS, **(settings or {}))
+    random.seed(seed)
+    with open(os.devnull, "w") as null_stream, contextlib.redirect_stdout(null_stream):
+        road = Road(settings["road_length_m"], settings["lane_count"], ROAD_SPEED_LIMIT_KMH,
+                    max_ai_vehicles=settings["max_ai_vehicles"])
+        road.events = EventBus() # Only this episode's metrics listen: nothing is printed or formatted
+        event_counter = EventCounter(road.events, (Collision, KittDestroyed))
+        kitt = KITT(lane=random.randint(1, road.lane_count), position=50.0, enable_music=False)
+        kitt.speed = settings["start_speed_kmh"]
+        road.add_kitt_reference(kitt)
+        for _ in range(settings["initial_vehicles"]):
+            road.add_random_ai_vehicle()
+
+        # No wall-clock budget: every candidate is evaluated, so (parameters, seed) fixes the result
+        kitt.autopilot_planner = AutopilotPlanner(**dict(parameters, time_budget_ms=math.inf))
+        kitt.toggle_autopilot()
+        profiler = PhaseProfiler(enabled=False)
+        start_position = kitt.position
+        ticks = 0
+        unsafe_plans = 0
+        while ticks < settings["ticks"]:
+            kitt.run_autopilot_logic(road)
+            unsafe_plans += not kitt.autopilot_planner.last_action.safe
+            ticks += 1
+            if not run_simulation_step(road, kitt, profiler, settings["time_step_s"], settings["spawn_probability"]):
+                break
+
+    distance_m = kitt.position - start_position
+    return {
+        "ticks": ticks,
+        "collisions": event_counter.counts["Collision"],
+        "destroyed": event_counter.counts["KittDestroyed"] > 0,
+        "distance_m": round(distance_m, 3),
+        "average_speed_kmh": round(distance_m / (ticks * settings["time_step_s"]) * 3.6, 3),
+        "unsafe_plan_share": round(unsafe_plans / ticks, 4),
+    }
+
+
+def _run_episode_job(job):
+    key, parameters, seed, settings = job
+    return key, parameters, seed, run_episode(parameters, seed, settings)
+
+
+def parameter_key(parameters, settings):
+    """Hash of the full parameter set and episode settings (cache key together with the seed)."""
+    description = json.dumps({"version": CACHE_VERSION, "parameters": dict(DEFAULT_PLANNER_PARAMETERS, **parameters),
+                              "settings": dict(DEFAULT_EPISODE_SETTINGS, **settings)}, sort_keys=True)
+    return hashlib.sha1(description.encode("utf-8")).hexdigest()[:16]
+
+
+class ResultCache:
+    """Episode results by (parameter key, seed), appended to a JSONL file."""
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self.results = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as cache_file:
+                for line in cache_file:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.results[(entry["key"], entry["seed"])] = entry["metrics"]
+
+    def get(self, key, seed):
+        return self.results.get((key, seed))
+
+    def add(self, key, parameters, seed, metrics):
+        self.results[(key, seed)] = metrics
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as cache_file:
+                cache_file.write(json.dumps({"key": key, "seed": seed, "parameters": parameters, "metrics": metrics}) + "\n")
+
+
+def evaluate(parameter_sets, seeds, settings=None, workers=0, cache=None):
+    """
+    Runs every parameter set on every seed (skipping cached episodes) and returns one summary
+    per parameter set, best score first. workers > 0 runs episodes in that many processes.
+    """
+    settings = settings or {}
+    cache = cache if cache is not None else ResultCache(None)
+    keys = [parameter_key(parameters, settings) for parameters in parameter_sets]
+    jobs = [(key, parameters, seed, settings) for key, parameters in zip(keys, parameter_sets)
+            for seed in seeds if cache.get(key, seed) is None]
+    cached_count = len(parameter_sets) * len(seeds) - len(jobs)
+    print(f"{len(jobs)} episodes to run, {cached_count} cached.")
+
+    start_time = time.perf_counter()
+    if workers > 0 and len(jobs) > 1:
+        with multiprocessing.Pool(workers) as pool:
+            for done, (key, parameters, seed, metrics) in enumerate(pool.imap_unordered(_run_episode_job, jobs), 1):
+                cache.add(key, parameters, seed, metrics)
+                print(f"\r{done}/{len(jobs)} episodes", end="", flush=True)
+    else:
+        for done, job in enumerate(jobs, 1):
+            cache.add(*_run_episode_job(job))
+            print(f"\r{done}/{len(jobs)} episodes", end="", flush=True)
+    if jobs:
+        print(f"\n{len(jobs)} episodes in {time.perf_counter() - start_time:.1f} s")
+
+    summaries = []
+    for key, parameters in zip(keys, parameter_sets):
+        episodes = [cache.get(key, seed) for seed in seeds]
+        total_km = sum(episode["distance_m"] for episode in episodes) / 1000
+        collisions = sum(episode["collisions"] for episode in episodes)
+        mean_distance_m = statistics.fmean(episode["distance_m"] for episode in episodes)
+        summaries.append({
+            "parameters": parameters,
+            "key": key,
+            "episodes": len(episodes),
+            "collision_rate": sum(episode["collisions"] > 0 for episode in episodes) / len(episodes),
+            "collisions_per_km": collisions / total_km if total_km > 0 else 0.0,
+            "average_speed_kmh": statistics.fmean(episode["average_speed_kmh"] for episode in episodes),
+            "mean_distance_m": mean_distance_m,
+            "score": mean_distance_m - COLLISION_PENALTY_M * collisions / len(episodes),
+        })
+    summaries.sort(key=lambda summary: summary["score"], reverse=True)
+    return summaries
+
+
+# --- Search spaces ---
+def _parse_value(text):
+    number = float(text)
+    return int(number) if number.is_integer() and "." not in text else number
+
+
+def parse_parameter_space(parameter_arguments):
+    """["name=1,2,3", "name=low:high"] -> {name: [values] or (low, high)}."""
+    space = {}
+    for argument in parameter_arguments:
+        name, separator, values = argument.partition("=")
+        if not separator or name not in DEFAULT_PLANNER_PARAMETERS:
+            raise ValueError(f"Invalid parameter '{argument}'. Known parameters: {', '.join(DEFAULT_PLANNER_PARAMETERS)}")
+        if ":" in values:
+            low, high = values.split(":", 1)
+            space[name] = (_parse_value(low), _parse_value(high))
+        else:
+            space[name] = [_parse_value(value) for value in values.split(",")]
+    return space
+
+
+def grid_search_space(space):
+    """Every combination of the listed values."""
+    for name, values in space.items():
+        if isinstance(values, tuple):
+            raise ValueError(f"Grid search needs value lists, got a range for '{name}'.")
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_search_space(space, samples, seed=0):
+    """samples random parameter sets: ranges are sampled uniformly (integers if both ends are), lists by choice."""
+    rng = random.Random(seed)
+    parameter_sets = []
+    for _ in range(samples):
+        parameters = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    parameters[name] = rng.randint(low, high)
+                else:
+                    parameters[name] = round(rng.uniform(low, high), 3)
+            else:
+                parameters[name] = rng.choice(values)
+        parameter_sets.append(parameters)
+    return parameter_sets
+
+
+def print_summaries(summaries, limit=10):
+    print(f"{'score':>9} {'coll/km':>8} {'coll rate':>9} {'avg km/h':>9} {'distance':>9}  parameters")
+    for summary in summaries[:limit]:
+        parameters = ", ".join(f"{name}={value}" for name, value in summary["parameters"].items()) or "(defaults)"
+        print(f"{summary['score']:9.0f} {summary['collisions_per_km']:8.3f} {summary['collision_rate']:9.0%} "
+              f"{summary['average_speed_kmh']:9.1f} {summary['mean_distance_m']:8.0f}m  {parameters}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Autopilot planner parameter search on headless episodes")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUES",
+                        help="Values to try: a,b,c (grid or random choice) or low:high (random search)")
+    parser.add_argument("--search", choices=["grid", "random"], default="grid")
+    parser.add_argument("--samples", type=int, default=20, help="Parameter sets for random search")
+    parser.add_argument("--seeds", type=int, default=8, help="Episodes (seeds 0..N-1) per parameter set")
+    parser.add_argument("--ticks", type=int, default=DEFAULT_EPISODE_SETTINGS["ticks"])
+    parser.add_argument("--vehicles", type=int, default=DEFAULT_EPISODE_SETTINGS["initial_vehicles"], help="Initial AI vehicles")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Episode processes (0: in-process)")
+    parser.add_argument("--cache", default=CACHE_FILE)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--search-seed", type=int, default=0)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    space = parse_parameter_space(args.param)
+    if args.search == "grid":
+        parameter_sets = grid_search_space(space)
+    else:
+        parameter_sets = random_search_space(space, args.samples, args.search_seed)
+    settings = {"ticks": args.ticks, "initial_vehicles": args.vehicles}
+    cache = ResultCache(None if args.no_cache else args.cache)
+    summaries = evaluate(parameter_sets, list(range(args.seeds)), settings, args.workers, cache)
+    print_summaries(summaries, args.top)
+
+
+if __name__ == "__main__":
+    main()
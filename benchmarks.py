@@ -0,0 +1,400 @@
+# benchmarks.py
+#
+# Benchmark suite for the simulation hot paths.
+#   python benchmarks.py                  # run all, append results to benchmark_history.jsonl
+#   python benchmarks.py -k step          # only benchmarks whose name contains "step"
+#   python benchmarks.py --no-save        # don't store the results
+# Each run is compared with the latest stored run of a different commit, and
+# benchmarks slower than --threshold are reported as regressions.
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import road_management
+from autopilot_planner import AutopilotPlanner
+from road_management import Road
+from spawn_catalogue import SpawnCatalogue, get_catalogue
+from vehicles import Car, Truck, Motorcycle, KITT
+
+HISTORY_FILE = "benchmark_history.jsonl"
+
+BENCHMARKS = [] # (name, setup function, calls per measurement)
+MEMORY_BENCHMARKS = [] # (name, factory returning one new object)
+MEMORY_SAMPLE_SIZE = 10000
+
+
+def benchmark(name, number=1):
+    """Registers a benchmark. The decorated function does the setup and returns the callable to time."""
+    def register(setup_function):
+        BENCHMARKS.append((name, setup_function, number))
+        return setup_function
+    return register
+
+
+def memory_benchmark(name):
+    """Registers a memory benchmark. The decorated function creates one object; bytes per object are reported."""
+    def register(factory):
+        MEMORY_BENCHMARKS.append((name, factory))
+        return factory
+    return register
+
+
+# --- Fixtures ---
+def build_road(vehicle_count, lane_count=3, spacing_m=60, seed=1234, with_kitt=True):
+    """Road with vehicle_count AI vehicles spread evenly, long enough that none leave it during a benchmark."""
+    random.seed(seed)
+    traffic_span_m = vehicle_count * spacing_m / lane_count
+    length_meters = int(traffic_span_m) + 20000 # Room for ~1000 steps before KITT or traffic reaches the end
+    road = Road(length_meters, lane_count, max_ai_vehicles=vehicle_count * 2)
+    road.clear_screen = False
+    if with_kitt:
+        kitt = KITT(lane=2, position=traffic_span_m / 2, enable_music=False)
+        kitt.speed = 110.0
+        road.add_kitt_reference(kitt)
+    vehicle_classes = [Car, Truck, Motorcycle]
+    for index in range(vehicle_count):
+        lane = index % lane_count + 1
+        position = (index // lane_count) * spacing_m + random.uniform(0, spacing_m / 2)
+        vehicle_class = vehicle_classes[index % len(vehicle_classes)]
+        road.add_ai_vehicle(vehicle_class(road_management.generate_unique_ai_vehicle_id(), "Bench", "Mark",
+                                          120, lane, position))
+    return road
+
+
+@contextlib.contextmanager
+def null_output():
+    """Sends printed output to the null device."""
+    with open(os.devnull, "w") as null_stream, contextlib.redirect_stdout(null_stream):
+        yield
+
+
+# --- Benchmarks ---
+def _make_step_benchmark(vehicle_count):
+    def setup():
+        road = build_road(vehicle_count)
+        return lambda: road.advance_simulation_step(time_step_seconds=0.4, new_ai_vehicle_probability=0.0)
+    return setup
+
+for _vehicle_count, _number in ((10, 200), (100, 50), (1000, 5), (10000, 1)):
+    benchmark(f"advance_simulation_step[{_vehicle_count}]", number=_number)(_make_step_benchmark(_vehicle_count))
+
+
+@benchmark("calculate_crash_risk[1000]", number=50)
+def bench_crash_risk():
+    road = build_road(1000)
+    def crash_risk():
+        road.vehicle_store.mark_moved() # Invalidates the per-tick cache: measures the computation
+        road.calculate_crash_risk()
+    return crash_risk
+
+
+@benchmark("calculate_crash_risk[cached]", number=200)
+def bench_crash_risk_cached():
+    road = build_road(1000)
+    road.calculate_crash_risk()
+    return road.calculate_crash_risk
+
+
+@benchmark("traffic_risk_statistics[10000]", number=20)
+def bench_traffic_risk():
+    road = build_road(10000, spacing_m=30)
+    road.lane_index.refresh()
+    def statistics():
+        road.vehicle_store.mark_moved() # Recomputed once per step
+        road.traffic_risk_statistics()
+    return statistics
+
+
+@benchmark("check_and_handle_collisions[1000]", number=50)
+def bench_collisions():
+    road = build_road(1000)
+    kitt = road.kitt_vehicle
+    kitt.position = -1000.0 # Out of reach: measures the scan, not the damage handling
+    return lambda: road.check_and_handle_collisions(kitt)
+
+
+@benchmark("add_random_ai_vehicle[dense]", number=20)
+def bench_spawn_dense():
+    road = build_road(1000, spacing_m=45)
+    def spawn():
+        road.add_random_ai_vehicle()
+        if len(road.ai_vehicles) > 1000:
+            road.remove_ai_vehicle(road.ai_vehicles[-1])
+    return spawn
+
+
+@benchmark("SpawnCatalogue.draw_batch[100k models]", number=200)
+def bench_spawn_catalogue_draw():
+    # 1000 brands with 100 models per vehicle class: draws must not slow down with catalogue size
+    models_by_brand = {f"Brand{brand}": [f"Model{model}" for model in range(100)] for brand in range(1000)}
+    catalogue = SpawnCatalogue.from_config({"CAR_MODELS_AI": models_by_brand, "TRUCK_MODELS_AI": models_by_brand,
+                                            "MOTORCYCLE_MODELS_AI": models_by_brand})
+    mix = (0.6, 0.3, 0.1)
+    catalogue.cumulative_weights(mix) # Compiled once per mix
+    return lambda: catalogue.draw_batch(100, mix)
+
+
+@benchmark("despawn_spawn_churn[10000]", number=20)
+def bench_churn():
+    road = build_road(10000)
+    store = road.vehicle_store
+    def churn():
+        # Replace 100 random vehicles, as happens when traffic leaves and enters a busy road
+        for _ in range(100):
+            road.remove_ai_vehicle(road.ai_vehicles[random.randrange(len(road.ai_vehicles))])
+            store.acquire(Car, road_management.generate_unique_ai_vehicle_id(), "Bench", "Mark",
+                          120, random.randint(1, road.lane_count), random.uniform(0, road.length_meters))
+    return churn
+
+
+def _make_render_benchmark(vehicle_count, zoom_to_fit=False):
+    def setup():
+        road = build_road(vehicle_count)
+        if zoom_to_fit:
+            road.zoom_to_fit()
+        def render():
+            with null_output():
+                road.show_text_based_road()
+        return render
+    return setup
+
+for _vehicle_count in (1000, 10000):
+    benchmark(f"show_text_based_road[{_vehicle_count}]", number=20)(_make_render_benchmark(_vehicle_count))
+benchmark("show_text_based_road[10000, whole road]", number=20)(_make_render_benchmark(10000, zoom_to_fit=True))
+
+
+@benchmark("LaneIndex.refresh[10000, moved]", number=20)
+def bench_lane_index_refresh():
+    road = build_road(10000)
+    road.advance_simulation_step(time_step_seconds=0.4, new_ai_vehicle_probability=0.0)
+    road.lane_index.refresh()
+    def refresh():
+        road.vehicle_store.mark_moved() # What every step does
+        road.lane_index.refresh()
+    return refresh
+
+
+@benchmark("AutopilotPlanner.plan[10000]", number=200)
+def bench_autopilot_plan():
+    road = build_road(10000)
+    kitt = road.kitt_vehicle
+    kitt.autopilot_target_speed = 130.0
+    planner = AutopilotPlanner()
+    road.lane_index.refresh() # Measures planning, the index refresh is in LaneIndex.refresh[...]
+    return lambda: planner.plan(kitt, road)
+
+
+@benchmark("RoadNetwork.step[grid 20x20]", number=20)
+def bench_network_step():
+    from road_network import RoadNetwork
+    random.seed(4321)
+    network = RoadNetwork.grid(20, 20, spawn_probability=0.2)
+    for _ in range(300): # Fill the network with traffic first
+        network.step(0.4)
+    return lambda: network.step(0.4)
+
+
+@benchmark("ShardedRoad.step[100km, in-process]", number=5)
+def bench_sharded_step():
+    from sharded_road import ShardedRoad
+    road = ShardedRoad(100000, 3, shard_count=4, seed=1, use_processes=False)
+    road.populate(15)
+    return lambda: road.step(0.4)
+
+
+@benchmark("MusicPlayer.find_song[5000]", number=5)
+def bench_find_song():
+    try:
+        from music_player import MusicPlayer
+    except ImportError:
+        return None # pygame not installed
+    random.seed(99)
+    words = ["Knight", "Rider", "Night", "Drive", "Turbo", "Boost", "Highway", "Dream", "Neon", "Road", "Star", "Heart"]
+    songs = [f"{' '.join(random.choices(words, k=3))} {index}.mp3" for index in range(5000)]
+    player = MusicPlayer.__new__(MusicPlayer) # find_song needs no audio device
+    search_terms = ["knight rider 42", "Neon Dream Drive", "turbo hart", "zzz no match"]
+    return lambda: [player.find_song(term, songs) for term in search_terms]
+
+
+@benchmark("KITT()[headless]", number=200)
+def bench_kitt_headless():
+    return lambda: KITT(enable_music=False)
+
+
+@benchmark("KITT()[with music]", number=5)
+def bench_kitt_with_music():
+    import vehicles
+    if vehicles.MusicPlayer is None:
+        return None # pygame not installed
+    def construct():
+        with null_output():
+            KITT()
+    return construct
+
+
+# --- Memory ---
+class DictLayoutVehicle:
+    """Reference of the previous vehicle layout: instance __dict__, own id string, symbol per instance."""
+    def __init__(self, vehicle_id, brand, model, max_speed, lane, position=0.0, vehicle_symbol="o-o"):
+        self.vehicle_id = vehicle_id
+        self.brand = brand
+        self.model = model
+        self.max_speed = float(max_speed)
+        self.speed = float(random.randint(int(self.max_speed * 0.3), int(self.max_speed * 0.7)))
+        self.lane = int(lane)
+        self.position = float(position)
+        self.vehicle_symbol = vehicle_symbol
+
+def _memory_fixture_arguments():
+    catalogue = get_catalogue()
+    index = random.randrange(10**6)
+    entry = index % len(catalogue)
+    return index, catalogue.brands[entry], catalogue.models[entry], 120, index % 3 + 1, float(index)
+
+@memory_benchmark("bytes_per_vehicle[Car]")
+def memory_car():
+    vehicle_number, brand, model, max_speed, lane, position = _memory_fixture_arguments()
+    return Car(vehicle_number, brand, model, max_speed, lane, position)
+
+@memory_benchmark("bytes_per_vehicle[dict layout reference]")
+def memory_dict_layout():
+    vehicle_number, brand, model, max_speed, lane, position = _memory_fixture_arguments()
+    return DictLayoutVehicle(f"ai_vehicle{vehicle_number}", brand, model, max_speed, lane, position)
+
+
+def measure_bytes_per_object(factory, count=MEMORY_SAMPLE_SIZE):
+    """Traced allocation growth per object (includes its list slot, floats and own strings)."""
+    random.seed(7)
+    factory() # Warm up caches (interned models, class attribute lookups)
+    tracemalloc.start()
+    start_bytes = tracemalloc.get_traced_memory()[0]
+    objects = [factory() for _ in range(count)]
+    used_bytes = tracemalloc.get_traced_memory()[0] - start_bytes
+    tracemalloc.stop()
+    del objects
+    return used_bytes / count
+
+
+# --- Runner ---
+def run_benchmark(setup_function, number, repeat):
+    """Returns per-call timings (seconds) of each repeat, or None if the benchmark is unavailable."""
+    with null_output():
+        function = setup_function()
+    if function is None:
+        return None
+    timings = []
+    for _ in range(repeat):
+        with null_output():
+            start = time.perf_counter()
+            for _ in range(number):
+                function()
+            timings.append((time.perf_counter() - start) / number)
+    return timings
+
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def find_baseline(history, commit):
+    """Latest stored run from a different commit (or the latest run when the commit is unknown)."""
+    for entry in reversed(history):
+        if commit is None or entry.get("commit") != commit:
+            return entry
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KITT simulation benchmarks")
+    parser.add_argument("-k", dest="name_filter", default="", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=5, help="Measurements per benchmark (best and median are reported)")
+    parser.add_argument("--history", default=HISTORY_FILE, help="JSON lines file results are appended to")
+    parser.add_argument("--no-save", action="store_true", help="Don't append results to the history file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown reported as regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 if a regression is found")
+    args = parser.parse_args()
+
+    commit = current_commit()
+    history = load_history(args.history)
+    baseline = find_baseline(history, commit)
+    baseline_results = baseline["results"] if baseline else {}
+
+    print(f"Commit: {commit or 'unknown'} | Python {platform.python_version()} | "
+          f"Baseline: {baseline['commit'] if baseline else 'none'}")
+    print(f"{'Benchmark':<38}{'best':>12}{'median':>12}{'vs base':>10}")
+    results = {}
+    regressions = []
+    for name, setup_function, number in BENCHMARKS:
+        if args.name_filter not in name:
+            continue
+        timings = run_benchmark(setup_function, number, args.repeat)
+        if timings is None:
+            print(f"{name:<38}{'skipped':>12}")
+            continue
+        best = min(timings)
+        results[name] = {"best_s": best, "median_s": statistics.median(timings), "repeat": args.repeat, "number": number}
+
+        change = ""
+        if name in baseline_results:
+            ratio = best / baseline_results[name]["best_s"]
+            change = f"{(ratio - 1) * 100:+.1f}%"
+            if ratio > 1 + args.threshold:
+                regressions.append((name, ratio))
+        print(f"{name:<38}{best * 1e3:>10.3f}ms{statistics.median(timings) * 1e3:>10.3f}ms{change:>10}")
+
+    memory_results = {}
+    for name, factory in MEMORY_BENCHMARKS:
+        if args.name_filter not in name:
+            continue
+        bytes_per_object = measure_bytes_per_object(factory)
+        memory_results[name] = {"bytes": bytes_per_object}
+        change = ""
+        baseline_memory = baseline.get("memory", {}) if baseline else {}
+        if name in baseline_memory:
+            ratio = bytes_per_object / baseline_memory[name]["bytes"]
+            change = f"{(ratio - 1) * 100:+.1f}%"
+            if ratio > 1 + args.threshold:
+                regressions.append((name, ratio))
+        print(f"{name:<50}{bytes_per_object:>10.1f} B{change:>10}")
+
+    if not args.no_save and (results or memory_results):
+        entry = {
+            "commit": commit,
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": results,
+            "memory": memory_results,
+        }
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    if regressions:
+        print("\nREGRESSIONS:")
+        for name, ratio in regressions:
+            print(f"  {name}: {ratio:.2f}x worse than {baseline['commit']}")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
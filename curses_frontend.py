@@ -0,0 +1,477 @@
+# curses_frontend.py
+#
+# Full-screen terminal front-end:  python main_simulation.py --ui curses
+# The simulation advances in real time (one step every SIM_TIME_STEP_S) while the screen
+# is redrawn at up to target_fps; only panels whose content changed are redrawn.
+# Keys: Right/Left accelerate/brake, Up/Down change lane, t turbo, k shield, o autopilot,
+#       r radar overlay, d drift, m radio, c chat, Space pause, +/- simulation speed,
+#       [/] zoom in/out, w whole road, q quit.
+# The print-based renderer in road_management.py stays the default UI.
+
+import io
+import math
+import sys
+import time
+from collections import deque
+from contextlib import redirect_stdout
+
+try:
+    import curses
+except ImportError: # Windows without the windows-curses package
+    curses = None
+
+from events import install_terminal_printer
+from instrumentation import PhaseProfiler
+from traffic_detectors import attach_traffic_detectors
+from main_simulation import SIM_TIME_STEP_S, NEW_AI_VEHICLE_PROBABILITY, setup_simulation, run_simulation_step
+from road_management import DETAIL_MAX_SCALE_M
+
+MINIMAP_DENSITY_CHARS = " .:-=+*#%@" # Vehicles per minimap bin: none ... 9 or more
+MESSAGE_HISTORY = 200
+SPEED_STEP_KMH = 10
+TIME_SCALES = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0)
+
+# Color pairs
+KITT_COLOR = 1
+RADAR_COLOR = 2
+WARNING_COLOR = 3
+HEADER_COLOR = 4
+
+
+class MessageLog(io.TextIOBase):
+    """File-like object collecting printed lines (stdout is redirected here while curses owns the screen)."""
+    def __init__(self, max_lines=MESSAGE_HISTORY):
+        self.lines = deque(maxlen=max_lines)
+        self.version = 0
+        self._partial_line = ""
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        text = self._partial_line + text
+        *complete_lines, self._partial_line = text.split("\n")
+        for line in complete_lines:
+            if line.strip():
+                self.lines.append(line.rstrip())
+                self.version += 1
+        return len(text)
+
+
+class Panel:
+    """A curses window that is only redrawn when its content changed."""
+    def __init__(self, height, width, top, left, title=None):
+        self.window = curses.newwin(height, width, top, left)
+        self.height, self.width = height, width
+        self.title = title
+        self.content_key = None
+
+    def needs_redraw(self, content_key):
+        if content_key == self.content_key:
+            return False
+        self.content_key = content_key
+        return True
+
+    def put(self, row, column, text, attributes=0):
+        if 0 <= row < self.height and column < self.width:
+            try:
+                self.window.addnstr(row, column, text, self.width - column - 1, attributes)
+            except curses.error: # Writing the bottom-right cell raises, the text is drawn anyway
+                pass
+
+    def begin(self):
+        self.window.erase()
+        if self.title:
+            self.window.box()
+            self.put(0, 2, f" {self.title} ", curses.A_BOLD)
+
+    def finish(self):
+        self.window.noutrefresh()
+
+
+class CursesFrontend:
+    """Real-time curses UI around a Road and KITT."""
+    def __init__(self, screen, road, kitt, recorder=None, profiler=None, target_fps=30,
+                 time_step_seconds=SIM_TIME_STEP_S, new_ai_vehicle_probability=NEW_AI_VEHICLE_PROBABILITY, traffic=None):
+        self.screen = screen
+        self.road = road
+        self.kitt = kitt
+        self.recorder = recorder
+        self.profiler = profiler if profiler is not None else PhaseProfiler(enabled=False)
+        self.frame_seconds = 1.0 / target_fps
+        self.time_step_seconds = time_step_seconds
+        self.new_ai_vehicle_probability = new_ai_vehicle_probability
+        self.traffic = traffic # Optional ScenarioTraffic (scenario.py)
+        self.time_scale_index = TIME_SCALES.index(1.0)
+        self.paused = False
+        self.running = True
+        self.radar_overlay = True
+        self.radar_contacts = []
+        self.at_intersection, self.intersection_pos = False, 0
+        self.step_count = 0
+        self.state_version = 0 # Changes whenever the simulation state changed (step or command)
+        self.messages = MessageLog()
+        self.frame_times = deque(maxlen=30)
+        self.panels = {}
+        self.original_viewport_width = road.viewport_width_characters
+
+    # --- Layout ---
+    def _create_panels(self):
+        rows, columns = self.screen.getmaxyx()
+        road = self.road
+        # Fit the road viewport to the terminal: each cell is 4 characters wide ("xxx|")
+        road.viewport_width_characters = max(5, min(60, (columns - 6) // 4))
+        road_height = road.lane_count * 2 + 3
+        minimap_height = 4
+        info_height = max(12, min(17, rows - 1 - road_height - minimap_height - 4)) # Up to every status line
+        top = 1
+        self.panels = {"header": Panel(1, columns, 0, 0)}
+        self.panels["road"] = Panel(road_height, columns, top, 0, "Road")
+        top += road_height
+        self.panels["minimap"] = Panel(minimap_height, columns, top, 0, "Minimap")
+        top += minimap_height
+        status_width = min(44, columns // 2)
+        self.panels["status"] = Panel(info_height, status_width, top, 0, "KITT")
+        self.panels["radar"] = Panel(info_height, columns - status_width, top, status_width, "Radar")
+        top += info_height
+        self.panels["messages"] = Panel(max(3, rows - top), columns, top, 0, "Messages")
+
+    # --- Input ---
+    def _record(self, action, parameter=""):
+        if self.recorder:
+            self.recorder.record_command(action, parameter)
+
+    def _run_outside_curses(self, function, *arguments):
+        """Runs an interactive (input() based) feature on the normal terminal, then returns to curses."""
+        curses.def_prog_mode()
+        curses.endwin()
+        try:
+            with redirect_stdout(sys.__stdout__):
+                return function(*arguments)
+        finally:
+            curses.reset_prog_mode()
+            self.screen.clear()
+            self.screen.refresh()
+            for panel in self.panels.values():
+                panel.content_key = None
+
+    def _drift(self):
+        kitt, road = self.kitt, self.road
+        if self.at_intersection and not road.intersection_drift_done.get(self.intersection_pos):
+            print("KITT: Attempting intersection drift...")
+            if self._run_outside_curses(kitt.activate_drift, road):
+                road.intersection_drift_done[self.intersection_pos] = True
+                kitt.score += 20 # Extra points for intersection drift
+                print("KITT: Successful intersection drift! Bonus points! (+20)")
+        else:
+            print("KITT: Manual free drift attempt...")
+            self._run_outside_curses(kitt.activate_drift)
+
+    def _chat(self):
+        def ask_and_speak():
+            message = input("Michael: ").strip()
+            if message:
+                self.kitt.speak(message)
+        self._run_outside_curses(ask_and_speak)
+
+    def handle_key(self, key):
+        kitt = self.kitt
+        if key in (ord("q"), ord("x")):
+            self._record("x")
+            self.running = False
+        elif key == curses.KEY_RIGHT:
+            self._record("h", str(SPEED_STEP_KMH))
+            kitt.accelerate(SPEED_STEP_KMH)
+        elif key == curses.KEY_LEFT:
+            self._record("f", str(SPEED_STEP_KMH))
+            kitt.brake(SPEED_STEP_KMH)
+        elif key in (curses.KEY_UP, curses.KEY_DOWN):
+            new_lane = kitt.lane - 1 if key == curses.KEY_UP else kitt.lane + 1
+            self._record("s", str(new_lane))
+            if kitt.change_lane(new_lane, self.road.lane_count):
+                print(f"KITT moved to lane {new_lane}.")
+        elif key == ord("t"):
+            self._record("t")
+            kitt.activate_turbo_boost()
+        elif key == ord("k"):
+            self._record("k")
+            kitt.toggle_shield()
+        elif key == ord("o"):
+            self._record("o")
+            kitt.toggle_autopilot()
+        elif key == ord("r"):
+            self.radar_overlay = not self.radar_overlay
+        elif key == ord("d"):
+            self._record("d")
+            self._drift()
+        elif key == ord("m"):
+            self._record("m")
+            self._run_outside_curses(kitt.start_radio_mode)
+        elif key == ord("c"):
+            self._record("sp")
+            self._chat()
+        elif key == ord(" "):
+            self.paused = not self.paused
+        elif key in (ord("+"), ord("=")):
+            self.time_scale_index = min(len(TIME_SCALES) - 1, self.time_scale_index + 1)
+        elif key == ord("-"):
+            self.time_scale_index = max(0, self.time_scale_index - 1)
+        elif key in (ord("["), ord("]")):
+            self.road.zoom(-1 if key == ord("[") else 1)
+        elif key == ord("w"):
+            self.road.zoom_to_fit()
+        elif key == curses.KEY_RESIZE:
+            self._create_panels()
+            return
+        else:
+            return
+        self.state_version += 1
+
+    def _read_keys(self):
+        """Handles all pending key presses without blocking."""
+        while self.running:
+            key = self.screen.getch()
+            if key == -1:
+                break
+            self.handle_key(key)
+
+    # --- Simulation ---
+    def step(self):
+        """One simulation step, as in the print-based main loop."""
+        kitt, road, profiler = self.kitt, self.road, self.profiler
+        if kitt.autopilot_active:
+            with profiler.phase("run_autopilot_logic"):
+                kitt.run_autopilot_logic(road)
+        with profiler.phase("check_intersection_for_kitt"):
+            self.at_intersection, self.intersection_pos = road.check_intersection_for_kitt()
+        if not run_simulation_step(road, kitt, profiler, self.time_step_seconds, self.new_ai_vehicle_probability, self.traffic):
+            print("Simulation ended for some reason (e.g: KITT took damage or road ended).")
+            self.running = False
+        self.step_count += 1
+        self.state_version += 1
+
+    # --- Drawing ---
+    def _draw_header(self):
+        panel = self.panels["header"]
+        frame_times = self.frame_times
+        fps = (len(frame_times) - 1) / (frame_times[-1] - frame_times[0]) if len(frame_times) > 1 and frame_times[-1] > frame_times[0] else 0.0
+        state = "PAUSED" if self.paused else f"x{TIME_SCALES[self.time_scale_index]:g}"
+        text = (f" KNIGHT RIDER | step {self.step_count} | {state} | {fps:4.0f} FPS | "
+                f"arrows drive  t turbo  k shield  o autopilot  r radar  d drift  m radio  c chat  space pause  [/] zoom  w whole road  q quit")
+        if not panel.needs_redraw(text):
+            return
+        panel.window.erase()
+        panel.put(0, 0, text.ljust(panel.width), curses.color_pair(HEADER_COLOR) | curses.A_BOLD)
+        panel.finish()
+
+    def _draw_road(self):
+        panel = self.panels["road"]
+        if not panel.needs_redraw((self.state_version, self.radar_overlay)):
+            return
+        road = self.road
+        viewport_start_m, viewport_end_m = road.viewport_bounds()
+        cells = road.viewport_cells(viewport_start_m, viewport_end_m)
+        radar_cells = set()
+        if self.radar_overlay:
+            for contact in self.radar_contacts:
+                vehicle = contact["vehicle"]
+                if viewport_start_m <= vehicle.position < viewport_end_m:
+                    cell_index = min(int((vehicle.position - viewport_start_m) / road.display_scale), len(cells[0]) - 1)
+                    radar_cells.add((vehicle.lane - 1, cell_index))
+
+        panel.begin()
+        panel.put(0, 12, f" {viewport_start_m:.0f}m - {viewport_end_m:.0f}m | 1 cell = {road.display_scale:.0f}m"
+                         f"{' (vehicle counts)' if road.display_scale > DETAIL_MAX_SCALE_M else ''} | limit {road.speed_limit_kmh}km/h ")
+        kitt_attributes = curses.color_pair(KITT_COLOR) | curses.A_BOLD
+        radar_attributes = curses.color_pair(RADAR_COLOR) | curses.A_BOLD
+        for lane_index, lane_cells in enumerate(cells):
+            row = 1 + lane_index * 2
+            panel.put(row, 1, f"L{lane_index + 1}|")
+            for cell_index, cell in enumerate(lane_cells):
+                column = 4 + cell_index * 4
+                attributes = 0
+                if cell == self.kitt.vehicle_symbol and self.kitt.lane - 1 == lane_index:
+                    attributes = kitt_attributes
+                elif (lane_index, cell_index) in radar_cells:
+                    attributes = radar_attributes
+                panel.put(row, column, cell.center(3), attributes)
+                panel.put(row, column + 3, "|")
+            if lane_index < road.lane_count - 1:
+                panel.put(row + 1, 1, "   " + "+---" * len(lane_cells) + "+")
+        panel.finish()
+
+    def _draw_minimap(self):
+        panel = self.panels["minimap"]
+        if not panel.needs_redraw(self.state_version):
+            return
+        road = self.road
+        bin_count = panel.width - 4
+        counts = road.lane_index.counts_in_bins(0, road.length_meters, bin_count)
+        last_density = len(MINIMAP_DENSITY_CHARS) - 1
+        density_line = "".join(MINIMAP_DENSITY_CHARS[min(count, last_density)] for count in counts)
+
+        bin_width_m = road.length_meters / bin_count
+        marker_cells = [" "] * bin_count
+        viewport_start_m, viewport_end_m = road.viewport_bounds()
+        for index in range(int(viewport_start_m / bin_width_m), min(bin_count, int(math.ceil(viewport_end_m / bin_width_m)))):
+            marker_cells[index] = "="
+        for intersection_position_m in road.intersection_positions:
+            marker_cells[min(bin_count - 1, int(intersection_position_m / bin_width_m))] = "X"
+        kitt_bin = min(bin_count - 1, max(0, int(self.kitt.position / bin_width_m)))
+        marker_cells[kitt_bin] = "K"
+
+        panel.begin()
+        panel.put(1, 2, density_line)
+        panel.put(2, 2, "".join(marker_cells))
+        panel.put(2, 2 + kitt_bin, "K", curses.color_pair(KITT_COLOR) | curses.A_BOLD)
+        panel.finish()
+
+    def _draw_status(self):
+        panel = self.panels["status"]
+        if not panel.needs_redraw(self.state_version):
+            return
+        kitt, road = self.kitt, self.road
+        panel.begin()
+        # Warnings first, so they stay visible when the panel is too short for every status line
+        risk, threat = road.calculate_crash_risk()
+        risk_attributes = curses.color_pair(WARNING_COLOR) | curses.A_BOLD if risk in ("High", "CRITICAL!") else 0
+        risk_text = f"Crash Risk: {risk}"
+        if threat:
+            risk_text += f" ({threat.vehicle_id} @ {int(threat.position - kitt.position)}m)"
+        panel.put(1, 2, risk_text, risk_attributes)
+        traffic_risk = road.traffic_risk_statistics()
+        panel.put(2, 2, f"Traffic: {traffic_risk['CRITICAL!'] + traffic_risk['High']} near misses, "
+                        f"{traffic_risk['close_share']:.0%} too close")
+        row = 3
+        if road.active_intersection_message:
+            panel.put(row, 2, road.active_intersection_message, curses.A_BOLD)
+            row += 1
+        if self.at_intersection and not road.intersection_drift_done.get(self.intersection_pos):
+            panel.put(row, 2, "Time to drift, Michael! (d)", curses.color_pair(WARNING_COLOR) | curses.A_BOLD)
+            row += 1
+        for line in kitt.show_status()[1:] + kitt.show_extra_status():
+            panel.put(row, 2, line)
+            row += 1
+        panel.finish()
+
+    def _draw_radar(self):
+        panel = self.panels["radar"]
+        if not panel.needs_redraw((self.state_version, self.radar_overlay)):
+            return
+        panel.begin()
+        if not self.radar_overlay:
+            panel.put(1, 2, "Radar overlay off (r)")
+        elif not self.radar_contacts:
+            panel.put(1, 2, f"No vehicles within {self.kitt.radar_max_range_m}m")
+        else:
+            panel.put(1, 2, f"{len(self.radar_contacts)} contacts within {self.kitt.radar_max_range_m}m", curses.A_BOLD)
+            for row, contact in enumerate(self.radar_contacts[:panel.height - 3], start=2):
+                sign = "+" if contact["direction"] == "Ahead" else "-"
+                panel.put(row, 2, f"{sign}{contact['distance_m']:4.0f}m L{contact['lane']} {contact['speed_kmh']:3.0f}km/h "
+                                  f"{contact['id']} ({contact['model']})",
+                          curses.color_pair(RADAR_COLOR) if contact["distance_m"] < 100 else 0)
+        panel.finish()
+
+    def _draw_messages(self):
+        panel = self.panels["messages"]
+        if not panel.needs_redraw(self.messages.version):
+            return
+        panel.begin()
+        visible_lines = list(self.messages.lines)[-(panel.height - 2):]
+        for row, line in enumerate(visible_lines, start=1):
+            panel.put(row, 2, line)
+        panel.finish()
+
+    def draw(self):
+        if self.radar_overlay and self.panels["radar"].content_key != (self.state_version, True):
+            self.radar_contacts = self.kitt.radar_contacts(self.road) or []
+        self._draw_header()
+        self._draw_road()
+        self._draw_minimap()
+        self._draw_status()
+        self._draw_radar()
+        self._draw_messages()
+        curses.doupdate() # One terminal update for all changed panels
+
+    # --- Main loop ---
+    def run(self):
+        curses.curs_set(0)
+        self.screen.nodelay(True)
+        self.screen.keypad(True)
+        if curses.has_colors():
+            curses.start_color()
+            curses.use_default_colors()
+            curses.init_pair(KITT_COLOR, curses.COLOR_RED, -1)
+            curses.init_pair(RADAR_COLOR, curses.COLOR_GREEN, -1)
+            curses.init_pair(WARNING_COLOR, curses.COLOR_YELLOW, -1)
+            curses.init_pair(HEADER_COLOR, curses.COLOR_BLACK, curses.COLOR_CYAN)
+        self._create_panels()
+
+        next_step_time = time.perf_counter()
+        try:
+            with redirect_stdout(self.messages):
+                while self.running:
+                    frame_start = time.perf_counter()
+                    self.frame_times.append(frame_start)
+                    self._read_keys()
+                    if not self.paused and self.running and frame_start >= next_step_time:
+                        self.step()
+                        next_step_time = frame_start + self.time_step_seconds / TIME_SCALES[self.time_scale_index]
+                    elif self.paused:
+                        next_step_time = frame_start
+                    with self.profiler.phase("curses_draw"):
+                        self.draw()
+                    remaining = self.frame_seconds - (time.perf_counter() - frame_start)
+                    if remaining > 0:
+                        time.sleep(remaining)
+        finally:
+            self.road.viewport_width_characters = self.original_viewport_width
+
+
+def run_curses_simulation(record_path=None, profiler=None, target_fps=30, scenario=None, telemetry_address=None):
+    """Curses counterpart of main_simulation.start_interactive_simulation."""
+    if curses is None:
+        raise RuntimeError("The curses module is not available (on Windows: pip install windows-curses)")
+    main_road, kitt, recorder = setup_simulation(record_path, scenario)
+    traffic = scenario.start_traffic() if scenario is not None else None
+    time_step_seconds = scenario.time_step_seconds if scenario is not None else SIM_TIME_STEP_S
+    main_road.clear_screen = False
+    install_terminal_printer(main_road.events) # Event messages go to the message log while curses runs
+    detectors = attach_traffic_detectors(main_road, profiler) if profiler is not None and profiler.enabled else None
+    telemetry = None
+    if telemetry_address:
+        from telemetry import start_telemetry
+        telemetry = start_telemetry(telemetry_address, main_road, profiler)
+    frontend = None
+
+    def run(screen):
+        nonlocal frontend
+        frontend = CursesFrontend(screen, main_road, kitt, recorder, profiler, target_fps, time_step_seconds, traffic=traffic)
+        frontend.run()
+
+    try:
+        curses.wrapper(run)
+    finally:
+        if recorder:
+            recorder.close()
+        if telemetry:
+            telemetry.publish_now(main_road)
+            telemetry.close()
+    if frontend:
+        for line in list(frontend.messages.lines)[-10:]:
+            print(line)
+    if recorder:
+        print(f"Run recorded to {record_path} ({recorder.tick} steps). Replay: python recorder.py {record_path}")
+    if telemetry:
+        print(f"Telemetry was served on {telemetry.address}")
+    print("\n--- SIMULATION ENDED ---")
+    print(f"KITT Final Status: Score: {kitt.score}, Damage: {kitt.damage:.0f}%")
+
+    if profiler is not None and profiler.enabled:
+        print("\n--- PHASE TIMINGS ---")
+        for line in profiler.report_lines():
+            print(f"  {line}")
+        print("\n--- TRAFFIC DETECTORS ---")
+        for line in detectors.report_lines():
+            print(f"  {line}")
+    return main_road, kitt
@@ -0,0 +1,180 @@
+# events.py
+
+from collections import Counter, namedtuple
+
+# --- Event types ---
+# Events are plain tuples; their terminal text is only formatted when a printer asks for it.
+
+class Collision(namedtuple("Collision", "vehicle_id brand model position damage")):
+    __slots__ = ()
+    def message(self):
+        return (f"\n!!! COLLISION DETECTED !!!\nKITT collided with {self.vehicle_id} ({self.brand} {self.model})\n"
+                f"{self.vehicle_id} removed from road due to collision.")
+
+class ShieldAbsorbed(namedtuple("ShieldAbsorbed", "amount shield_power")):
+    __slots__ = ()
+    def message(self):
+        return f"KITT: Shield absorbed {self.amount:.0f} damage! Shield Power: {self.shield_power:.0f}%"
+
+class ShieldDepleted(namedtuple("ShieldDepleted", "")):
+    __slots__ = ()
+    def message(self):
+        return "KITT: Shield power depleted! Shield disabled!"
+
+class DamageTaken(namedtuple("DamageTaken", "amount total_damage")):
+    __slots__ = ()
+    def message(self):
+        return f"KITT: {self.amount:.0f} damage taken! Total Damage: {self.total_damage:.0f}%"
+
+class CriticalDamage(namedtuple("CriticalDamage", "total_damage")):
+    __slots__ = ()
+    def message(self):
+        return "KITT: Critical damage! Systems in danger!"
+
+class TurboStarted(namedtuple("TurboStarted", "speed")):
+    __slots__ = ()
+    def message(self):
+        return "KITT: TURBO BOOST ACTIVE!!!"
+
+class TurboEnded(namedtuple("TurboEnded", "speed")):
+    __slots__ = ()
+    def message(self):
+        return "KITT: Turbo Boost ended."
+
+class TurboNotReady(namedtuple("TurboNotReady", "cooldown_steps")):
+    __slots__ = ()
+    def message(self):
+        return f"KITT: Turbo Boost not ready yet! Remaining time: {self.cooldown_steps} steps."
+
+class AutopilotManeuver(namedtuple("AutopilotManeuver", "action lane safe")):
+    __slots__ = ()
+    def message(self):
+        if not self.safe:
+            return "KITT (Autopilot): Warning! No safe manoeuvre available."
+        if self.action.startswith("change"):
+            return f"KITT (Autopilot): Slower traffic ahead, changing to lane {self.lane}."
+        if self.action.startswith("brake"):
+            return "KITT (Autopilot): Slow vehicle detected ahead, braking."
+        return None
+
+class IntersectionReached(namedtuple("IntersectionReached", "position")):
+    __slots__ = ()
+    def message(self):
+        return f"KITT: You're at an intersection Michael ({self.position}m)! Time to drift! (Command: d)"
+
+class DriftResult(namedtuple("DriftResult", "game_score points")):
+    __slots__ = ()
+    def message(self):
+        if self.game_score >= 300:
+            return "KITT: Perfect drift Michael! Like a true master!"
+        if self.game_score >= 150:
+            return "KITT: Good attempt Michael, you're improving!"
+        if self.game_score > 0:
+            return "KITT: Not bad Michael, keep practicing."
+        return "KITT: Didn't work this time Michael, but don't worry, we can try again."
+
+class EndOfRoad(namedtuple("EndOfRoad", "position")):
+    __slots__ = ()
+    def message(self):
+        return "\n### KITT REACHED END OF ROAD! CONGRATULATIONS! ###"
+
+class KittDestroyed(namedtuple("KittDestroyed", "damage")):
+    __slots__ = ()
+    def message(self):
+        return "\n### KITT IS UNUSABLE! MISSION FAILED! ###"
+
+EVENT_TYPES = (Collision, ShieldAbsorbed, ShieldDepleted, DamageTaken, CriticalDamage, TurboStarted, TurboEnded,
+               TurboNotReady, AutopilotManeuver, IntersectionReached, DriftResult, EndOfRoad, KittDestroyed)
+
+
+class EventBus:
+    """
+    Delivers simulation events to subscribers. Immediate subscribers are called on publish,
+    batched ones get the tick's events as one list from flush() (called once per tick).
+    publish() for a type nobody subscribed to is a set lookup: the event is not even created.
+    """
+    def __init__(self):
+        self._immediate = {} # event type -> tuple of handlers
+        self._batched = [] # (handler, event types)
+        self._batched_types = set()
+        self._wanted_types = set()
+        self._pending = [] # Events for batched subscribers since the last flush
+
+    def subscribe(self, handler, event_types=None, batched=False):
+        """Calls handler(event), or handler(list of events) once per tick if batched, for event_types (None: all)."""
+        event_types = frozenset(EVENT_TYPES if event_types is None else event_types)
+        if batched:
+            self._batched.append((handler, event_types))
+        else:
+            for event_type in event_types:
+                self._immediate[event_type] = self._immediate.get(event_type, ()) + (handler,)
+        self._update_types()
+        return handler
+
+    def unsubscribe(self, handler):
+        self._batched = [(batched_handler, types) for batched_handler, types in self._batched if batched_handler != handler]
+        for event_type, handlers in list(self._immediate.items()):
+            handlers = tuple(immediate_handler for immediate_handler in handlers if immediate_handler != handler)
+            if handlers:
+                self._immediate[event_type] = handlers
+            else:
+                del self._immediate[event_type]
+        self._update_types()
+
+    def _update_types(self):
+        self._batched_types = set().union(*(types for _, types in self._batched))
+        self._wanted_types = self._batched_types | set(self._immediate)
+
+    def wants(self, event_type):
+        """True if publishing event_type reaches anyone (to skip expensive event fields)."""
+        return event_type in self._wanted_types
+
+    def publish(self, event_type, *fields):
+        """Creates and delivers event_type(*fields) if anyone subscribed to it."""
+        if event_type not in self._wanted_types:
+            return
+        event = event_type(*fields)
+        for handler in self._immediate.get(event_type, ()):
+            handler(event)
+        if event_type in self._batched_types:
+            self._pending.append(event)
+
+    def flush(self):
+        """Delivers the events published since the last flush to the batched subscribers."""
+        if not self._pending:
+            return
+        events, self._pending = self._pending, []
+        for handler, event_types in self._batched:
+            selected_events = [event for event in events if type(event) in event_types]
+            if selected_events:
+                handler(selected_events)
+
+
+def print_event(event):
+    """Terminal subscriber: prints the event's message."""
+    text = event.message()
+    if text is not None:
+        print(text)
+
+
+def install_terminal_printer(event_bus=None):
+    """Subscribes the terminal printer (once) to event_bus (default: the shared bus)."""
+    event_bus = event_bus if event_bus is not None else simulation_events
+    event_bus.unsubscribe(print_event)
+    return event_bus.subscribe(print_event)
+
+
+class EventCounter:
+    """Batched metrics subscriber: number of events of each type."""
+    def __init__(self, event_bus=None, event_types=None):
+        self.counts = Counter()
+        if event_bus is not None:
+            event_bus.subscribe(self.record, event_types, batched=True)
+
+    def record(self, events):
+        for event in events:
+            self.counts[type(event).__name__] += 1
+
+
+# Bus used by Road and KITT unless they are given their own (Road.events / KITT.events)
+simulation_events = EventBus()
@@ -0,0 +1,186 @@
+# instrumentation.py
+
+import bisect
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+
+# Histogram bucket upper bounds in nanoseconds: 1 µs to ~16.8 s, four buckets per doubling
+BUCKET_BOUNDS_NS = [int(1000 * 2 ** (i / 4)) for i in range(97)]
+# Only every doubling is exported as a Prometheus bucket, to keep the text output small
+PROMETHEUS_BUCKET_STEP = 4
+
+_DISABLED_PHASE = nullcontext()
+
+
+class PhaseHistogram:
+    """Log-bucketed histogram of phase durations (fixed memory, O(log buckets) per sample)."""
+    def __init__(self):
+        self.bucket_counts = [0] * (len(BUCKET_BOUNDS_NS) + 1) # Last bucket is overflow (+Inf)
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, duration_ns):
+        self.bucket_counts[bisect.bisect_left(BUCKET_BOUNDS_NS, duration_ns)] += 1
+        self.count += 1
+        self.total_ns += duration_ns
+        if duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+
+    def percentile_ns(self, percent):
+        """Upper bound of the bucket holding given percentile (capped at the observed maximum)."""
+        if not self.count:
+            return 0
+        rank = self.count * percent / 100.0
+        cumulative = 0
+        for index, bucket_count in enumerate(self.bucket_counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                if index < len(BUCKET_BOUNDS_NS):
+                    return min(BUCKET_BOUNDS_NS[index], self.max_ns)
+                break
+        return self.max_ns
+
+    def summary(self):
+        to_ms = 1e-6
+        return {
+            "count": self.count,
+            "total_ms": self.total_ns * to_ms,
+            "mean_ms": (self.total_ns / self.count) * to_ms if self.count else 0.0,
+            "p50_ms": self.percentile_ns(50) * to_ms,
+            "p95_ms": self.percentile_ns(95) * to_ms,
+            "p99_ms": self.percentile_ns(99) * to_ms,
+            "max_ms": self.max_ns * to_ms,
+        }
+
+
+class _PhaseTimer:
+    """Context manager timing one phase into its histogram (one per with block, so nesting is safe)."""
+    __slots__ = ("histogram", "start_ns")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.start_ns = 0
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.record(time.perf_counter_ns() - self.start_ns)
+        return False
+
+
+class PhaseProfiler:
+    """
+    Per-phase tick timing. Use as:  with profiler.phase("advance_simulation_step"): ...
+    When disabled, phase() returns a shared no-op context manager.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = bool(enabled)
+        self.histograms = {}
+        self.exporters = {} # name -> object with to_dict() and to_prometheus(metric_prefix), written along (e.g. TrafficDetectors)
+
+    def phase(self, name):
+        if not self.enabled:
+            return _DISABLED_PHASE
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = PhaseHistogram()
+        return _PhaseTimer(histogram)
+
+    def reset(self):
+        self.histograms.clear()
+
+    def to_dict(self):
+        return {name: histogram.summary() for name, histogram in self.histograms.items()}
+
+    def to_json(self):
+        data = self.to_dict()
+        for name, exporter in self.exporters.items():
+            data[name] = exporter.to_dict()
+        return json.dumps(data, indent=2)
+
+    def to_prometheus(self, metric_prefix="kitt"):
+        """Prometheus text exposition: one histogram plus p50/p95/p99 gauges per phase."""
+        histogram_name = f"{metric_prefix}_phase_duration_seconds"
+        quantile_name = f"{metric_prefix}_phase_duration_quantile_seconds"
+        lines = [
+            f"# HELP {histogram_name} Duration of simulation loop phases.",
+            f"# TYPE {histogram_name} histogram",
+        ]
+        for name, histogram in self.histograms.items():
+            cumulative = 0
+            for index, bucket_count in enumerate(histogram.bucket_counts[:-1]):
+                cumulative += bucket_count
+                if index % PROMETHEUS_BUCKET_STEP == 0:
+                    lines.append(f'{histogram_name}_bucket{{phase="{name}",le="{BUCKET_BOUNDS_NS[index] / 1e9:.9g}"}} {cumulative}')
+            lines.append(f'{histogram_name}_bucket{{phase="{name}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{histogram_name}_sum{{phase="{name}"}} {histogram.total_ns / 1e9:.9g}')
+            lines.append(f'{histogram_name}_count{{phase="{name}"}} {histogram.count}')
+        lines.append(f"# HELP {quantile_name} Approximate phase duration quantiles.")
+        lines.append(f"# TYPE {quantile_name} gauge")
+        for name, histogram in self.histograms.items():
+            for percent in (50, 95, 99):
+                lines.append(f'{quantile_name}{{phase="{name}",quantile="{percent / 100:g}"}} {histogram.percentile_ns(percent) / 1e9:.9g}')
+        text = "\n".join(lines) + "\n"
+        return text + "".join(exporter.to_prometheus(metric_prefix) for exporter in self.exporters.values())
+
+    def write(self, file_path):
+        """Writes Prometheus text for .prom/.txt paths, JSON otherwise."""
+        file_path = str(file_path)
+        content = self.to_prometheus() if file_path.endswith((".prom", ".txt")) else self.to_json()
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def report_lines(self):
+        """Human readable table of phase timings."""
+        lines = [f"{'Phase':<30}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+        for name, summary in self.to_dict().items():
+            lines.append(f"{name:<30}{summary['count']:>8}{summary['p50_ms']:>10.3f}{summary['p95_ms']:>10.3f}"
+                         f"{summary['p99_ms']:>10.3f}{summary['max_ms']:>10.3f}")
+        return lines
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler: a background thread samples the stack of the profiled thread
+    every interval_seconds. Output is in collapsed-stack format (flame graph tools).
+    """
+    def __init__(self, interval_seconds=0.005, thread_id=None):
+        self.interval_seconds = float(interval_seconds)
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.stack_counts = Counter()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _sample_loop(self):
+        while not self._stop_event.wait(self.interval_seconds):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]})")
+                frame = frame.f_back
+            if stack:
+                self.stack_counts[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name="kitt-sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def write_collapsed(self, file_path):
+        with open(file_path, "w", encoding="utf-8") as f:
+            for stack, count in self.stack_counts.most_common():
+                f.write(f"{stack} {count}\n")
@@ -6,57 +6,204 @@ import os # For clear_terminal (can also be called from road_management.py)
 
 # Import necessary classes from our other Python files
 from vehicles import KITT # Import KITT class directly
-from road_management import Road # Import Road class
+from road_management import Road, CRASH_RISK_NAMES # Import Road class
+from instrumentation import PhaseProfiler
+from traffic_detectors import attach_traffic_detectors
+from events import Collision, DamageTaken, ShieldAbsorbed, IntersectionReached, install_terminal_printer
 
 # If drift module is in a separate file, you can import it too:
 # import drift_module # Example: from drift_game import start_drift_game
 
-def start_interactive_simulation():
+# Simulation Settings
+ROAD_LENGTH_M = 2000  # Total road length (meters)
+LANE_COUNT = 3
+ROAD_SPEED_LIMIT_KMH = 120
+SIM_TIME_STEP_S = 0.4 # Duration of each simulation step (seconds) - for smoother movement
+NEW_AI_VEHICLE_PROBABILITY = 0.10 # Probability of adding new AI vehicle each step
+
+# Fast-forward ("n" and "u" commands)
+FAST_FORWARD_FPS = 10 # Road redraws per second while fast-forwarding (0: only when it stops)
+FAST_FORWARD_STEPS = 10 # Steps of "n" without a count
+FAST_FORWARD_MAX_STEPS = 5000 # Steps of "u" without a count
+STOP_CONDITIONS = ("intersection", "risk", "collision", "damage")
+STOP_RISK_LEVELS = CRASH_RISK_NAMES[:2] # "risk" stops at these crash risk levels (CRITICAL!, High)
+_STOP_EVENT_TYPES = {"collision": (Collision,), "damage": (DamageTaken, ShieldAbsorbed)}
+
+def setup_simulation(record_path=None, scenario=None):
+    """
+    Creates the road, KITT and initial traffic (and the recorder, if record_path is given).
+    With a Scenario (see scenario.py) they are built from it instead of the settings above.
+    """
+    if scenario is not None:
+        main_road, kitt = scenario.create_road()
+        time_step_seconds = scenario.time_step_seconds
+    else:
+        # Create Objects
+        main_road = Road(ROAD_LENGTH_M, LANE_COUNT, ROAD_SPEED_LIMIT_KMH)
+        
+        # Start KITT in random lane at beginning of road
+        kitt_starting_lane = random.randint(1, main_road.lane_count)
+        kitt_starting_position = 50.0 # Start a bit ahead on the road
+        kitt = KITT(lane=kitt_starting_lane, position=kitt_starting_position)
+        
+        main_road.add_kitt_reference(kitt) # Introduce KITT object to Road class
+        time_step_seconds = SIM_TIME_STEP_S
+
+    recorder = None
+    if record_path:
+        from recorder import TrajectoryRecorder
+        recorder = TrajectoryRecorder(record_path, main_road, time_step_seconds=time_step_seconds)
+        main_road.attach_recorder(recorder)
+
+    if scenario is None:
+        # Add some random AI vehicles to road initially
+        for _ in range(random.randint(3, 6)): # Initial AI vehicle count
+            main_road.add_random_ai_vehicle()
+    return main_road, kitt, recorder
+
+def run_simulation_step(main_road, kitt, profiler, time_step_seconds=SIM_TIME_STEP_S,
+                        new_ai_vehicle_probability=NEW_AI_VEHICLE_PROBABILITY, traffic=None):
+    """
+    Advances road and KITT by one step and handles collisions. Returns False when the simulation ended.
+    A scenario's ScenarioTraffic (traffic) adds its scheduled arrivals and sets the spawn probability.
+    """
+    if traffic is not None:
+        with profiler.phase("scenario_traffic"):
+            new_ai_vehicle_probability = traffic.before_step(main_road, time_step_seconds)
+    # Advance Simulation Step and Update Other Vehicles
+    with profiler.phase("advance_simulation_step"):
+        simulation_continues = main_road.advance_simulation_step(time_step_seconds=time_step_seconds, new_ai_vehicle_probability=new_ai_vehicle_probability)
+    if not simulation_continues:
+        main_road.events.flush()
+        return False
+    
+    # Update KITT's turbo and other states (damage etc. might be in advance_simulation_step)
+    with profiler.phase("update_turbo_step"):
+        kitt.update_turbo_step()
+    kitt.drift_mode_active_temporary = False # Reset drift mode after each step (was one-time)
+
+    # Collision Check (between KITT and AI vehicles)
+    with profiler.phase("check_and_handle_collisions"):
+        main_road.check_and_handle_collisions(kitt)
+    main_road.events.flush() # Deliver this tick's events to batched subscribers (recorder, metrics)
+    return True
+
+def parse_fast_forward(parameter, default_steps, default_conditions=()):
+    """
+    "[steps] [condition,condition...]" of the n and u commands -> (steps, stop conditions).
+    Raises ValueError for an unknown condition or a step count below 1.
+    """
+    steps, conditions = default_steps, default_conditions
+    for token in parameter.split():
+        if token.isdigit():
+            steps = int(token)
+        else:
+            conditions = tuple(condition for condition in token.split(",") if condition)
+            unknown = [condition for condition in conditions if condition not in STOP_CONDITIONS]
+            if unknown:
+                raise ValueError(f"Unknown stop condition '{unknown[0]}' (use {', '.join(STOP_CONDITIONS)})")
+    if steps < 1:
+        raise ValueError("Step count must be at least 1")
+    return steps, conditions
+
+def fast_forward(main_road, kitt, profiler, time_step_seconds, steps, stop_conditions=(), traffic=None,
+                 render_fps=FAST_FORWARD_FPS):
+    """
+    Runs up to steps ticks back to back (autopilot and simulation step, no input and no pause),
+    redrawing the road at most render_fps times per second. Stops early after the first tick
+    that meets a stop condition (see STOP_CONDITIONS). Returns (ticks run, reason, simulation continues);
+    reason is None if all steps ran.
+    """
+    stop_events = []
+    stop_event_types = [event_type for condition in stop_conditions for event_type in _STOP_EVENT_TYPES.get(condition, ())]
+    note_stop_event = stop_events.append
+    if stop_event_types:
+        main_road.events.subscribe(note_stop_event, stop_event_types)
+    frame_interval = 1.0 / render_fps if render_fps > 0 else float("inf")
+    next_frame_time = time.perf_counter() + frame_interval
+    try:
+        for tick in range(1, steps + 1):
+            if kitt.autopilot_active:
+                with profiler.phase("run_autopilot_logic"):
+                    kitt.run_autopilot_logic(main_road)
+            if not run_simulation_step(main_road, kitt, profiler, time_step_seconds, traffic=traffic):
+                return tick, "end", False
+
+            if stop_events:
+                return tick, type(stop_events[0]).__name__, True
+            if "intersection" in stop_conditions:
+                with profiler.phase("check_intersection_for_kitt"):
+                    at_intersection, intersection_pos = main_road.check_intersection_for_kitt()
+                if at_intersection and not main_road.intersection_drift_done.get(intersection_pos):
+                    return tick, "intersection", True
+            if "risk" in stop_conditions:
+                risk_level = main_road.calculate_crash_risk()[0]
+                if risk_level in STOP_RISK_LEVELS:
+                    return tick, f"{risk_level} crash risk", True
+
+            now = time.perf_counter()
+            if now >= next_frame_time:
+                next_frame_time = now + frame_interval
+                with profiler.phase("show_text_based_road"):
+                    main_road.show_text_based_road()
+                print(f">> Fast-forward: step {tick}/{steps}")
+        return steps, None, True
+    finally:
+        if stop_event_types:
+            main_road.events.unsubscribe(note_stop_event)
+
+def start_interactive_simulation(record_path=None, profiler=None, scenario=None, fast_forward_fps=FAST_FORWARD_FPS,
+                                 telemetry_address=None):
     """
     Starts and manages the main simulation loop.
+    If record_path is given, every step is written there as a trajectory recording (see recorder.py).
+    If a Scenario is given (see scenario.py), road, traffic and time step come from it.
+    If an enabled PhaseProfiler is given, each phase of the loop is timed into it and traffic
+    detectors (see traffic_detectors.py) are written with its metrics.
+    fast_forward_fps limits the road redraws of the n and u commands.
+    With telemetry_address ("[HOST:]PORT"), the run is served live over HTTP (see telemetry.py).
     """
+    if profiler is None:
+        profiler = PhaseProfiler(enabled=False)
+
     clear_terminal = lambda: os.system('cls' if os.name == 'nt' else 'clear') # Simple clear function
 
     print("=== KNIGHT RIDER - KITT Simulation Starting... ===")
     time.sleep(1)
 
-    # Simulation Settings
-    road_length_m = 2000  # Total road length (meters)
-    lane_count = 3
-    road_speed_limit_kmh = 120
-    sim_time_step_s = 0.4 # Duration of each simulation step (seconds) - for smoother movement
-    new_ai_vehicle_probability = 0.10 # Probability of adding new AI vehicle each step
-
-    # Create Objects
-    main_road = Road(road_length_m, lane_count, road_speed_limit_kmh)
-    
-    # Start KITT in random lane at beginning of road
-    kitt_starting_lane = random.randint(1, main_road.lane_count)
-    kitt_starting_position = 50.0 # Start a bit ahead on the road
-    kitt = KITT(lane=kitt_starting_lane, position=kitt_starting_position)
-    
-    main_road.add_kitt_reference(kitt) # Introduce KITT object to Road class
-
-    # Add some random AI vehicles to road initially
-    for _ in range(random.randint(3, 6)): # Initial AI vehicle count
-        main_road.add_random_ai_vehicle()
+    main_road, kitt, recorder = setup_simulation(record_path, scenario)
+    install_terminal_printer(main_road.events)
+    detectors = attach_traffic_detectors(main_road, profiler) if profiler.enabled else None
+    telemetry = None
+    if telemetry_address:
+        from telemetry import start_telemetry
+        telemetry = start_telemetry(telemetry_address, main_road, profiler)
+        print(f"Telemetry: {telemetry.address}")
+        time.sleep(1)
+    traffic = scenario.start_traffic() if scenario is not None else None
+    time_step_seconds = scenario.time_step_seconds if scenario is not None else SIM_TIME_STEP_S
 
     while True:
         # First let KITT's autopilot run (if active)
         if kitt.autopilot_active:
-            kitt.run_autopilot_logic(main_road)
+            with profiler.phase("run_autopilot_logic"):
+                kitt.run_autopilot_logic(main_road)
 
-        main_road.show_text_based_road() # Draw the road (KITT argument removed)
+        with profiler.phase("show_text_based_road"):
+            main_road.show_text_based_road() # Draw the road (KITT argument removed)
 
         # Intersection Check (for KITT)
-        at_intersection, intersection_pos = main_road.check_intersection_for_kitt()
+        with profiler.phase("check_intersection_for_kitt"):
+            at_intersection, intersection_pos = main_road.check_intersection_for_kitt()
         if at_intersection and not main_road.intersection_drift_done.get(intersection_pos):
-            print(f"KITT: You're at an intersection Michael ({intersection_pos}m)! Time to drift! (Command: d)")
+            main_road.events.publish(IntersectionReached, intersection_pos)
 
         # User Commands
         print("\n--- CONTROL PANEL ---")
         print("COMMANDS: h <speed> | f <brake> | s <lane_no> | t (turbo) | k (shield) | o (autopilot)")
         print("          m (music) | d (drift) | sp (speak) | r (radar) | a (step) | x (exit)")
+        print("          n [steps] [stops] (fast-forward) | u [stops] [max steps] (run until: intersection,risk,collision,damage)")
+        print("          z in|out|fit|<m per char> (zoom; coarse zoom shows vehicle counts per cell)")
         command_input = input(f"KITT [Speed:{kitt.speed:.0f} Pos:{kitt.position:.0f} Damage:{kitt.damage:.0f}%] > ").strip().lower()
 
         main_action = "a" # Default action is to advance step
@@ -73,70 +220,103 @@ def start_interactive_simulation():
         else:
             main_action = command_input
 
+        if recorder:
+            recorder.record_command(main_action, parameter)
+
         if main_action == "x":
             print("Exiting simulation...")
             break
-        elif main_action == "a":
-            print("> Advancing step...")
-            # pass # Just advance step (will happen at end of loop)
-        elif main_action == "h":
-            try:
-                kitt.accelerate(float(parameter))
-            except ValueError:
-                print("Invalid speed value!")
-        elif main_action == "f":
-            try:
-                kitt.brake(float(parameter))
-            except ValueError:
-                print("Invalid brake value!")
-        elif main_action == "s":
-            try:
-                if kitt.change_lane(int(parameter), main_road.lane_count):
-                    print(f"KITT moved to lane {parameter}.")
-                # else: # change_lane already gives message
-                #     print(f"! Could not move to lane {parameter}.") 
-            except ValueError:
-                print("Invalid lane number!")
-        elif main_action == "t":
-            kitt.activate_turbo_boost()
-        elif main_action == "k":
-            kitt.toggle_shield()
-        elif main_action == "o":
-            kitt.toggle_autopilot()
-        elif main_action == "m": # Music (Radio Mode)
-            kitt.start_radio_mode()
-        elif main_action == "r": # Radar
-            kitt.radar_scan(main_road)
-            input("\nRadar results displayed. Press Enter to continue...")
-        elif main_action == "d": # Drift
-            if at_intersection and not main_road.intersection_drift_done.get(intersection_pos):
-                print("KITT: Attempting intersection drift...")
-                if kitt.activate_drift(road_object=main_road): 
-                    main_road.intersection_drift_done[intersection_pos] = True
-                    kitt.score += 20 # Extra points for intersection drift
-                    print("KITT: Successful intersection drift! Bonus points! (+20)")
+
+        fast_forward_request = None # (steps, stop conditions) of an n or u command
+        with profiler.phase("command_handling"):
+            if main_action == "a":
+                print("> Advancing step...")
+                # pass # Just advance step (will happen at end of loop)
+            elif main_action == "h":
+                try:
+                    kitt.accelerate(float(parameter))
+                except ValueError:
+                    print("Invalid speed value!")
+            elif main_action == "f":
+                try:
+                    kitt.brake(float(parameter))
+                except ValueError:
+                    print("Invalid brake value!")
+            elif main_action == "s":
+                try:
+                    if kitt.change_lane(int(parameter), main_road.lane_count):
+                        print(f"KITT moved to lane {parameter}.")
+                    # else: # change_lane already gives message
+                    #     print(f"! Could not move to lane {parameter}.") 
+                except ValueError:
+                    print("Invalid lane number!")
+            elif main_action == "t":
+                kitt.activate_turbo_boost()
+            elif main_action == "k":
+                kitt.toggle_shield()
+            elif main_action == "o":
+                kitt.toggle_autopilot()
+            elif main_action == "m": # Music (Radio Mode)
+                kitt.start_radio_mode()
+            elif main_action == "r": # Radar
+                kitt.radar_scan(main_road)
+                input("\nRadar results displayed. Press Enter to continue...")
+            elif main_action == "d": # Drift
+                if at_intersection and not main_road.intersection_drift_done.get(intersection_pos):
+                    print("KITT: Attempting intersection drift...")
+                    if kitt.activate_drift(road_object=main_road): 
+                        main_road.intersection_drift_done[intersection_pos] = True
+                        kitt.score += 20 # Extra points for intersection drift
+                        print("KITT: Successful intersection drift! Bonus points! (+20)")
+                else:
+                    print("KITT: Manual free drift attempt...")
+                    kitt.activate_drift() # Can be called without road object (optional)
+            elif main_action == "sp": # Speak (without message)
+                kitt.speak() # Makes KITT speak with default message
+            elif main_action in ("n", "u"): # Fast-forward: runs its own ticks (below), then back to the prompt
+                try:
+                    if main_action == "n":
+                        fast_forward_request = parse_fast_forward(parameter, FAST_FORWARD_STEPS)
+                    else:
+                        fast_forward_request = parse_fast_forward(parameter, FAST_FORWARD_MAX_STEPS, STOP_CONDITIONS)
+                except ValueError as e:
+                    print(f"Invalid fast-forward: {e}")
+                    time.sleep(1)
+                    continue
+            elif main_action == "z": # Zoom: only the view changes, no step
+                if parameter in ("in", "out"):
+                    main_road.zoom(-1 if parameter == "in" else 1)
+                elif parameter == "fit":
+                    main_road.zoom_to_fit()
+                else:
+                    try:
+                        main_road.display_scale = max(1.0, float(parameter))
+                    except ValueError:
+                        print("Usage: z in | z out | z fit | z <meters per character>")
+                        time.sleep(1)
+                continue
+            elif main_action == "invalid_command":
+                pass # Message already given
             else:
-                print("KITT: Manual free drift attempt...")
-                kitt.activate_drift() # Can be called without road object (optional)
-        elif main_action == "sp": # Speak (without message)
-            kitt.speak() # Makes KITT speak with default message
-        elif main_action == "invalid_command":
-            pass # Message already given
-        else:
-            print(f"Invalid command: '{command_input}'")
+                print(f"Invalid command: '{command_input}'")
+                time.sleep(1)
+
+        if fast_forward_request is not None: # Outside command_handling: its ticks are timed by their own phases
+            steps, stop_conditions = fast_forward_request
+            start_time = time.perf_counter()
+            ticks_run, stop_reason, simulation_continues = fast_forward(
+                main_road, kitt, profiler, time_step_seconds, steps, stop_conditions, traffic, fast_forward_fps)
+            if not simulation_continues:
+                print("Simulation ended for some reason (e.g: KITT took damage or road ended).")
+                break
+            print(f">> Fast-forwarded {ticks_run} steps in {time.perf_counter() - start_time:.2f} s"
+                  + (f", stopped: {stop_reason}" if stop_reason else ""))
             time.sleep(1)
+            continue
 
-        # Advance Simulation Step and Update Other Vehicles
-        if not main_road.advance_simulation_step(time_step_seconds=sim_time_step_s, new_ai_vehicle_probability=new_ai_vehicle_probability):
+        if not run_simulation_step(main_road, kitt, profiler, time_step_seconds, traffic=traffic):
             print("Simulation ended for some reason (e.g: KITT took damage or road ended).")
             break
-        
-        # Update KITT's turbo and other states (damage etc. might be in advance_simulation_step)
-        kitt.update_turbo_step()
-        kitt.drift_mode_active_temporary = False # Reset drift mode after each step (was one-time)
-
-        # Collision Check (between KITT and AI vehicles)
-        main_road.check_and_handle_collisions(kitt)
 
         # Check if intersection passed and reset drift message
         if at_intersection and main_road.intersection_drift_done.get(intersection_pos) and kitt.position > intersection_pos + 10:
@@ -145,8 +325,67 @@ def start_interactive_simulation():
         # Short wait (to improve playability)
         time.sleep(0.3)
 
+    if recorder:
+        recorder.close()
+        print(f"Run recorded to {record_path} ({recorder.tick} steps). Replay: python recorder.py {record_path}")
+    if telemetry:
+        telemetry.publish_now(main_road)
+        telemetry.close()
+
     print(f"\n--- SIMULATION ENDED ---")
     print(f"KITT Final Status: Score: {kitt.score}, Damage: {kitt.damage:.0f}%")
 
+    if profiler.enabled:
+        print("\n--- PHASE TIMINGS ---")
+        for line in profiler.report_lines():
+            print(f"  {line}")
+        print("\n--- TRAFFIC DETECTORS ---")
+        for line in detectors.report_lines():
+            print(f"  {line}")
+
 if __name__ == "__main__":
-    start_interactive_simulation()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Knight Rider - KITT Simulation")
+    parser.add_argument("--record", metavar="PATH", help="Record the run to a trajectory file for later replay")
+    parser.add_argument("--scenario", metavar="PATH", help="Scenario file (.json/.toml, see scenario.py) for road and traffic")
+    parser.add_argument("--ui", choices=("text", "curses"), default="text", help="Print-based UI (default) or real-time curses UI")
+    parser.add_argument("--fps", type=int, default=30, help="Frame rate of the curses UI")
+    parser.add_argument("--fast-forward-fps", type=int, default=FAST_FORWARD_FPS, help="Road redraws per second during n/u fast-forward (0: none)")
+    parser.add_argument("--telemetry", metavar="[HOST:]PORT", help="Serve live state and metrics over HTTP/SSE (see telemetry.py)")
+    parser.add_argument("--profile-phases", action="store_true", help="Time each phase of the main loop")
+    parser.add_argument("--metrics-out", metavar="PATH", help="Write phase timings at exit (.prom/.txt: Prometheus text, otherwise JSON)")
+    parser.add_argument("--cprofile", metavar="PATH", help="Run under cProfile and write stats to PATH")
+    parser.add_argument("--sample-profile", metavar="PATH", help="Sample the call stack and write collapsed stacks to PATH")
+    args = parser.parse_args()
+
+    phase_profiler = PhaseProfiler(enabled=args.profile_phases or bool(args.metrics_out))
+    selected_scenario = None
+    if args.scenario:
+        from scenario import load_scenario
+        selected_scenario = load_scenario(args.scenario)
+        print(f"Scenario: {selected_scenario.name}")
+    run_simulation = lambda record_path, profiler: start_interactive_simulation(record_path, profiler, selected_scenario,
+                                                                                args.fast_forward_fps, args.telemetry)
+    if args.ui == "curses":
+        from curses_frontend import run_curses_simulation
+        run_simulation = lambda record_path, profiler: run_curses_simulation(record_path, profiler, target_fps=args.fps,
+                                                                             scenario=selected_scenario,
+                                                                             telemetry_address=args.telemetry)
+    sampling_profiler = None
+    if args.sample_profile:
+        from instrumentation import SamplingProfiler
+        sampling_profiler = SamplingProfiler()
+        sampling_profiler.start()
+    try:
+        if args.cprofile:
+            import cProfile
+            cProfile.run("run_simulation(record_path=args.record, profiler=phase_profiler)", args.cprofile)
+        else:
+            run_simulation(record_path=args.record, profiler=phase_profiler)
+    finally:
+        if sampling_profiler:
+            sampling_profiler.stop()
+            sampling_profiler.write_collapsed(args.sample_profile)
+        if args.metrics_out:
+            phase_profiler.write(args.metrics_out)
@@ -0,0 +1,386 @@
+# multiplayer_server.py
+#
+# Many drivers on one shared road: an asyncio TCP server runs the authoritative tick loop
+# and every client controls its own KITT.
+#   python multiplayer_server.py --port 8765
+#   python multiplayer_server.py --load-test 300 --duration 20   (server process + 300 local clients)
+#
+# Protocol: newline-delimited JSON in both directions.
+#   server -> client, once: {"welcome": player id, "length_m", "lanes", "time_step_s"}
+#   client -> server: {"cmd": "h"|"f"|"s"|"t"|"k"|"o", "arg": "20"} (as the interactive commands)
+#   server -> client, every tick:
+#     {"t": tick, "you": [lane, position, speed, damage, shield power, score, turbo], "v": [[key, lane, position, speed], ...],
+#      "gone": [key, ...], "msg": [text, ...]} (empty parts left out)
+# Commands are queued and applied together at the start of the next tick. State is
+# delta compressed per client: a vehicle is only sent when it enters the client's view
+# (around its own KITT), changes lane or speed, or drifts from where the client can
+# extrapolate it (position + speed x elapsed time) by more than DEAD_RECKONING_TOLERANCE_M.
+# AI vehicles have integer keys, other players "p<N>". Players do not collide with each other.
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import multiprocessing
+import random
+import time
+from bisect import bisect_left, bisect_right
+from collections import deque
+
+from events import EventBus
+from main_simulation import ROAD_SPEED_LIMIT_KMH, SIM_TIME_STEP_S
+from road_management import Road, COLLISION_DISTANCE_M, MAX_AI_SPEED_KMH
+from vehicles import KITT
+
+DEFAULT_PORT = 8765
+VIEW_BEHIND_M = 250 # Interest area around each player's KITT
+VIEW_AHEAD_M = 500
+DEAD_RECKONING_TOLERANCE_M = 1.0
+MAX_PENDING_COMMANDS = 16 # Per player and tick; older ones are dropped
+MAX_CLIENT_BUFFER_BYTES = 256 * 1024 # Clients further behind skip ticks until they catch up
+STATS_INTERVAL_S = 5.0
+
+_COMPACT_JSON = {"separators": (",", ":")}
+
+
+class PlayerSession:
+    """One connected driver: its KITT, queued commands and what its client already knows."""
+    def __init__(self, player_number, kitt, writer):
+        self.player_number = player_number
+        self.key = f"p{player_number}"
+        self.kitt = kitt
+        self.writer = writer
+        self.commands = deque(maxlen=MAX_PENDING_COMMANDS)
+        self.messages = []
+        self.known = {} # vehicle key -> state version the client has (see MultiplayerServer._publish_states)
+        self.bytes_sent = 0
+        self.skipped_ticks = 0
+        kitt.events = EventBus() # This player's KITT events become its messages
+        kitt.events.subscribe(self._note_event)
+
+    def _note_event(self, event):
+        text = event.message()
+        if text is not None:
+            self.messages.append(text.strip())
+
+
+class MultiplayerServer:
+    """
+    Authoritative simulation of one road shared by all connected players. step() applies the
+    queued commands, advances the road and every player's KITT and handles collisions;
+    broadcast() sends each client the delta of its view.
+    """
+    def __init__(self, road_length_m=20000, lane_count=4, speed_limit_kmh=ROAD_SPEED_LIMIT_KMH, max_ai_vehicles=1500,
+                 spawns_per_tick=4, time_step_s=SIM_TIME_STEP_S, tick_interval_s=None, seed=None):
+        random.seed(seed)
+        self.road = Road(road_length_m, lane_count, speed_limit_kmh, max_ai_vehicles=max_ai_vehicles, intersection_positions=())
+        self.road.events = EventBus() # Road events concern the single-player KITT, which does not exist here
+        self.road.add_random_ai_vehicle(max_ai_vehicles // 2)
+        self.spawns_per_tick = int(spawns_per_tick)
+        self.time_step_s = float(time_step_s)
+        self.tick_interval_s = float(tick_interval_s) if tick_interval_s is not None else self.time_step_s
+        self.tick = 0
+        self.players = {} # player number -> PlayerSession
+        self._next_player_number = 1
+        self._published = {} # vehicle key -> (lane, position, speed, tick, version) clients extrapolate from
+        self._state_version = 0
+        self.tick_durations_s = deque(maxlen=100)
+        self.late_ticks = 0
+
+    # --- Connections ---
+    async def handle_client(self, reader, writer):
+        session = self._add_player(writer)
+        writer.write(self._encode({"welcome": session.key, "length_m": self.road.length_meters,
+                                   "lanes": self.road.lane_count, "time_step_s": self.time_step_s}))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    command = json.loads(line)
+                    session.commands.append((str(command["cmd"]), str(command.get("arg", ""))))
+                except (ValueError, KeyError, TypeError):
+                    session.messages.append(f"Invalid command: {line[:80]!r}")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.players.pop(session.player_number, None)
+            writer.close()
+
+    def _add_player(self, writer):
+        kitt = KITT(vehicle_id=f"KITT-{self._next_player_number}", lane=random.randint(1, self.road.lane_count),
+                    position=50.0, enable_music=False)
+        session = PlayerSession(self._next_player_number, kitt, writer)
+        self.players[session.player_number] = session
+        self._next_player_number += 1
+        return session
+
+    def _respawn(self, session, reason):
+        session.messages.append(reason)
+        score = session.kitt.score
+        kitt = KITT(vehicle_id=session.kitt.vehicle_id, lane=random.randint(1, self.road.lane_count), position=50.0, enable_music=False)
+        kitt.score = score
+        kitt.events = session.kitt.events
+        session.kitt = kitt
+
+    @staticmethod
+    def _encode(message):
+        return (json.dumps(message, **_COMPACT_JSON) + "\n").encode("utf-8")
+
+    # --- Tick ---
+    def _apply_command(self, session, command, argument):
+        kitt = session.kitt
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output): # KITT prints some confirmations: they go to the player
+            try:
+                if command == "h":
+                    kitt.accelerate(float(argument))
+                elif command == "f":
+                    kitt.brake(float(argument))
+                elif command == "s":
+                    kitt.change_lane(int(argument), self.road.lane_count)
+                elif command == "t":
+                    kitt.activate_turbo_boost()
+                elif command == "k":
+                    kitt.toggle_shield()
+                elif command == "o":
+                    kitt.toggle_autopilot()
+                else:
+                    print(f"Unknown command: '{command}'")
+            except ValueError:
+                print(f"Invalid value for '{command}': '{argument}'")
+        session.messages.extend(line for line in output.getvalue().splitlines() if line.strip())
+
+    def _move_players(self):
+        """Moves every player's KITT and handles its collisions with AI vehicles over the tick."""
+        road = self.road
+        meters_per_kmh = self.time_step_s / 3.6
+        for session in list(self.players.values()):
+            kitt = session.kitt
+            kitt.update_position(self.time_step_s)
+            kitt.update_turbo_step()
+            # Vehicles passed during the tick collide too (like the road's sub-steps for the single-player KITT)
+            reach_m = COLLISION_DISTANCE_M + max(kitt.speed, MAX_AI_SPEED_KMH) * meters_per_kmh
+            for vehicle in road.lane_index.in_range(kitt.position - reach_m, kitt.position + reach_m, kitt.lane):
+                offset_m = vehicle.position - kitt.position
+                previous_offset_m = offset_m - (vehicle.speed - kitt.speed) * meters_per_kmh
+                if abs(offset_m) < COLLISION_DISTANCE_M or (offset_m > 0) != (previous_offset_m > 0):
+                    road._handle_kitt_collision(kitt, vehicle)
+            if kitt.damage >= 100:
+                self._respawn(session, "KITT is unusable! Restarting at the beginning of the road.")
+            elif kitt.position >= road.length_meters:
+                kitt.score += 100
+                self._respawn(session, "End of road reached (+100)! Back to the start.")
+
+    def step(self):
+        """One authoritative tick without sending anything."""
+        road = self.road
+        for session in list(self.players.values()):
+            while session.commands:
+                self._apply_command(session, *session.commands.popleft())
+            if session.kitt.autopilot_active:
+                session.kitt.run_autopilot_logic(road)
+        road.advance_simulation_step(self.time_step_s, new_ai_vehicle_probability=0.0)
+        road.add_random_ai_vehicle(self.spawns_per_tick)
+        self._move_players()
+        self.tick += 1
+
+    def _publish_states(self):
+        """
+        Shared dead reckoning: the state every client extrapolates for each vehicle. A vehicle gets a new
+        version only when it changes lane or speed or drifts from the extrapolation, once per tick for all clients.
+        """
+        tick = self.tick
+        meters_per_kmh_tick = self.time_step_s / 3.6
+        published = self._published
+        current = {}
+        vehicles = [(vehicle.vehicle_number, vehicle) for vehicle in self.road.ai_vehicles]
+        vehicles.extend((session.key, session.kitt) for session in self.players.values())
+        for key, vehicle in vehicles:
+            lane, position, speed = vehicle.lane, vehicle.position, round(vehicle.speed)
+            state = published.get(key)
+            if (state is None or state[0] != lane or state[2] != speed
+                    or abs(state[1] + speed * meters_per_kmh_tick * (tick - state[3]) - position) > DEAD_RECKONING_TOLERANCE_M):
+                self._state_version += 1
+                state = (lane, round(position, 1), speed, tick, self._state_version)
+            current[key] = state
+        self._published = current
+
+    def broadcast(self):
+        """Sends each client the changes in its view since what it last received."""
+        self._publish_states()
+        road = self.road
+        published = self._published
+        meters_per_kmh_tick = self.time_step_s / 3.6
+        tick = self.tick
+        players_by_position = sorted((session.kitt.position, session.key) for session in self.players.values())
+        player_positions = [position for position, _ in players_by_position]
+        encoded_updates = {} # key -> JSON of its update this tick, shared by every client that needs it
+        for session in list(self.players.values()):
+            writer = session.writer
+            if writer.is_closing():
+                continue
+            if writer.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER_BYTES:
+                session.skipped_ticks += 1 # Deltas stay relative to what it has, so nothing is lost
+                continue
+            kitt = session.kitt
+            start_m, end_m = kitt.position - VIEW_BEHIND_M, kitt.position + VIEW_AHEAD_M
+            visible_keys = [vehicle.vehicle_number for vehicle in road.lane_index.in_range(start_m, end_m)]
+            visible_keys.extend(players_by_position[index][1] for index in range(bisect_left(player_positions, start_m),
+                                                                               bisect_right(player_positions, end_m)))
+            view = {key: published[key][4] for key in visible_keys if key != session.key} # key -> state version
+            changed = view.items() - session.known.items()
+            gone = list(session.known.keys() - view.keys())
+            session.known = view
+
+            message = {"t": tick, "you": [kitt.lane, round(kitt.position, 1), round(kitt.speed), round(kitt.damage),
+                                          round(kitt.shield_power), kitt.score, kitt.turbo_active]}
+            if gone:
+                message["gone"] = gone
+            if session.messages:
+                message["msg"] = session.messages
+                session.messages = []
+            if changed:
+                updates = []
+                for key, _ in changed:
+                    update = encoded_updates.get(key)
+                    if update is None:
+                        lane, position, speed, state_tick, _ = published[key]
+                        position = round(position + speed * meters_per_kmh_tick * (tick - state_tick), 1) # Extrapolated to now
+                        update = encoded_updates[key] = json.dumps([key, lane, position, speed], **_COMPACT_JSON)
+                    updates.append(update)
+                data = (json.dumps(message, **_COMPACT_JSON)[:-1] + ',"v":[' + ",".join(updates) + "]}\n").encode("utf-8")
+            else:
+                data = self._encode(message)
+            writer.write(data)
+            session.bytes_sent += len(data)
+
+    async def run(self, host="127.0.0.1", port=DEFAULT_PORT, duration_s=None, ready=None):
+        """Serves clients and ticks until duration_s has passed (None: forever)."""
+        server = await asyncio.start_server(self.handle_client, host, port)
+        if ready is not None:
+            ready.set()
+        loop = asyncio.get_running_loop()
+        start_time = next_tick_time = next_stats_time = loop.time()
+        next_stats_time += STATS_INTERVAL_S
+        async with server:
+            while duration_s is None or loop.time() - start_time < duration_s:
+                tick_start = time.perf_counter()
+                self.step()
+                self.broadcast()
+                self.tick_durations_s.append(time.perf_counter() - tick_start)
+                next_tick_time += self.tick_interval_s
+                delay = next_tick_time - loop.time()
+                if delay < 0:
+                    self.late_ticks += 1
+                    next_tick_time = loop.time() # Don't try to catch up: it would only add load
+                await asyncio.sleep(max(delay, 0))
+                if loop.time() >= next_stats_time:
+                    next_stats_time += STATS_INTERVAL_S
+                    print(self.stats_line(), flush=True)
+        print(self.stats_line(), flush=True)
+
+    def stats_line(self):
+        durations = sorted(self.tick_durations_s) or [0.0]
+        bytes_sent = sum(session.bytes_sent for session in self.players.values())
+        return (f"tick {self.tick}: {len(self.players)} players, {len(self.road.ai_vehicles)} AI vehicles, "
+                f"tick p50 {durations[len(durations) // 2] * 1000:.1f} ms / max {durations[-1] * 1000:.1f} ms, "
+                f"{self.late_ticks} late ticks, {bytes_sent / max(len(self.players), 1) / 1024:.0f} KiB sent per player")
+
+
+# --- Load test ---
+async def simulated_client(host, port, duration_s, results, command_interval_s=2.0):
+    """A local client that turns on the autopilot, gives random commands and applies the state deltas it receives."""
+    reader, writer = await asyncio.open_connection(host, port, limit=1 << 20)
+    welcome = json.loads(await reader.readline())
+    writer.write(b'{"cmd":"o"}\n')
+    world = {} # What the client knows: key -> [lane, position, speed]
+    received_bytes = messages = ticks_missed = 0
+    last_tick = None
+    loop = asyncio.get_running_loop()
+    end_time = loop.time() + duration_s
+    next_command_time = loop.time() + random.uniform(0, command_interval_s)
+    try:
+        while loop.time() < end_time:
+            try:
+                line = await asyncio.wait_for(reader.readline(), timeout=max(end_time - loop.time(), 0.01))
+            except asyncio.TimeoutError:
+                break
+            if not line:
+                break
+            received_bytes += len(line)
+            messages += 1
+            state = json.loads(line)
+            if last_tick is not None:
+                ticks_missed += state["t"] - last_tick - 1
+            last_tick = state["t"]
+            for key, lane, position, speed in state.get("v", ()):
+                world[key] = [lane, position, speed]
+            for key in state.get("gone", ()):
+                world.pop(key, None)
+            if loop.time() >= next_command_time:
+                next_command_time += command_interval_s
+                command = random.choice(([("h", "10")] * 3) + [("f", "10"), ("s", str(random.randint(1, welcome["lanes"]))), ("t", "")])
+                writer.write(json.dumps({"cmd": command[0], "arg": command[1]}).encode("utf-8") + b"\n")
+    finally:
+        writer.close()
+    results.append((received_bytes, messages, ticks_missed, len(world)))
+
+
+def _serve_process(host, port, duration_s, ready, options):
+    server = MultiplayerServer(**options)
+    asyncio.run(server.run(host, port, duration_s, ready))
+
+
+async def run_load_test(client_count, duration_s, host="127.0.0.1", port=DEFAULT_PORT):
+    results = []
+    clients = []
+    for _ in range(client_count):
+        clients.append(asyncio.create_task(simulated_client(host, port, duration_s, results)))
+        await asyncio.sleep(0.002) # Don't flood the listen backlog
+    await asyncio.gather(*clients, return_exceptions=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multiplayer KITT server (NDJSON over TCP)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--road-length", type=int, default=20000, help="Road length (m)")
+    parser.add_argument("--lanes", type=int, default=4)
+    parser.add_argument("--ai-vehicles", type=int, default=1500, help="Maximum AI vehicles")
+    parser.add_argument("--tick-interval", type=float, default=None, help="Real seconds per tick (default: the simulation time step)")
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds")
+    parser.add_argument("--load-test", type=int, metavar="CLIENTS", help="Start the server in a separate process and connect CLIENTS local clients")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    options = {"road_length_m": args.road_length, "lane_count": args.lanes, "max_ai_vehicles": args.ai_vehicles,
+               "tick_interval_s": args.tick_interval, "seed": args.seed}
+
+    if not args.load_test:
+        print(f"Serving on {args.host}:{args.port}")
+        asyncio.run(MultiplayerServer(**options).run(args.host, args.port, args.duration))
+        return
+
+    duration_s = args.duration or 20.0
+    ready = multiprocessing.Event()
+    server_process = multiprocessing.Process(target=_serve_process, args=(args.host, args.port, duration_s + 5, ready, options))
+    server_process.start()
+    ready.wait(30)
+    results = asyncio.run(run_load_test(args.load_test, duration_s, args.host, args.port))
+    server_process.join()
+    if not results:
+        print("No client finished.")
+        return
+    received_bytes = sum(result[0] for result in results)
+    messages = sum(result[1] for result in results)
+    print(f"{len(results)}/{args.load_test} clients finished: {messages / len(results):.0f} updates and "
+          f"{received_bytes / len(results) / duration_s / 1024:.1f} KiB/s per client, "
+          f"{sum(result[2] for result in results)} ticks skipped in total, "
+          f"{sum(result[3] for result in results) / len(results):.1f} vehicles in view on average")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+# recorder.py
+
+import bisect
+import json
+import mmap
+import struct
+import sys
+import time
+import zlib
+from array import array
+from operator import attrgetter
+
+from events import (Collision, EndOfRoad, KittDestroyed, TurboStarted, TurboEnded, ShieldAbsorbed, ShieldDepleted,
+                    DamageTaken, CriticalDamage, AutopilotManeuver, DriftResult)
+from vehicles import format_vehicle_id
+
+# Trajectory file layout (all integers little-endian):
+#   FILE_MAGIC | uint32 header length | JSON header (road geometry, time step)
+#   followed by any number of chunks, each one:
+#   CHUNK_HEADER | payload (optionally zlib compressed)
+# A chunk holds a run of consecutive ticks stored column by column, so a reader
+# can seek to any tick by looking at the chunk headers only.
+FILE_MAGIC = b"KITTREC1"
+FORMAT_VERSION = 1
+CHUNK_MAGIC = b"CHNK"
+CHUNK_HEADER = struct.Struct("<4sIIIIIB3x") # magic, first tick, tick count, row count, stored size, raw size, flags
+CHUNK_FLAG_COMPRESSED = 1
+
+# Column layout of a chunk payload, in write order: (name, array typecode)
+TICK_COLUMNS = [
+    ("row_offsets", "I"), # Index of the first vehicle row of each tick (+1 trailing entry)
+    ("membership", "I"), # Which vehicle list (see below) the rows of each tick belong to
+    ("kitt_lane", "B"),
+    ("kitt_position", "f"),
+    ("kitt_speed", "f"),
+    ("kitt_damage", "f"),
+    ("kitt_score", "i"),
+]
+ROW_COLUMNS = [
+    ("lane", "B"),
+    ("position", "f"),
+    ("speed", "f"),
+]
+# The set of vehicles on the road rarely changes between ticks, so vehicle ids are not
+# stored per row. Each distinct vehicle list is stored once as references into the id table.
+MEMBERSHIP_COLUMNS = [
+    ("list_offsets", "I"),
+    ("list_refs", "I"),
+]
+SECTION_COUNT = len(TICK_COLUMNS) + len(ROW_COLUMNS) + len(MEMBERSHIP_COLUMNS) + 2 # + id table + events
+
+NEEDS_BYTESWAP = sys.byteorder != "little"
+
+# Bus events that are recorded: event type -> (kind, text). KITT publishes its own events
+# on the road's bus (Road.add_kitt_reference), so one subscription covers both.
+RECORDED_EVENTS = {
+    Collision: ("collision", lambda event: f"{event.vehicle_id} at {event.position:.0f}m, damage {event.damage:.0f}"),
+    EndOfRoad: ("end_of_road", lambda event: f"KITT reached {event.position:.0f}m"),
+    KittDestroyed: ("kitt_destroyed", lambda event: f"Damage {event.damage:.0f}%"),
+    TurboStarted: ("turbo_started", lambda event: f"Speed {event.speed:.0f} km/h"),
+    TurboEnded: ("turbo_ended", lambda event: f"Speed {event.speed:.0f} km/h"),
+    ShieldAbsorbed: ("shield_absorbed", lambda event: f"{event.amount:.0f} damage absorbed, shield {event.shield_power:.0f}%"),
+    ShieldDepleted: ("shield_depleted", lambda event: "Shield disabled"),
+    DamageTaken: ("damage_taken", lambda event: f"{event.amount:.0f} damage, total {event.total_damage:.0f}%"),
+    CriticalDamage: ("critical_damage", lambda event: f"Total damage {event.total_damage:.0f}%"),
+    AutopilotManeuver: ("autopilot_maneuver", lambda event: f"{event.action} to lane {event.lane}" + ("" if event.safe else " (no safe option)")),
+    DriftResult: ("drift_result", lambda event: f"Game score {event.game_score}, {event.points:+d} points"),
+}
+
+# Attribute getters, so each column is read by one C-level pass over the vehicles
+_get_vehicle_id = attrgetter("vehicle_number") # Raw number, formatted only when read back
+_get_kind_code = attrgetter("kind_code")
+_ROW_GETTERS = [attrgetter(name) for name, _ in ROW_COLUMNS]
+
+
+def _column_bytes(typecode, values):
+    """Returns raw little-endian bytes of given values as an array column."""
+    column = array(typecode, values)
+    if NEEDS_BYTESWAP:
+        column.byteswap()
+    return column.tobytes()
+
+
+class TrajectoryRecorder:
+    """
+    Records every simulation tick of a Road (AI vehicles and KITT) to a compact,
+    append-only columnar binary file. Attach with Road.attach_recorder().
+    """
+    event_types = tuple(RECORDED_EVENTS) # Bus events recorded (batched, see record_events)
+
+    def __init__(self, file_path, road, time_step_seconds=0.4, chunk_ticks=256, compress=True):
+        self.file_path = str(file_path)
+        self.chunk_ticks = int(chunk_ticks)
+        self.compress = bool(compress)
+        self.tick = 0 # Index of the next tick to record
+
+        header = {
+            "version": FORMAT_VERSION,
+            "road_length_m": road.length_meters,
+            "lane_count": road.lane_count,
+            "speed_limit_kmh": road.speed_limit_kmh,
+            "intersection_positions": list(road.intersection_positions),
+            "time_step_s": float(time_step_seconds),
+            "event_kinds": ["command"] + [kind for kind, _ in RECORDED_EVENTS.values()],
+            "created": time.time(),
+        }
+        header_bytes = json.dumps(header).encode("utf-8")
+        self._file = open(self.file_path, "wb")
+        self._file.write(FILE_MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes)
+        self._file.flush()
+        self._kind_by_id = {}
+        self._events = [] # [tick, kind, text] entries (KITT commands and simulation events)
+        self._reset_chunk()
+
+    def _reset_chunk(self):
+        # Values are buffered in plain lists (cheapest to append to) and packed when the chunk is written
+        self._chunk_first_tick = self.tick
+        self._tick_columns = {name: [] for name, _ in TICK_COLUMNS}
+        self._tick_columns["row_offsets"].append(0)
+        self._row_columns = [[] for _ in ROW_COLUMNS]
+        self._row_count = 0
+        self._vehicle_lists = []
+        self._last_vehicle_ids = None
+
+    def record_command(self, command, parameter=""):
+        """Records a KITT command given for the tick that is about to be simulated."""
+        self._events.append([self.tick, "command", f"{command} {parameter}".strip()])
+
+    def record_event(self, kind, text):
+        """Records a simulation event (collision, end of road, ...) for the last recorded tick."""
+        self._events.append([max(self.tick - 1, 0), kind, text])
+
+    def record_events(self, events):
+        """Event bus subscriber: records one tick's simulation and KITT events."""
+        for event in events:
+            recorded = RECORDED_EVENTS.get(type(event))
+            if recorded is not None:
+                kind, describe = recorded
+                self.record_event(kind, describe(event))
+
+    def record_tick(self, road):
+        """Appends the state of all vehicles on the road as one tick. Called by Road after each step."""
+        # A full chunk is written lazily, so events raised after its last tick still land in it
+        if self.tick - self._chunk_first_tick >= self.chunk_ticks:
+            self.flush()
+
+        vehicles = road.ai_vehicles
+        vehicle_ids = list(map(_get_vehicle_id, vehicles))
+        if vehicle_ids != self._last_vehicle_ids:
+            self._vehicle_lists.append(vehicle_ids)
+            self._kind_by_id.update(zip(vehicle_ids, map(_get_kind_code, vehicles)))
+            self._last_vehicle_ids = vehicle_ids
+        for column, getter in zip(self._row_columns, _ROW_GETTERS):
+            column.extend(map(getter, vehicles))
+        self._row_count += len(vehicle_ids)
+
+        ticks = self._tick_columns
+        ticks["row_offsets"].append(self._row_count)
+        ticks["membership"].append(len(self._vehicle_lists) - 1)
+        kitt = road.kitt_vehicle
+        ticks["kitt_lane"].append(kitt.lane if kitt else 0)
+        ticks["kitt_position"].append(kitt.position if kitt else 0.0)
+        ticks["kitt_speed"].append(kitt.speed if kitt else 0.0)
+        ticks["kitt_damage"].append(kitt.damage if kitt else 0.0)
+        ticks["kitt_score"].append(kitt.score if kitt else 0)
+
+        self.tick += 1
+
+    def flush(self):
+        """Writes buffered ticks as one chunk at the end of the file."""
+        tick_count = self.tick - self._chunk_first_tick
+        if tick_count <= 0:
+            return
+        # Commands already given for the next tick belong to the next chunk
+        pending_events = [event for event in self._events if event[0] >= self.tick]
+        chunk_events = [event for event in self._events if event[0] < self.tick]
+
+        # Dictionary-encode vehicle ids for this chunk
+        id_table = {}
+        list_offsets = [0]
+        list_refs = []
+        for vehicle_ids in self._vehicle_lists:
+            list_refs.extend(id_table.setdefault(vehicle_id, len(id_table)) for vehicle_id in vehicle_ids)
+            list_offsets.append(len(list_refs))
+        id_table_bytes = json.dumps([[vehicle_id, self._kind_by_id[vehicle_id]] for vehicle_id in id_table]).encode("utf-8")
+        events_bytes = json.dumps(chunk_events).encode("utf-8")
+
+        sections = [_column_bytes(code, self._tick_columns[name]) for name, code in TICK_COLUMNS]
+        sections.extend(_column_bytes(code, column) for (_, code), column in zip(ROW_COLUMNS, self._row_columns))
+        sections.append(_column_bytes("I", list_offsets))
+        sections.append(_column_bytes("I", list_refs))
+        sections.append(id_table_bytes)
+        sections.append(events_bytes)
+        payload = struct.pack(f"<{SECTION_COUNT}I", *(len(section) for section in sections)) + b"".join(sections)
+
+        flags = 0
+        stored_payload = payload
+        if self.compress:
+            stored_payload = zlib.compress(payload, 1) # Fast level, recording must stay cheap
+            flags |= CHUNK_FLAG_COMPRESSED
+
+        self._file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, self._chunk_first_tick, tick_count, self._row_count,
+                                           len(stored_payload), len(payload), flags))
+        self._file.write(stored_payload)
+        self._file.flush()
+
+        # Forget kinds of vehicles that left the road
+        last_ids = set(self._last_vehicle_ids)
+        self._kind_by_id = {vehicle_id: kind for vehicle_id, kind in self._kind_by_id.items() if vehicle_id in last_ids}
+        self._events = pending_events
+        self._reset_chunk()
+
+    def close(self):
+        """Writes remaining ticks and closes the file."""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class RecordedFrame:
+    """State of one recorded tick."""
+    def __init__(self, tick, kitt_state, vehicles, events):
+        self.tick = tick
+        self.kitt_state = kitt_state # dict: lane, position, speed, damage, score
+        self.vehicles = vehicles # list of (vehicle_id, kind, lane, position, speed)
+        self.events = events # list of (kind, text)
+
+
+class TrajectoryReader:
+    """
+    Memory-mapped reader for files written by TrajectoryRecorder.
+    Only chunk headers are scanned on open; chunks are decoded on demand.
+    """
+    def __init__(self, file_path):
+        self.file_path = str(file_path)
+        self._file = open(self.file_path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._map[:len(FILE_MAGIC)] != FILE_MAGIC:
+            raise ValueError(f"{self.file_path} is not a KITT trajectory recording.")
+        header_length = struct.unpack_from("<I", self._map, len(FILE_MAGIC))[0]
+        header_start = len(FILE_MAGIC) + 4
+        self.header = json.loads(self._map[header_start:header_start + header_length].decode("utf-8"))
+
+        self._chunks = [] # (first tick, tick count, row count, payload offset, stored size, raw size, flags)
+        offset = header_start + header_length
+        while offset + CHUNK_HEADER.size <= len(self._map):
+            magic, first_tick, tick_count, row_count, stored_size, raw_size, flags = CHUNK_HEADER.unpack_from(self._map, offset)
+            payload_offset = offset + CHUNK_HEADER.size
+            if magic != CHUNK_MAGIC or payload_offset + stored_size > len(self._map):
+                break # Truncated tail (e.g. recording process crashed mid-write)
+            self._chunks.append((first_tick, tick_count, row_count, payload_offset, stored_size, raw_size, flags))
+            offset = payload_offset + stored_size
+        self._chunk_first_ticks = [chunk[0] for chunk in self._chunks]
+        self._decoded_chunk_index = None
+        self._decoded_chunk = None
+
+    @property
+    def tick_count(self):
+        if not self._chunks:
+            return 0
+        first_tick, tick_count = self._chunks[-1][:2]
+        return first_tick + tick_count
+
+    def _decode_chunk(self, chunk_index):
+        if chunk_index == self._decoded_chunk_index:
+            return self._decoded_chunk
+
+        first_tick, tick_count, row_count, payload_offset, stored_size, raw_size, flags = self._chunks[chunk_index]
+        payload = memoryview(self._map)[payload_offset:payload_offset + stored_size]
+        if flags & CHUNK_FLAG_COMPRESSED:
+            payload = memoryview(zlib.decompress(payload))
+
+        section_sizes = struct.unpack_from(f"<{SECTION_COUNT}I", payload, 0)
+        position = struct.calcsize(f"<{SECTION_COUNT}I")
+        sections = []
+        for size in section_sizes:
+            sections.append(payload[position:position + size])
+            position += size
+
+        columns = {}
+        for (name, code), section in zip(TICK_COLUMNS + ROW_COLUMNS + MEMBERSHIP_COLUMNS, sections):
+            column = array(code)
+            column.frombytes(section)
+            if NEEDS_BYTESWAP:
+                column.byteswap()
+            columns[name] = column
+        id_rows = json.loads(bytes(sections[-2]).decode("utf-8"))
+        columns["id_table"] = [(format_vehicle_id(vehicle_number), kind) for vehicle_number, kind in id_rows]
+        columns["id_numbers"] = array("I", [vehicle_number for vehicle_number, _ in id_rows])
+        columns["id_kinds"] = array("B", [kind for _, kind in id_rows])
+        events_by_tick = {}
+        for tick, kind, text in json.loads(bytes(sections[-1]).decode("utf-8")):
+            events_by_tick.setdefault(tick, []).append((kind, text))
+        columns["events"] = events_by_tick
+
+        self._decoded_chunk_index = chunk_index
+        self._decoded_chunk = (first_tick, columns)
+        return self._decoded_chunk
+
+    def chunks(self):
+        """
+        Yields (first tick, columns) for every chunk in order: the decoded arrays of TICK_COLUMNS,
+        ROW_COLUMNS and MEMBERSHIP_COLUMNS plus "id_numbers"/"id_kinds" (id table), "id_table"
+        and "events" (tick -> [(kind, text)]). For column-wise consumers such as arrow_export.py.
+        """
+        for chunk_index in range(len(self._chunks)):
+            yield self._decode_chunk(chunk_index)
+
+    def frame(self, tick):
+        """Returns the RecordedFrame for given tick without decoding other chunks."""
+        chunk_index = bisect.bisect_right(self._chunk_first_ticks, tick) - 1
+        if chunk_index < 0 or tick >= self.tick_count:
+            raise IndexError(f"Tick {tick} is not in recording (0 - {self.tick_count - 1}).")
+        first_tick, columns = self._decode_chunk(chunk_index)
+        local_tick = tick - first_tick
+
+        kitt_state = {
+            "lane": columns["kitt_lane"][local_tick],
+            "position": columns["kitt_position"][local_tick],
+            "speed": columns["kitt_speed"][local_tick],
+            "damage": columns["kitt_damage"][local_tick],
+            "score": columns["kitt_score"][local_tick],
+        }
+        row_start = columns["row_offsets"][local_tick]
+        row_end = columns["row_offsets"][local_tick + 1]
+        vehicle_list = columns["membership"][local_tick]
+        refs = columns["list_refs"][columns["list_offsets"][vehicle_list]:columns["list_offsets"][vehicle_list + 1]]
+        id_table = columns["id_table"]
+        vehicles = [
+            (id_table[ref][0], id_table[ref][1], lane, position, speed)
+            for ref, lane, position, speed in zip(refs, columns["lane"][row_start:row_end],
+                                                  columns["position"][row_start:row_end], columns["speed"][row_start:row_end])
+        ]
+        return RecordedFrame(tick, kitt_state, vehicles, columns["events"].get(tick, []))
+
+    def frames(self, start_tick=0, end_tick=None):
+        """Iterates over frames in [start_tick, end_tick)."""
+        end_tick = self.tick_count if end_tick is None else min(end_tick, self.tick_count)
+        for tick in range(start_tick, end_tick):
+            yield self.frame(tick)
+
+    def close(self):
+        self._decoded_chunk = None
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# --- Replay ---
+RECORDED_KIND_SYMBOLS = {0: "[A]", 1: "o-o", 2: "[T]", 3: "-M-"}
+
+class RecordedVehicle:
+    """Read-only stand-in for a vehicle, rebuilt from a recorded frame."""
+    def __init__(self, vehicle_id, kind, lane, position, speed):
+        self.vehicle_id = vehicle_id
+        self.vehicle_number = vehicle_id
+        self.brand = "Recorded"
+        self.model = f"kind {kind}"
+        self.lane = lane
+        self.position = position
+        self.speed = speed
+        self.vehicle_symbol = RECORDED_KIND_SYMBOLS.get(kind, "[A]")
+
+
+class RecordedKITT(RecordedVehicle):
+    """Stand-in for KITT during replay, shows recorded score and damage."""
+    def __init__(self, kitt_state):
+        super().__init__("KITT", 0, kitt_state["lane"], kitt_state["position"], kitt_state["speed"])
+        self.vehicle_symbol = ">K<"
+        self.damage = kitt_state["damage"]
+        self.score = kitt_state["score"]
+
+    def show_status(self):
+        return [
+            f"ID        : {self.vehicle_id} (replay)",
+            f"Speed     : {self.speed:.0f} km/h",
+            f"Position  : {self.position:.0f} m",
+            f"Lane      : {self.lane}"
+        ]
+
+    def show_extra_status(self):
+        return [
+            f"Score     : {self.score}",
+            f"Damage    : {self.damage:.0f}%",
+        ]
+
+
+def replay_recording(file_path, start_tick=0, end_tick=None, delay_seconds=0.3):
+    """Renders a recorded run with the normal text renderer, without re-simulating."""
+    from road_management import Road
+
+    with TrajectoryReader(file_path) as reader:
+        header = reader.header
+        road = Road(header["road_length_m"], header["lane_count"], header["speed_limit_kmh"])
+        road.intersection_positions = header["intersection_positions"]
+        for frame in reader.frames(start_tick, end_tick):
+            road.vehicle_store.clear()
+            for row in frame.vehicles:
+                road.add_ai_vehicle(RecordedVehicle(*row))
+            road.kitt_vehicle = RecordedKITT(frame.kitt_state)
+            road.check_intersection_for_kitt()
+            road.show_text_based_road()
+            print(f"\n--- REPLAY tick {frame.tick}/{reader.tick_count - 1} ---")
+            for kind, text in frame.events:
+                print(f"  [{kind}] {text}")
+            time.sleep(delay_seconds)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay a recorded KITT simulation run.")
+    parser.add_argument("recording", help="Path of the recording file")
+    parser.add_argument("--from", dest="start_tick", type=int, default=0, help="First tick to show")
+    parser.add_argument("--to", dest="end_tick", type=int, default=None, help="Stop before this tick")
+    parser.add_argument("--delay", type=float, default=0.3, help="Seconds between frames")
+    args = parser.parse_args()
+    replay_recording(args.recording, args.start_tick, args.end_tick, args.delay)
@@ -1,89 +1,176 @@
 # road_management.py
 
+import math
 import random
 import os
-import json # Import JSON module
+from operator import attrgetter, sub
 
-# We need to import vehicle classes from vehicles.py
+# We need to import KITT from vehicles.py
 # These lines need vehicles.py file to be in the same directory to work.
-from vehicles import Vehicle, Car, Truck, Motorcycle, KITT # Also import KITT since Road class will receive KITT object
-
-# Load vehicle models from JSON config file
-CONFIG_FILE = "vehicle_config.cfg"
-
-CAR_MODELS_AI = {}
-TRUCK_MODELS_AI = {}
-MOTORCYCLE_MODELS_AI = {}
-
-try:
-    with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-        config_data = json.load(f)
-        CAR_MODELS_AI = config_data.get("CAR_MODELS_AI", {})
-        TRUCK_MODELS_AI = config_data.get("TRUCK_MODELS_AI", {})
-        MOTORCYCLE_MODELS_AI = config_data.get("MOTORCYCLE_MODELS_AI", {})
-except FileNotFoundError:
-    print(f"WARNING: Configuration file ({CONFIG_FILE}) not found. Default empty model lists will be used.")
-    # Add default values if config file doesn't exist
-    CAR_MODELS_AI = {"Generic": ["Car"]}
-    TRUCK_MODELS_AI = {"Generic": ["Truck"]}
-    MOTORCYCLE_MODELS_AI = {"Generic": ["Motorcycle"]}
-except json.JSONDecodeError:
-    print(f"WARNING: Configuration file ({CONFIG_FILE}) is not in valid JSON format. Default empty model lists will be used.")
-    CAR_MODELS_AI = {"Generic": ["Car"]}
-    TRUCK_MODELS_AI = {"Generic": ["Truck"]}
-    MOTORCYCLE_MODELS_AI = {"Generic": ["Motorcycle"]}
+from vehicles import KITT # Road class receives the KITT object (AI vehicles come from the spawn catalogue)
+from vehicle_store import VehicleStore
+from spatial_index import LaneIndex
+from events import simulation_events, Collision, EndOfRoad, KittDestroyed
+from spawn_catalogue import get_catalogue
+
+# Crash risk: safe following distance is CRASH_RISK_HEADWAY_S of the follower's speed.
+# (risk, share of the safe distance, minimum closing speed km/h) from worst to mildest.
+CRASH_RISK_HEADWAY_S = 2.5
+CRASH_RISK_LEVELS = (("CRITICAL!", 0.35, 20), ("High", 0.6, 10), ("Medium", 1.1, None))
+CRASH_RISK_NAMES = tuple(name for name, _, _ in CRASH_RISK_LEVELS)
+# Precomputed: the distance threshold is the follower speed (km/h) times the factor
+_CRASH_RISK_THRESHOLDS = tuple((name, CRASH_RISK_HEADWAY_S / 3.6 * share, -float("inf") if min_closing_kmh is None else min_closing_kmh)
+                               for name, share, min_closing_kmh in CRASH_RISK_LEVELS)
+_get_speed = attrgetter("speed")
+
+# Collisions and adaptive sub-stepping: KITT is checked against the AI vehicles it could reach
+# during a tick after every sub-step, so fast closing (turbo) cannot jump over a vehicle.
+COLLISION_DISTANCE_M = 15 # KITT collides with AI vehicles closer than this in its lane
+SUBSTEP_MAX_CLOSING_M = 25.0 # Closing distance per sub-step; below 2 x COLLISION_DISTANCE_M, so no pass goes unseen
+MAX_SUBSTEPS = 16 # Sub-steps per tick
+MAX_SUBSTEP_WORK = 256 # Position updates per tick spent on sub-steps (sub-steps x vehicles involved)
+MAX_AI_SPEED_KMH = 250 # Above any AI vehicle's max speed (bounds the sub-step search range)
+
+def classify_crash_risk(distance_m, follower_speed_kmh, leader_speed_kmh):
+    """Risk level of a vehicle distance_m behind its leader ("Low" if no threshold applies)."""
+    closing_speed_kmh = follower_speed_kmh - leader_speed_kmh # Positive if the follower is faster
+    for name, distance_factor, min_closing_kmh in _CRASH_RISK_THRESHOLDS:
+        if distance_m < follower_speed_kmh * distance_factor and closing_speed_kmh > min_closing_kmh:
+            return name
+    return "Low"
 
 # --- Helper Functions (Can be in this file or separate utils.py file) ---
 def clear_terminal():
     """Clears terminal according to operating system."""
     os.system('cls' if os.name == 'nt' else 'clear')
 
+EMPTY_ROAD_CELL = " . "
+ZOOM_SCALES_M = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000) # Meters per character of the zoom levels
+DETAIL_MAX_SCALE_M = 50 # Coarser scales show the number of vehicles per cell instead of their symbols
+_ROAD_TEMPLATES = {} # (lane_count, viewport_width_characters) -> (separator line, lane divider line)
+
+def road_grid_template(lane_count, viewport_width_characters):
+    """Static lines of the road drawing, built once per lane count and viewport width."""
+    key = (lane_count, viewport_width_characters)
+    template = _ROAD_TEMPLATES.get(key)
+    if template is None:
+        separator_line = "---" * viewport_width_characters + "-" * (viewport_width_characters + 1)
+        lane_divider_line = "   |" + "|".join(["---"] * viewport_width_characters) + "|"
+        template = _ROAD_TEMPLATES[key] = (separator_line, lane_divider_line)
+    return template
+
+SPAWN_PLACEMENT_ATTEMPTS = 50 # Random positions tried before giving up on spawning a vehicle
+SPAWN_GAP_M = 40 # Minimum gap between a new vehicle and KITT or other vehicles in its lane
+
+def draw_vehicle_model(vehicle_class):
+    """Draws a random (brand, model, max_speed) for a Car, Truck or Motorcycle from the spawn catalogue."""
+    return get_catalogue().draw_for_class(vehicle_class)
+
 VEHICLE_ID_COUNTER_ROAD = 0 # Different name to avoid confusion with counter in other files
 def generate_unique_ai_vehicle_id():
-    """Generates unique ID for AI vehicles."""
+    """Generates unique ID for AI vehicles (an integer, shown as "ai_vehicle<N>")."""
     global VEHICLE_ID_COUNTER_ROAD
     VEHICLE_ID_COUNTER_ROAD += 1
-    return f"ai_vehicle{VEHICLE_ID_COUNTER_ROAD}"
+    return VEHICLE_ID_COUNTER_ROAD
 
 class Road:
     """
     Manages the simulation road, AI vehicles on it, and general environment.
     """
-    def __init__(self, length_meters, lane_count, speed_limit_kmh=120):
+    events = simulation_events # Event bus for collisions and the end of the run (assign an EventBus to isolate a road)
+
+    def __init__(self, length_meters, lane_count, speed_limit_kmh=120, max_ai_vehicles=None, intersection_positions=None):
         self.length_meters = int(length_meters)
         self.lane_count = int(lane_count)
         self.speed_limit_kmh = int(speed_limit_kmh)
+        # Random spawning stops at this many AI vehicles (default: 4 per lane)
+        self.max_ai_vehicles = int(max_ai_vehicles) if max_ai_vehicles is not None else self.lane_count * 4
+        self.vehicle_mix = None # Relative weights of Car, Truck, Motorcycle for random spawns (None: equal)
         
-        self.ai_vehicles = [] # AI vehicles on road other than KITT
+        self.vehicle_store = VehicleStore() # Pooled storage of AI vehicles
+        self.ai_vehicles = self.vehicle_store.vehicles # AI vehicles on road other than KITT (add/remove through vehicle_store)
+        self.lane_index = LaneIndex(self.vehicle_store) # AI vehicles by lane and position (refreshed on demand)
         self.kitt_vehicle = None # KITT object reference
         
-        # Intersection positions (meters from road start)
-        self.intersection_positions = [int(self.length_meters * 0.35), int(self.length_meters * 0.75)]
+        # Intersection positions (meters from road start), default at 35% and 75% of the road
+        if intersection_positions is None:
+            intersection_positions = [int(self.length_meters * 0.35), int(self.length_meters * 0.75)]
+        self.intersection_positions = list(intersection_positions)
         self.active_intersection_message = None # Intersection message to show user
+        self._crash_risk_key = None # (store version, KITT lane, position, speed) of the cached crash risk
+        self._crash_risk = None
+        self._traffic_risk_version = None
+        self._traffic_risk = None
         self.intersection_drift_done = {} # Tracks which intersection had drift: {intersection_pos: True}
+        self.max_substeps = MAX_SUBSTEPS # 1 disables adaptive sub-stepping
+        self.last_substeps = 1 # Sub-steps of the last tick
+        self.substepped_ticks = 0 # Ticks that needed more than one sub-step
 
         self.display_scale = 25.0 # How many meters each character represents in text display
         self.viewport_width_characters = 30 # Width of road section shown in terminal (in characters)
+        self.clear_screen = True # Clear terminal before each drawing (disabled for headless/benchmark output)
+
+        self.recorder = None # Optional TrajectoryRecorder (see recorder.py)
+        self.detectors = None # Optional TrafficDetectors (see traffic_detectors.py)
+        self.telemetry = None # Optional TelemetryServer (see telemetry.py)
+        # When set to a list, AI vehicles reaching the end of the road are moved into it
+        # instead of driving on until they are culled (used by road_network.py for hand-off)
+        self.exit_buffer = None
 
     def add_kitt_reference(self, kitt_object):
-        """Used to introduce KITT object to Road class."""
+        """Used to introduce KITT object to Road class. KITT publishes its events on the road's event bus."""
         if isinstance(kitt_object, KITT):
             self.kitt_vehicle = kitt_object
+            kitt_object.events = self.events
         else:
             print("Error: Only KITT object can be added to Road (add_kitt_reference).")
 
+    def attach_detectors(self, detectors):
+        """Updates detectors (TrafficDetectors, or None to detach) in every simulation step."""
+        self.detectors = detectors
+
+    def attach_telemetry(self, telemetry):
+        """Hands every simulation step to telemetry (TelemetryServer, or None to detach)."""
+        self.telemetry = telemetry
+
+    def attach_recorder(self, recorder):
+        """Records every simulation step with given TrajectoryRecorder (None to stop recording)."""
+        if self.recorder is not None:
+            self.events.unsubscribe(self.recorder.record_events)
+        self.recorder = recorder
+        if recorder is not None:
+            self.events.subscribe(recorder.record_events, recorder.event_types, batched=True)
+
+    def add_ai_vehicle(self, vehicle):
+        """Puts an already created AI vehicle on the road."""
+        self.vehicle_store.add(vehicle)
+
+    def remove_ai_vehicle(self, vehicle):
+        """Takes an AI vehicle off the road (O(1), the vehicle object may be reused later)."""
+        self.vehicle_store.remove(vehicle)
+
+    def spawn_position_free(self, lane, position, gap_m=SPAWN_GAP_M):
+        """True if neither KITT nor an AI vehicle in lane is closer than gap_m to position."""
+        # Check collision with KITT
+        if self.kitt_vehicle and self.kitt_vehicle.lane == lane and abs(self.kitt_vehicle.position - position) < gap_m:
+            return False
+        # Check collision with other AI vehicles
+        for ai_vehicle in self.ai_vehicles:
+            if ai_vehicle.lane == lane and abs(ai_vehicle.position - position) < gap_m:
+                return False
+        return True
+
     def add_random_ai_vehicle(self, count=1):
         """Adds specified number of random AI vehicles to road."""
-        for _ in range(count):
-            if len(self.ai_vehicles) >= self.lane_count * 4: # Don't let too many AI vehicles on road
+        # Class, model and max speed of every requested vehicle in one catalogue draw
+        for SelectedClass, brand, model, max_speed in get_catalogue().draw_batch(count, self.vehicle_mix):
+            if len(self.ai_vehicles) >= self.max_ai_vehicles: # Don't let too many AI vehicles on road
                 return
 
-            vehicle_classes = [Car, Truck, Motorcycle]
-            SelectedClass = random.choice(vehicle_classes)
             vehicle_id = generate_unique_ai_vehicle_id()
             
             # Position and lane selection to prevent vehicle clustering
-            while True:
+            for _ in range(SPAWN_PLACEMENT_ATTEMPTS):
                 starting_lane = random.randint(1, self.lane_count)
                 # Start around KITT or in certain section of road
                 if self.kitt_vehicle:
@@ -94,38 +181,12 @@ class Road:
                 else:
                     starting_position = float(random.randint(0, int(self.length_meters * 0.7)))
 
-                no_collision = True
-                test_gap = 40 # Minimum gap between vehicles (meters)
-                
-                # Check collision with KITT
-                if self.kitt_vehicle and self.kitt_vehicle.lane == starting_lane and \
-                   abs(self.kitt_vehicle.position - starting_position) < test_gap:
-                    no_collision = False
-                
-                # Check collision with other AI vehicles
-                if no_collision:
-                    for ai_vehicle in self.ai_vehicles:
-                        if ai_vehicle.lane == starting_lane and \
-                           abs(ai_vehicle.position - starting_position) < test_gap:
-                            no_collision = False
-                            break
-                
-                if no_collision:
-                    break 
+                if self.spawn_position_free(starting_lane, starting_position):
+                    break
+            else:
+                return # No free spot found (dense road), skip spawning
             
-            new_ai_vehicle = None
-            if SelectedClass == Car:
-                brand = random.choice(list(CAR_MODELS_AI.keys()))
-                model = random.choice(CAR_MODELS_AI[brand])
-                new_ai_vehicle = Car(vehicle_id, brand, model, random.randint(90, 150), starting_lane, starting_position)
-            elif SelectedClass == Truck:
-                brand = random.choice(list(TRUCK_MODELS_AI.keys()))
-                model = random.choice(TRUCK_MODELS_AI[brand])
-                new_ai_vehicle = Truck(vehicle_id, brand, model, random.randint(70, 100), starting_lane, starting_position)
-            elif SelectedClass == Motorcycle:
-                brand = random.choice(list(MOTORCYCLE_MODELS_AI.keys()))
-                model = random.choice(MOTORCYCLE_MODELS_AI[brand])
-                new_ai_vehicle = Motorcycle(vehicle_id, brand, model, random.randint(110, 170), starting_lane, starting_position)
+            new_ai_vehicle = self.vehicle_store.acquire(SelectedClass, vehicle_id, brand, model, max_speed, starting_lane, starting_position)
             
             if new_ai_vehicle:
                 # Adjust speed of newly added vehicle based on KITT's speed or road speed limit
@@ -133,35 +194,64 @@ class Road:
                     new_ai_vehicle.speed = max(30, min(new_ai_vehicle.max_speed, self.kitt_vehicle.speed + random.randint(-30, 5)))
                 else:
                     new_ai_vehicle.speed = max(30, min(new_ai_vehicle.max_speed, self.speed_limit_kmh - random.randint(0, 20)))
-                self.ai_vehicles.append(new_ai_vehicle)
 
     def calculate_crash_risk(self):
-        """Calculates crash risk with vehicle ahead for KITT."""
+        """
+        Calculates crash risk with vehicle ahead for KITT. The result is reused until AI vehicles
+        or KITT move (the renderer and the front-ends ask for it several times per tick).
+        """
         if not self.kitt_vehicle: return "N/A", None
+        kitt = self.kitt_vehicle
+        cache_key = (self.vehicle_store.version, kitt.lane, kitt.position, kitt.speed)
+        if cache_key == self._crash_risk_key:
+            return self._crash_risk
         
         risk_status = "Low"
-        closest_front_vehicle = None
-        min_distance_ahead = float('inf')
-
-        for ai_vehicle in self.ai_vehicles:
-            if ai_vehicle.lane == self.kitt_vehicle.lane: # Same lane as KITT
-                distance = ai_vehicle.position - self.kitt_vehicle.position # Positive if AI vehicle is ahead of KITT
-                if 0 < distance < min_distance_ahead: # Ahead of KITT and closest
-                    min_distance_ahead = distance
-                    closest_front_vehicle = ai_vehicle
-        
+        # Closest AI vehicle ahead of KITT in the same lane
+        closest_front_vehicle = self.lane_index.leader(kitt.lane, kitt.position)
         if closest_front_vehicle:
-            distance_m = min_distance_ahead
-            speed_difference_kmh = self.kitt_vehicle.speed - closest_front_vehicle.speed # Positive if KITT is faster
+            risk_status = classify_crash_risk(closest_front_vehicle.position - kitt.position, kitt.speed, closest_front_vehicle.speed)
             
-            # Safe following distance (e.g. 2 second rule, in meters)
-            safe_distance_m = (self.kitt_vehicle.speed / 3.6) * 2.5 # 2.5 seconds
-            
-            if distance_m < safe_distance_m * 0.35 and speed_difference_kmh > 20: risk_status = "CRITICAL!"
-            elif distance_m < safe_distance_m * 0.6 and speed_difference_kmh > 10: risk_status = "High"
-            elif distance_m < safe_distance_m * 1.1: risk_status = "Medium"
-            
-        return risk_status, closest_front_vehicle
+        self._crash_risk_key = cache_key
+        self._crash_risk = (risk_status, closest_front_vehicle)
+        return self._crash_risk
+
+    def traffic_risk_statistics(self):
+        """
+        Crash risk of every AI vehicle towards its leader in the same lane (same thresholds as
+        KITT's), as {"pairs", risk level counts, "mean_gap_m", "close_share"}. Computed from the
+        lane index once per step and reused until vehicles move again.
+        """
+        store_version = self.vehicle_store.version
+        if store_version == self._traffic_risk_version:
+            return self._traffic_risk
+        self.lane_index.refresh()
+        counts = dict.fromkeys(CRASH_RISK_NAMES, 0)
+        mildest_factor = _CRASH_RISK_THRESHOLDS[-1][1]
+        gap_sum_m = 0.0
+        for lane, vehicles in self.lane_index.lane_vehicles.items():
+            positions = self.lane_index.lane_positions[lane]
+            speeds = list(map(_get_speed, vehicles))
+            gaps = list(map(sub, positions[1:], positions))
+            gap_sum_m += sum(gaps)
+            # Same test as classify_crash_risk, inlined (it runs for every pair on the road);
+            # pairs beyond the mildest threshold, the common case, cost one comparison
+            for gap_m, follower_speed, leader_speed in zip(gaps, speeds, speeds[1:]):
+                if gap_m < follower_speed * mildest_factor:
+                    closing_speed_kmh = follower_speed - leader_speed
+                    for name, distance_factor, min_closing_kmh in _CRASH_RISK_THRESHOLDS:
+                        if gap_m < follower_speed * distance_factor and closing_speed_kmh > min_closing_kmh:
+                            counts[name] += 1
+                            break
+        pair_count = max(0, len(self.ai_vehicles) - len(self.lane_index.lane_vehicles))
+        statistics = {"pairs": pair_count}
+        statistics.update(counts)
+        statistics["Low"] = pair_count - sum(counts.values())
+        statistics["mean_gap_m"] = gap_sum_m / pair_count if pair_count else 0.0
+        statistics["close_share"] = (pair_count - statistics["Low"]) / pair_count if pair_count else 0.0
+        self._traffic_risk_version = store_version
+        self._traffic_risk = statistics
+        return statistics
 
     def check_intersection_for_kitt(self):
         """Checks if KITT is approaching an intersection."""
@@ -176,11 +266,8 @@ class Road:
                     return True, intersection_position_m # Drift time and intersection position
         return False, 0 # Not drift time yet or not at intersection
 
-    def show_text_based_road(self):
-        """Draws current state of road and vehicles as text in terminal."""
-        clear_terminal()
-
-        # Viewport calculations
+    def viewport_bounds(self):
+        """(viewport_start_m, viewport_end_m) of the road section shown around KITT."""
         kitt_pos_m = self.kitt_vehicle.position if self.kitt_vehicle else self.length_meters / 2
         viewport_width_m = self.viewport_width_characters * self.display_scale
         
@@ -191,55 +278,104 @@ class Road:
         # If end boundary causes start to shift, adjust (to show full viewport when reaching end of road)
         if viewport_end_m == self.length_meters:
             viewport_start_m = max(0, self.length_meters - viewport_width_m)
-        
-        # Header
-        view_str = f"View: {viewport_start_m:.0f}m - {viewport_end_m:.0f}m"
-        print(f"=== KNIGHT RIDER SIMULATION (Road: {self.length_meters}m | Speed Limit: {self.speed_limit_kmh}km/h | Scale: 1char={self.display_scale:.0f}m | {view_str}) ===")
-        
+        return viewport_start_m, viewport_end_m
+
+    def zoom(self, steps):
+        """
+        Moves display_scale steps zoom levels coarser (positive) or finer (negative) in ZOOM_SCALES_M,
+        stopping at the level that shows the whole road. Returns the new scale.
+        """
+        fit_scale_m = self.length_meters / self.viewport_width_characters
+        levels = sorted({scale_m for scale_m in ZOOM_SCALES_M if scale_m < fit_scale_m} | {fit_scale_m})
+        current = min(range(len(levels)), key=lambda index: abs(levels[index] - self.display_scale))
+        self.display_scale = float(levels[min(max(current + steps, 0), len(levels) - 1)])
+        return self.display_scale
+
+    def zoom_to_fit(self):
+        """Shows the whole road (one cell per length / viewport width)."""
+        self.display_scale = self.length_meters / self.viewport_width_characters
+        return self.display_scale
+
+    def viewport_cells(self, viewport_start_m, viewport_end_m):
+        """Road drawing as [lane][cell] 3-character symbols (shared by the text and curses front-ends)."""
+        if self.display_scale > DETAIL_MAX_SCALE_M:
+            return self.density_cells(viewport_start_m)
         # list_length is now viewport width
         list_length_characters = self.viewport_width_characters 
-        road_drawing = [[" . " for _ in range(list_length_characters)] for _ in range(self.lane_count)]
+        road_drawing = [[EMPTY_ROAD_CELL] * list_length_characters for _ in range(self.lane_count)]
 
-        # First add KITT then AI vehicles to drawing list
+        # First add KITT then the AI vehicles inside the viewport (looked up in the lane index, no full scan)
         all_vehicles_to_show = []
-        if self.kitt_vehicle:
+        if self.kitt_vehicle and viewport_start_m <= self.kitt_vehicle.position < viewport_end_m:
             all_vehicles_to_show.append(self.kitt_vehicle)
-        all_vehicles_to_show.extend(self.ai_vehicles)
+        all_vehicles_to_show.extend(self.lane_index.in_range(viewport_start_m, viewport_end_m))
 
         for g_vehicle in all_vehicles_to_show:
-            vehicle_pos_m = g_vehicle.position
-            # Is vehicle within viewport?
-            if viewport_start_m <= vehicle_pos_m < viewport_end_m:
-                # Vehicle's relative position within viewport (in meters, relative to viewport start)
-                vehicle_relative_pos_m = vehicle_pos_m - viewport_start_m
-                vehicle_pos_idx = int(vehicle_relative_pos_m / self.display_scale)
+            # Vehicle's relative position within viewport (in meters, relative to viewport start)
+            vehicle_relative_pos_m = g_vehicle.position - viewport_start_m
+            vehicle_pos_idx = int(vehicle_relative_pos_m / self.display_scale)
+            
+            # Make sure index is within viewport boundaries
+            vehicle_pos_idx = min(max(0, vehicle_pos_idx), list_length_characters - 1)
+            vehicle_lane_idx = g_vehicle.lane - 1
+
+            if 0 <= vehicle_lane_idx < self.lane_count: 
+                current_cell_content = road_drawing[vehicle_lane_idx][vehicle_pos_idx]
+                new_symbol = g_vehicle.vehicle_symbol
                 
-                # Make sure index is within viewport boundaries
-                vehicle_pos_idx = min(max(0, vehicle_pos_idx), list_length_characters - 1)
-                vehicle_lane_idx = g_vehicle.lane - 1
-
-                if 0 <= vehicle_lane_idx < self.lane_count: 
-                    current_cell_content = road_drawing[vehicle_lane_idx][vehicle_pos_idx]
-                    new_symbol = g_vehicle.vehicle_symbol
-                    
-                    if current_cell_content == " . ":
-                        road_drawing[vehicle_lane_idx][vehicle_pos_idx] = new_symbol
-                    elif isinstance(g_vehicle, KITT):
-                        road_drawing[vehicle_lane_idx][vehicle_pos_idx] = new_symbol
-                    elif new_symbol not in current_cell_content and len(current_cell_content.replace(" ","")) < 2:
-                        road_drawing[vehicle_lane_idx][vehicle_pos_idx] = (current_cell_content.strip() + new_symbol[0])[:3].center(3)
-
-        # Draw Road
-        road_separator_line = "---" * list_length_characters + "-" * (list_length_characters + 1)
-        print(road_separator_line)
+                if current_cell_content == EMPTY_ROAD_CELL:
+                    road_drawing[vehicle_lane_idx][vehicle_pos_idx] = new_symbol
+                elif g_vehicle is self.kitt_vehicle:
+                    road_drawing[vehicle_lane_idx][vehicle_pos_idx] = new_symbol
+                elif new_symbol not in current_cell_content and len(current_cell_content.replace(" ","")) < 2:
+                    road_drawing[vehicle_lane_idx][vehicle_pos_idx] = (current_cell_content.strip() + new_symbol[0])[:3].center(3)
+        return road_drawing
+
+    def density_cells(self, viewport_start_m):
+        """
+        Zoomed-out road drawing: each cell holds the number of AI vehicles in its display_scale meters
+        of the lane (KITT's cell shows KITT). Counted from the lane index with one binary search per
+        cell edge, so a frame costs the same for a 2 km road with a few cars and 100 km with thousands.
+        """
+        cell_count = self.viewport_width_characters
+        lane_counts = self.lane_index.lane_counts_in_bins(viewport_start_m, viewport_start_m + cell_count * self.display_scale, cell_count)
+        road_drawing = []
+        for lane in range(1, self.lane_count + 1):
+            counts = lane_counts.get(lane)
+            road_drawing.append([EMPTY_ROAD_CELL if not count else (str(count) if count < 1000 else f"{count // 1000}k").center(3)
+                                 for count in counts] if counts else [EMPTY_ROAD_CELL] * cell_count)
+        kitt = self.kitt_vehicle
+        if kitt and 1 <= kitt.lane <= self.lane_count:
+            kitt_cell = int((kitt.position - viewport_start_m) / self.display_scale)
+            if 0 <= kitt_cell < cell_count:
+                road_drawing[kitt.lane - 1][kitt_cell] = kitt.vehicle_symbol
+        return road_drawing
+
+    def show_text_based_road(self):
+        """Draws current state of road and vehicles as text in terminal."""
+        if self.clear_screen:
+            clear_terminal()
+
+        viewport_start_m, viewport_end_m = self.viewport_bounds()
+        
+        # Header
+        view_str = f"View: {viewport_start_m:.0f}m - {viewport_end_m:.0f}m"
+        if self.display_scale > DETAIL_MAX_SCALE_M:
+            view_str += " | Cells: vehicle count"
+        print(f"=== KNIGHT RIDER SIMULATION (Road: {self.length_meters}m | Speed Limit: {self.speed_limit_kmh}km/h | Scale: 1char={self.display_scale:.0f}m | {view_str}) ===")
+        
+        list_length_characters = self.viewport_width_characters 
+        road_drawing = self.viewport_cells(viewport_start_m, viewport_end_m)
+
+        # Draw Road (static lines come from the cached template)
+        road_separator_line, lane_divider_line = road_grid_template(self.lane_count, list_length_characters)
+        road_lines = [road_separator_line]
         for i in range(self.lane_count):
-            lane_output = f"L{i+1}|"
-            for cell_idx in range(list_length_characters):
-                lane_output += f"{road_drawing[i][cell_idx].center(3)}|"
-            print(lane_output)
+            road_lines.append(f"L{i+1}|" + "".join([f"{cell.center(3)}|" for cell in road_drawing[i]]))
             if i < self.lane_count - 1:
-                 print("   |" + "|".join(["---" for _ in range(list_length_characters)]) + "|")
-        print(road_separator_line)
+                road_lines.append(lane_divider_line)
+        road_lines.append(road_separator_line)
+        print("\n".join(road_lines))
         
         # KITT Information (always shown)
         if self.kitt_vehicle:
@@ -260,26 +396,88 @@ class Road:
             if self.active_intersection_message: 
                 print(f"      {self.active_intersection_message}")
 
+    def _substep_plan(self, time_step_seconds):
+        """
+        (sub-steps, vehicles) for the next tick: the AI vehicles in KITT's lane that KITT could close in
+        on to collision distance during the tick, and enough sub-steps to keep the closing distance per
+        sub-step under SUBSTEP_MAX_CLOSING_M (within max_substeps and MAX_SUBSTEP_WORK).
+        Empty stretches and slow traffic give (1, ()): one step, as without sub-stepping.
+        """
+        kitt = self.kitt_vehicle
+        if not kitt or not self.ai_vehicles or self.max_substeps <= 1:
+            return 1, ()
+        meters_per_kmh = time_step_seconds / 3.6 # Distance covered per km/h during the tick
+        reach_m = COLLISION_DISTANCE_M + max(kitt.speed, MAX_AI_SPEED_KMH) * meters_per_kmh
+        vehicles = []
+        max_closing_m = 0.0
+        for vehicle in self.lane_index.in_range(kitt.position - reach_m, kitt.position + reach_m, kitt.lane):
+            offset_m = vehicle.position - kitt.position
+            closing_m = (kitt.speed - vehicle.speed) * meters_per_kmh # How much nearer KITT gets to a vehicle ahead
+            if offset_m < 0:
+                closing_m = -closing_m
+            if closing_m > 0 and abs(offset_m) - COLLISION_DISTANCE_M < closing_m:
+                vehicles.append(vehicle)
+                max_closing_m = max(max_closing_m, closing_m)
+        if max_closing_m <= SUBSTEP_MAX_CLOSING_M:
+            return 1, ()
+        substeps = min(math.ceil(max_closing_m / SUBSTEP_MAX_CLOSING_M), self.max_substeps,
+                       max(1, MAX_SUBSTEP_WORK // (len(vehicles) + 1)))
+        return substeps, vehicles
+
+    def _advance_kitt_in_substeps(self, substeps, vehicles, time_step_seconds):
+        """Moves KITT and the given AI vehicles over the tick in sub-steps, handling collisions after each."""
+        kitt = self.kitt_vehicle
+        substep_seconds = time_step_seconds / substeps
+        vehicles = list(vehicles)
+        for _ in range(substeps):
+            kitt.update_position(substep_seconds)
+            for vehicle in vehicles:
+                vehicle.update_position(substep_seconds)
+            for vehicle in [vehicle for vehicle in vehicles if abs(vehicle.position - kitt.position) < COLLISION_DISTANCE_M]:
+                vehicles.remove(vehicle)
+                self._handle_kitt_collision(kitt, vehicle)
+
     def advance_simulation_step(self, time_step_seconds=1.0, new_ai_vehicle_probability=0.1):
-        """Advances one step of simulation. Updates all vehicle positions, manages AI behaviors."""
+        """
+        Advances one step of simulation. Updates all vehicle positions, manages AI behaviors.
+        KITT and the vehicles it could hit this tick move in adaptive sub-steps (see _substep_plan).
+        """
+        if self.detectors is not None:
+            self.detectors.before_step(self, time_step_seconds)
+        substeps, substep_vehicles = self._substep_plan(time_step_seconds)
+        self.last_substeps = substeps
+        substepped_vehicles = None
+        if substeps > 1:
+            self.substepped_ticks += 1
+            substepped_vehicles = set(substep_vehicles)
+
         # 1. Update KITT's position
         if self.kitt_vehicle:
-            self.kitt_vehicle.update_position(time_step_seconds)
+            if substepped_vehicles is not None:
+                self._advance_kitt_in_substeps(substeps, substep_vehicles, time_step_seconds)
+            else:
+                self.kitt_vehicle.update_position(time_step_seconds)
             # Check if KITT reached end of road or took damage
             if self.kitt_vehicle.position >= self.length_meters:
-                print("\n### KITT REACHED END OF ROAD! CONGRATULATIONS! ###")
+                self.events.publish(EndOfRoad, self.kitt_vehicle.position)
+                self._finish_step(time_step_seconds) # The terminal tick is recorded too
                 return False # End simulation
             if self.kitt_vehicle.damage >= 100:
-                print("\n### KITT IS UNUSABLE! MISSION FAILED! ###")
+                self.events.publish(KittDestroyed, self.kitt_vehicle.damage)
+                self._finish_step(time_step_seconds)
                 return False # End simulation
 
         # 2. Update AI Vehicles
-        for ai_vehicle_object in self.ai_vehicles[:]: # Work on copy of list (in case of removal)
-            ai_vehicle_object.update_position(time_step_seconds)
+        min_position_m, max_position_m = -150, self.length_meters + 100 # Vehicles outside this (wider margin) leave the road
+        exit_position_m = self.length_meters if self.exit_buffer is not None else max_position_m
+        vehicles_left_road = False
+        for ai_vehicle_object in self.ai_vehicles:
+            if substepped_vehicles is None or ai_vehicle_object not in substepped_vehicles: # Already moved in sub-steps
+                ai_vehicle_object.update_position(time_step_seconds)
 
-            # Remove AI vehicles that left the road
-            if ai_vehicle_object.position >= self.length_meters + 100 or ai_vehicle_object.position < -150: # Wider margin
-                self.ai_vehicles.remove(ai_vehicle_object)
+            # AI vehicles that left the road are removed in one pass after the loop
+            if ai_vehicle_object.position >= exit_position_m or ai_vehicle_object.position < min_position_m:
+                vehicles_left_road = True
                 continue
             
             # Simple AI Behaviors (speed adjustment, lane changing - very basic)
@@ -296,40 +494,53 @@ class Road:
             elif ai_vehicle_object.speed > target_speed_ai + 5 and random.random() < 0.15:
                 ai_vehicle_object.brake(random.randint(3, 8))
 
+        if self.ai_vehicles:
+            self.vehicle_store.mark_moved()
+        if vehicles_left_road:
+            if self.exit_buffer is not None:
+                self.exit_buffer.extend(self.vehicle_store.take_from(self.length_meters))
+            self.vehicle_store.cull_outside(min_position_m, max_position_m)
+        if self.detectors is not None:
+            self.detectors.after_step(self)
+
         # 3. Add New AI Vehicles
         if random.random() < new_ai_vehicle_probability:
             self.add_random_ai_vehicle()
-            
+
+        self._finish_step(time_step_seconds)
         return True # Continue simulation
 
+    def _finish_step(self, time_step_seconds):
+        """Records and publishes the state after a step (every exit path of advance_simulation_step)."""
+        if self.recorder:
+            self.recorder.record_tick(self)
+        if self.telemetry is not None:
+            self.telemetry.publish(self, time_step_seconds)
+
+    def _handle_kitt_collision(self, kitt, ai_vehicle):
+        """Damages KITT and removes ai_vehicle after they collided. Returns True on critical damage."""
+        # Calculate damage based on speed difference
+        speed_diff = abs(kitt.speed - ai_vehicle.speed)
+        base_damage = 20 + (speed_diff * 0.5)
+        self.events.publish(Collision, ai_vehicle.vehicle_id, ai_vehicle.brand, ai_vehicle.model, kitt.position, base_damage)
+
+        # KITT takes damage
+        critical_damage = kitt.take_damage(base_damage)
+
+        # Remove the AI vehicle from road (it's destroyed/disabled)
+        self.remove_ai_vehicle(ai_vehicle)
+        return critical_damage
+
     def check_and_handle_collisions(self, kitt):
         """Checks and handles collisions between KITT and AI vehicles."""
         if not kitt:
             return
         
-        collision_distance = 15 # Distance threshold for collision (meters)
-        
         for ai_vehicle in self.ai_vehicles[:]:
             # Check if in same lane and close enough
             if (ai_vehicle.lane == kitt.lane and 
-                abs(ai_vehicle.position - kitt.position) < collision_distance):
-                
-                print(f"\n!!! COLLISION DETECTED !!!")
-                print(f"KITT collided with {ai_vehicle.vehicle_id} ({ai_vehicle.brand} {ai_vehicle.model})")
-                
-                # Calculate damage based on speed difference
-                speed_diff = abs(kitt.speed - ai_vehicle.speed)
-                base_damage = 20 + (speed_diff * 0.5)
-                
-                # KITT takes damage
-                critical_damage = kitt.take_damage(base_damage)
-                
-                # Remove the AI vehicle from road (it's destroyed/disabled)
-                self.ai_vehicles.remove(ai_vehicle)
-                print(f"{ai_vehicle.vehicle_id} removed from road due to collision.")
-                
-                if critical_damage:
-                    print("KITT has taken critical damage!")
-                    return True # Signal critical damage
+                abs(ai_vehicle.position - kitt.position) < COLLISION_DISTANCE_M):
+                if self._handle_kitt_collision(kitt, ai_vehicle):
+                    return True # Signal critical damage (KITT published CriticalDamage)
         
         return False # No critical damage
\ No newline at end of file
@@ -0,0 +1,556 @@
+# road_network.py
+#
+# City-scale traffic: many Road segments connected at intersections (graph nodes).
+#   python road_network.py --rows 20 --columns 20 --ticks 500 --partitions 4 --processes --verify
+# The segments are split into partitions. Each tick every partition steps its own segments
+# (with --processes in its own worker process) and reports back only its boundary state:
+# the vehicles that reached the end of a segment and, per segment, the vehicle count, the
+# leading vehicle's distance to the end and the lanes whose entry is blocked. The coordinator
+# then applies the intersection rules (signal or priority) in one serial exchange pass and
+# sends the vehicles that cross to the partition owning their next segment.
+# Every partition steps with its own random generator state, so for the same seed and
+# partition count the results are identical in-process and with worker processes.
+
+import argparse
+import heapq
+import math
+import multiprocessing
+import random
+import sys
+import time
+from collections import deque
+
+from road_management import Road, generate_unique_ai_vehicle_id
+from spawn_catalogue import get_catalogue
+from spatial_index import LaneIndex
+from vehicle_store import VehicleStore
+from vehicles import Vehicle, Car, Truck, Motorcycle
+
+# Intersection control types
+UNCONTROLLED = "uncontrolled" # Vehicles cross as soon as the next segment has room
+SIGNAL = "signal" # Incoming segments get green in turn, green_ticks each
+PRIORITY = "priority" # Lower priority segments yield to vehicles approaching on higher priority ones
+
+ENTRY_GAP_M = 10.0 # A segment lane is blocked while a vehicle is closer than this to its start
+START_SPEED_KMH = 20.0 # Speed of a vehicle that was stopped at an intersection when it moves on
+
+VEHICLE_CLASSES_BY_KIND = {cls.kind_code: cls for cls in (Vehicle, Car, Truck, Motorcycle)}
+
+
+class Intersection:
+    """
+    Graph node. Vehicles that reached the end of an incoming segment wait in that
+    segment's queue until the intersection rule lets them cross.
+    """
+    def __init__(self, node_id, control=UNCONTROLLED, green_ticks=25, yield_distance_m=40.0,
+                 discharge_per_tick=2, location=None):
+        self.node_id = node_id
+        self.control = control
+        self.green_ticks = int(green_ticks)
+        self.yield_distance_m = float(yield_distance_m)
+        self.discharge_per_tick = int(discharge_per_tick) # Vehicles released per incoming segment and tick
+        self.location = location # Optional (x, y), only used for display/partitioning
+        self.incoming = [] # Segment ids ending here
+        self.outgoing = [] # Segment ids starting here
+        self.priority_order = [] # Incoming segment ids, highest priority first (PRIORITY control)
+        self.queues = {} # Incoming segment id -> deque of waiting vehicles
+
+    def green_segment(self, tick):
+        """Incoming segment that has green at given tick (SIGNAL control)."""
+        if not self.incoming:
+            return None
+        return self.incoming[(tick // self.green_ticks) % len(self.incoming)]
+
+    def waiting_count(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+
+class TransitVehicle:
+    """
+    A vehicle between two segments (queued at an intersection or on its way to the partition
+    that owns its next segment): its plain state, which is all that crosses a partition boundary.
+    """
+    __slots__ = ("vehicle_number", "kind_code", "brand", "model", "max_speed", "lane", "position", "speed")
+
+    def __init__(self, vehicle_number, kind_code, brand, model, max_speed, lane, position, speed):
+        self.vehicle_number = vehicle_number
+        self.kind_code = kind_code
+        self.brand = brand
+        self.model = model
+        self.max_speed = max_speed
+        self.lane = lane
+        self.position = position
+        self.speed = speed
+
+    @classmethod
+    def from_vehicle(cls, vehicle):
+        return cls(vehicle.vehicle_number, vehicle.kind_code, vehicle.brand, vehicle.model, vehicle.max_speed,
+                   vehicle.lane, vehicle.position, vehicle.speed)
+
+
+class RoadSegment(Road):
+    """A Road between two intersections. Vehicles reaching its end go to exit_buffer for hand-off."""
+    def __init__(self, segment_id, from_node, to_node, length_meters, lane_count, speed_limit_kmh=50,
+                 free_vehicles=None):
+        super().__init__(length_meters, lane_count, speed_limit_kmh, max_ai_vehicles=0, intersection_positions=[])
+        self.segment_id = segment_id
+        self.from_node = from_node
+        self.to_node = to_node
+        self.travel_time_s = self.length_meters / (self.speed_limit_kmh / 3.6) # Routing cost
+        self.clear_screen = False
+        self.exit_buffer = []
+        if free_vehicles is not None: # Share retired vehicle objects with the other segments
+            self.vehicle_store = VehicleStore(free_vehicles=free_vehicles)
+            self.ai_vehicles = self.vehicle_store.vehicles
+            self.lane_index = LaneIndex(self.vehicle_store)
+
+    def spec(self):
+        """Constructor arguments (without vehicles), to rebuild the segment in a worker process."""
+        return self.segment_id, self.from_node, self.to_node, self.length_meters, self.lane_count, self.speed_limit_kmh
+
+    def distance_to_end(self):
+        """Distance of the leading vehicle to the end of the segment (inf when empty)."""
+        if not self.ai_vehicles:
+            return math.inf
+        lane_index = self.lane_index
+        last_vehicles = [lane_index.follower(lane, math.inf) for lane in range(1, self.lane_count + 1)]
+        return self.length_meters - max(vehicle.position for vehicle in last_vehicles if vehicle is not None)
+
+    def lane_entry_blocked(self, lane):
+        """True if a vehicle in lane is closer than ENTRY_GAP_M to the start of the segment."""
+        return self.lane_index.follower(lane, ENTRY_GAP_M) is not None
+
+    def boundary_state(self):
+        """
+        (vehicle count, distance_to_end(), tuple of lanes with lane_entry_blocked()): what the
+        intersections need to know, from one pass over the lane index.
+        """
+        if not self.ai_vehicles:
+            return 0, math.inf, ()
+        lane_positions = self.lane_index.refresh().lane_positions
+        lead_position = max(positions[-1] for positions in lane_positions.values() if positions)
+        blocked_lanes = tuple(lane for lane, positions in lane_positions.items() if positions and positions[0] < ENTRY_GAP_M)
+        return len(self.ai_vehicles), self.length_meters - lead_position, blocked_lanes
+
+
+class NetworkPartition:
+    """
+    Group of segments stepped together, with its own random generator state. A partition
+    only touches its own segments: vehicles enter and leave it as TransitVehicles.
+    """
+    def __init__(self, partition_id, segments, seed):
+        self.partition_id = partition_id
+        self.segments = {segment.segment_id: segment for segment in segments}
+        self.seed = seed
+        self.random_state = random.Random(seed).getstate()
+
+    def step(self, time_step_seconds, arrivals):
+        """
+        Places arrivals ((segment id, TransitVehicle) pairs), then steps all non-empty segments.
+        Returns (exits: [(segment id, [TransitVehicle])], boundary states: {segment id: boundary_state()})
+        of the segments that were stepped.
+        Uses the module random generator with this partition's state (the caller keeps its own).
+        """
+        random.setstate(self.random_state)
+        segments = self.segments
+        classes = VEHICLE_CLASSES_BY_KIND
+        for segment_id, transit in arrivals:
+            vehicle = segments[segment_id].vehicle_store.acquire(
+                classes.get(transit.kind_code, Vehicle), transit.vehicle_number, transit.brand, transit.model,
+                transit.max_speed, transit.lane, transit.position)
+            vehicle.speed = transit.speed
+
+        exits = []
+        boundary_states = {}
+        for segment_id, segment in segments.items():
+            if not segment.ai_vehicles:
+                continue
+            segment.advance_simulation_step(time_step_seconds, new_ai_vehicle_probability=0.0)
+            if segment.exit_buffer:
+                exits.append((segment_id, [TransitVehicle.from_vehicle(vehicle) for vehicle in segment.exit_buffer]))
+                for vehicle in segment.exit_buffer:
+                    segment.vehicle_store.recycle(vehicle)
+                segment.exit_buffer.clear()
+            boundary_states[segment_id] = segment.boundary_state()
+        self.random_state = random.getstate()
+        return exits, boundary_states
+
+
+def _partition_worker(connection, partition_id, segment_specs, seed):
+    """Worker process loop: one message (time step, arrivals) per tick, None to stop."""
+    free_vehicles = {}
+    partition = NetworkPartition(partition_id, [RoadSegment(*spec, free_vehicles=free_vehicles) for spec in segment_specs], seed)
+    try:
+        while True:
+            message = connection.recv()
+            if message is None:
+                break
+            connection.send(partition.step(*message))
+    finally:
+        connection.close()
+
+
+class RoadNetwork:
+    """
+    Road segments connected at intersections, with shortest-travel-time routing,
+    vehicle hand-off between segments and random trips between source and destination nodes.
+    With use_processes=True (and more than one partition) every partition is stepped by its
+    own worker process; otherwise the partitions are stepped one after another in this process.
+    The coordinator only knows the segments' boundary states, never their vehicles.
+    """
+    def __init__(self, partition_count=1, use_processes=False):
+        self.intersections = {} # node id -> Intersection
+        self.segments = [] # segment id -> RoadSegment
+        self.partition_count = int(partition_count)
+        self.use_processes = bool(use_processes)
+        self.partitions = []
+        self.partition_of_segment = [] # segment id -> partition index
+        self.sources = {} # node id -> spawn probability per tick
+        self.destinations = [] # node ids trips can end at
+        self.routes = {} # vehicle_number -> deque of remaining segment ids
+        self.departure_ticks = {} # vehicle_number -> tick the trip started
+        self.free_vehicles = {} # Free lists shared by the segment vehicle stores of in-process partitions
+        # Boundary state by segment id (reported by the partitions, updated here for the vehicles sent to them)
+        self.vehicle_counts = []
+        self.distances_to_end = []
+        self.blocked_entry_lanes = []
+        self.tick = 0
+        self.arrived_count = 0
+        self.total_trip_ticks = 0
+        self.spawns_blocked = 0
+        self._route_trees = {} # source node -> {node: segment id used to reach it}
+        self._waiting_nodes = {} # Intersections with queued vehicles (dict used as ordered set)
+        self._arrivals = [] # Per partition: (segment id, TransitVehicle) to place at the next step
+        self._connections = []
+        self._processes = []
+
+    # --- Building ---
+    def add_intersection(self, node_id, control=UNCONTROLLED, **options):
+        intersection = Intersection(node_id, control, **options)
+        self.intersections[node_id] = intersection
+        return intersection
+
+    def add_segment(self, from_node, to_node, length_meters, lane_count=2, speed_limit_kmh=50):
+        """Adds a one-way segment from_node -> to_node and returns it (before the first step only)."""
+        if self.tick:
+            raise RuntimeError("Segments can only be added before the network is stepped.")
+        segment = RoadSegment(len(self.segments), from_node, to_node, length_meters, lane_count,
+                              speed_limit_kmh, free_vehicles=self.free_vehicles)
+        self.segments.append(segment)
+        self.vehicle_counts.append(0)
+        self.distances_to_end.append(math.inf)
+        self.blocked_entry_lanes.append(())
+        self.intersections[from_node].outgoing.append(segment.segment_id)
+        destination = self.intersections[to_node]
+        destination.incoming.append(segment.segment_id)
+        destination.priority_order.append(segment.segment_id)
+        destination.queues[segment.segment_id] = deque()
+        self._route_trees.clear()
+        self.partitions = []
+        return segment
+
+    def add_source(self, node_id, spawn_probability):
+        """Trips start at node_id with given probability per tick."""
+        self.sources[node_id] = float(spawn_probability)
+
+    def partition(self, partition_count=None):
+        """
+        Splits the segments into partition_count groups of consecutive segments (by start node),
+        so that most hand-offs stay between segments of the same partition. Each partition gets
+        a random generator seeded from the module generator. Before the first step only.
+        """
+        if self.tick:
+            raise RuntimeError("The network can only be partitioned before it is stepped.")
+        if partition_count is not None:
+            self.partition_count = int(partition_count)
+        node_order = {node_id: index for index, node_id in enumerate(self.intersections)}
+        ordered_segments = sorted(self.segments, key=lambda segment: node_order[segment.from_node])
+        count = max(1, min(self.partition_count, len(ordered_segments)))
+        size = -(-len(ordered_segments) // count) if ordered_segments else 0
+        self.partitions = [NetworkPartition(index, ordered_segments[index * size:(index + 1) * size], random.getrandbits(64))
+                           for index in range(count)]
+        self.partition_of_segment = [0] * len(self.segments)
+        for partition in self.partitions:
+            for segment_id in partition.segments:
+                self.partition_of_segment[segment_id] = partition.partition_id
+        self._arrivals = [[] for _ in self.partitions]
+        return self.partitions
+
+    @classmethod
+    def grid(cls, rows, columns, segment_length_m=300, lane_count=2, speed_limit_kmh=50, control=SIGNAL,
+             spawn_probability=0.05, partition_count=1, use_processes=False):
+        """Manhattan grid with two-way streets; trips start and end at the border intersections."""
+        network = cls(partition_count, use_processes)
+        for row in range(rows):
+            for column in range(columns):
+                network.add_intersection(row * columns + column, control, location=(column, row))
+        for row in range(rows):
+            for column in range(columns):
+                node_id = row * columns + column
+                if column + 1 < columns:
+                    network.add_segment(node_id, node_id + 1, segment_length_m, lane_count, speed_limit_kmh)
+                    network.add_segment(node_id + 1, node_id, segment_length_m, lane_count, speed_limit_kmh)
+                if row + 1 < rows:
+                    network.add_segment(node_id, node_id + columns, segment_length_m, lane_count, speed_limit_kmh)
+                    network.add_segment(node_id + columns, node_id, segment_length_m, lane_count, speed_limit_kmh)
+        for node_id, intersection in network.intersections.items():
+            column, row = intersection.location
+            if row in (0, rows - 1) or column in (0, columns - 1):
+                network.add_source(node_id, spawn_probability)
+                network.destinations.append(node_id)
+        return network
+
+    # --- Routing ---
+    def _shortest_path_tree(self, source):
+        """Dijkstra on segment travel times; cached per source node."""
+        tree = self._route_trees.get(source)
+        if tree is not None:
+            return tree
+        tree = {}
+        best_cost = {source: 0.0}
+        heap = [(0.0, source)]
+        segments = self.segments
+        intersections = self.intersections
+        while heap:
+            cost, node_id = heapq.heappop(heap)
+            if cost > best_cost[node_id]:
+                continue
+            for segment_id in intersections[node_id].outgoing:
+                segment = segments[segment_id]
+                next_cost = cost + segment.travel_time_s
+                if next_cost < best_cost.get(segment.to_node, float("inf")):
+                    best_cost[segment.to_node] = next_cost
+                    tree[segment.to_node] = segment_id
+                    heapq.heappush(heap, (next_cost, segment.to_node))
+        self._route_trees[source] = tree
+        return tree
+
+    def route(self, from_node, to_node):
+        """List of segment ids of the fastest route, or None if to_node can't be reached."""
+        if from_node == to_node:
+            return None
+        tree = self._shortest_path_tree(from_node)
+        if to_node not in tree:
+            return None
+        route = []
+        node_id = to_node
+        while node_id != from_node:
+            segment_id = tree[node_id]
+            route.append(segment_id)
+            node_id = self.segments[segment_id].from_node
+        route.reverse()
+        return route
+
+    # --- Workers ---
+    def _start_workers(self):
+        for partition in self.partitions:
+            parent_connection, child_connection = multiprocessing.Pipe()
+            segment_specs = [segment.spec() for segment in partition.segments.values()]
+            process = multiprocessing.Process(
+                target=_partition_worker, name=f"kitt-network-partition-{partition.partition_id}", daemon=True,
+                args=(child_connection, partition.partition_id, segment_specs, partition.seed))
+            process.start()
+            child_connection.close()
+            self._connections.append(parent_connection)
+            self._processes.append(process)
+
+    def close(self):
+        for connection in self._connections:
+            connection.send(None)
+        for process in self._processes:
+            process.join()
+        for connection in self._connections:
+            connection.close()
+        self._connections, self._processes = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    # --- Simulation ---
+    def step(self, time_step_seconds=1.0):
+        """
+        Advances the network by one tick: the partitions step their segments (concurrently in
+        worker processes if enabled), then vehicles are exchanged between segments.
+        """
+        if not self.partitions:
+            self.partition()
+        if self.use_processes and len(self.partitions) > 1 and not self._processes:
+            self._start_workers()
+        arrivals, self._arrivals = self._arrivals, [[] for _ in self.partitions]
+        if self._connections:
+            for connection, partition_arrivals in zip(self._connections, arrivals):
+                connection.send((time_step_seconds, partition_arrivals))
+            replies = [connection.recv() for connection in self._connections]
+        else:
+            caller_random_state = random.getstate()
+            replies = [partition.step(time_step_seconds, partition_arrivals)
+                       for partition, partition_arrivals in zip(self.partitions, arrivals)]
+            random.setstate(caller_random_state)
+
+        for exits, boundary_states in replies:
+            for segment_id, (vehicle_count, distance_to_end, blocked_lanes) in boundary_states.items():
+                self.vehicle_counts[segment_id] = vehicle_count
+                self.distances_to_end[segment_id] = distance_to_end
+                self.blocked_entry_lanes[segment_id] = blocked_lanes
+            for segment_id, vehicles in exits:
+                self._collect_exits(self.segments[segment_id], vehicles)
+        for node_id in list(self._waiting_nodes):
+            self._discharge(self.intersections[node_id])
+        self._spawn_trips()
+        self.tick += 1
+
+    def _send_to_segment(self, segment, vehicle):
+        """Hands a vehicle to the partition owning segment (placed at the next step) and updates the boundary state."""
+        segment_id = segment.segment_id
+        self._arrivals[self.partition_of_segment[segment_id]].append((segment_id, vehicle))
+        self.vehicle_counts[segment_id] += 1
+        self.distances_to_end[segment_id] = min(self.distances_to_end[segment_id], segment.length_meters - vehicle.position)
+        if vehicle.position < ENTRY_GAP_M and vehicle.lane not in self.blocked_entry_lanes[segment_id]:
+            self.blocked_entry_lanes[segment_id] += (vehicle.lane,)
+
+    def _collect_exits(self, segment, vehicles):
+        """Moves vehicles that left a segment to the queue of its end intersection (or ends their trip)."""
+        intersection = self.intersections[segment.to_node]
+        queue = intersection.queues[segment.segment_id]
+        for vehicle in vehicles:
+            if self.routes.get(vehicle.vehicle_number):
+                queue.append(vehicle)
+            else:
+                self._arrive(vehicle)
+        if queue:
+            self._waiting_nodes[intersection.node_id] = True
+
+    def _arrive(self, vehicle):
+        vehicle_number = vehicle.vehicle_number
+        self.routes.pop(vehicle_number, None)
+        self.total_trip_ticks += self.tick - self.departure_ticks.pop(vehicle_number, self.tick)
+        self.arrived_count += 1
+
+    def _may_cross(self, intersection, segment_id):
+        if intersection.control == SIGNAL:
+            return intersection.green_segment(self.tick) == segment_id
+        if intersection.control == PRIORITY:
+            for higher_segment_id in intersection.priority_order:
+                if higher_segment_id == segment_id:
+                    return True
+                if intersection.queues[higher_segment_id] or \
+                   self.distances_to_end[higher_segment_id] < intersection.yield_distance_m:
+                    return False
+        return True
+
+    def _discharge(self, intersection):
+        """Releases queued vehicles onto the next segment of their route where the rules allow it."""
+        segments = self.segments
+        still_waiting = False
+        for segment_id, queue in intersection.queues.items():
+            released = 0
+            while queue and released < intersection.discharge_per_tick and self._may_cross(intersection, segment_id):
+                vehicle = queue[0]
+                route = self.routes[vehicle.vehicle_number]
+                next_segment = segments[route[0]]
+                lane = min(vehicle.lane, next_segment.lane_count)
+                if lane in self.blocked_entry_lanes[next_segment.segment_id]:
+                    break
+                queue.popleft()
+                route.popleft()
+                # Carry the distance driven past the end over to the next segment
+                overshoot_m = vehicle.position - segments[segment_id].length_meters
+                vehicle.position = min(max(0.0, overshoot_m), ENTRY_GAP_M)
+                vehicle.lane = lane
+                if vehicle.speed < START_SPEED_KMH:
+                    vehicle.speed = START_SPEED_KMH
+                self._send_to_segment(next_segment, vehicle)
+                released += 1
+            if queue:
+                still_waiting = True
+                # Waiting vehicles stand at the stop line
+                stop_line_m = segments[segment_id].length_meters
+                for vehicle in queue:
+                    vehicle.position = stop_line_m
+                    vehicle.speed = 0.0
+        if not still_waiting:
+            del self._waiting_nodes[intersection.node_id]
+
+    def _spawn_trips(self):
+        for node_id, spawn_probability in self.sources.items():
+            if random.random() >= spawn_probability:
+                continue
+            route = self.route(node_id, random.choice(self.destinations))
+            if not route:
+                continue
+            first_segment = self.segments[route[0]]
+            lane = random.randint(1, first_segment.lane_count)
+            if lane in self.blocked_entry_lanes[first_segment.segment_id]:
+                self.spawns_blocked += 1
+                continue
+            SelectedClass, brand, model, max_speed = get_catalogue().draw()
+            speed = max(30, min(max_speed, first_segment.speed_limit_kmh - random.randint(0, 20)))
+            vehicle = TransitVehicle(generate_unique_ai_vehicle_id(), SelectedClass.kind_code, brand, model,
+                                     float(max_speed), lane, 0.0, float(speed))
+            self._send_to_segment(first_segment, vehicle)
+            self.routes[vehicle.vehicle_number] = deque(route[1:])
+            self.departure_ticks[vehicle.vehicle_number] = self.tick
+
+    # --- Statistics ---
+    def vehicle_count(self):
+        return sum(self.vehicle_counts)
+
+    def summary(self):
+        return {
+            "tick": self.tick,
+            "segments": len(self.segments),
+            "intersections": len(self.intersections),
+            "vehicles_driving": self.vehicle_count(),
+            "vehicles_waiting": sum(self.intersections[node_id].waiting_count() for node_id in self._waiting_nodes),
+            "arrived": self.arrived_count,
+            "mean_trip_ticks": self.total_trip_ticks / self.arrived_count if self.arrived_count else 0.0,
+            "spawns_blocked": self.spawns_blocked,
+        }
+
+
+def run(args, use_processes):
+    random.seed(args.seed)
+    with RoadNetwork.grid(args.rows, args.columns, args.segment_length, control=args.control,
+                          spawn_probability=args.spawn_probability, partition_count=args.partitions,
+                          use_processes=use_processes) as network:
+        start = time.perf_counter()
+        for _ in range(args.ticks):
+            network.step(args.time_step)
+        return network.summary(), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless city grid traffic simulation")
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--columns", type=int, default=20)
+    parser.add_argument("--segment-length", type=int, default=300, help="Segment length in meters")
+    parser.add_argument("--control", choices=(UNCONTROLLED, SIGNAL, PRIORITY), default=SIGNAL)
+    parser.add_argument("--spawn-probability", type=float, default=0.2, help="Trip start probability per border node and tick")
+    parser.add_argument("--ticks", type=int, default=500)
+    parser.add_argument("--time-step", type=float, default=0.4)
+    parser.add_argument("--partitions", type=int, default=1)
+    parser.add_argument("--processes", action="store_true", help="Step every partition in its own worker process")
+    parser.add_argument("--verify", action="store_true", help="Also run in-process and compare the results")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.seed is None:
+        args.seed = random.randrange(1 << 32)
+    summary, elapsed = run(args, args.processes)
+    for name, value in summary.items():
+        print(f"{name:<20}{value:>12.1f}" if isinstance(value, float) else f"{name:<20}{value:>12}")
+    print(f"{'ms_per_tick':<20}{elapsed * 1e3 / max(1, args.ticks):>12.3f}")
+    if args.verify:
+        reference_summary, reference_elapsed = run(args, False)
+        print(f"in-process: {reference_elapsed * 1e3 / max(1, args.ticks):.3f} ms/tick")
+        print("Results identical." if summary == reference_summary else "RESULTS DIFFER!")
+        if summary != reference_summary:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# scenario.py
+#
+# Scenario files (JSON or TOML) describing the road, KITT's start, initial traffic,
+# a spawn probability that changes over simulated time, the vehicle mix and an
+# optional stream of scheduled arrivals (CSV or NDJSON, read lazily).
+#   python main_simulation.py --scenario scenarios/rush_hour.json
+#
+# Example (JSON):
+# {
+#   "name": "Rush hour",
+#   "road": {"length_m": 5000, "lanes": 3, "speed_limit_kmh": 120, "intersections_m": [1500, 3500]},
+#   "time_step_s": 0.4,
+#   "kitt": {"lane": 2, "position_m": 50, "speed_kmh": 0},
+#   "initial_vehicles": [3, 6],
+#   "spawn": [{"at_s": 0, "probability": 0.05}, {"at_s": 120, "probability": 0.4}],
+#   "vehicle_mix": {"Car": 0.6, "Truck": 0.3, "Motorcycle": 0.1},
+#   "arrivals": "rush_hour_arrivals.csv"
+# }
+# Spawn probabilities are interpolated linearly between the points and constant
+# before the first and after the last. Arrival files list one vehicle per row/line,
+# sorted by time: time_s, lane, position_m, speed_kmh, type and optionally brand,
+# model and max_speed_kmh (drawn from the vehicle configuration if missing).
+
+import csv
+import json
+import os
+import random
+from bisect import bisect_right
+
+try:
+    import tomllib # Python 3.11+
+except ImportError: # Older Python: JSON scenarios only
+    tomllib = None
+
+from road_management import Road, draw_vehicle_model, generate_unique_ai_vehicle_id
+from vehicles import Car, Truck, Motorcycle, KITT
+
+VEHICLE_CLASSES_BY_NAME = {"Car": Car, "Truck": Truck, "Motorcycle": Motorcycle}
+ROAD_VEHICLE_CLASSES = (Car, Truck, Motorcycle) # Order of Road.vehicle_mix weights
+
+
+class ScenarioError(ValueError):
+    """Invalid scenario or arrivals file."""
+
+
+class Scenario:
+    """A parsed scenario file. create_road() builds its road and KITT, start_traffic() its traffic."""
+    def __init__(self, definition, base_directory="."):
+        road = definition.get("road", {})
+        self.name = definition.get("name", "Unnamed scenario")
+        self.length_meters = int(road.get("length_m", 2000))
+        self.lane_count = int(road.get("lanes", 3))
+        self.speed_limit_kmh = int(road.get("speed_limit_kmh", 120))
+        self.intersection_positions = road.get("intersections_m") # None: Road's default positions
+        self.max_ai_vehicles = road.get("max_ai_vehicles")
+        self.time_step_seconds = float(definition.get("time_step_s", 0.4))
+
+        kitt = definition.get("kitt", {})
+        self.kitt_lane = kitt.get("lane") # None: random lane
+        self.kitt_position_m = float(kitt.get("position_m", 50.0))
+        self.kitt_speed_kmh = float(kitt.get("speed_kmh", 0.0))
+
+        initial_vehicles = definition.get("initial_vehicles", [3, 6])
+        if isinstance(initial_vehicles, int):
+            initial_vehicles = [initial_vehicles, initial_vehicles]
+        self.initial_vehicles = (int(initial_vehicles[0]), int(initial_vehicles[1]))
+
+        spawn = definition.get("spawn", 0.1)
+        if isinstance(spawn, (int, float)):
+            spawn = [{"at_s": 0, "probability": spawn}]
+        if not spawn:
+            raise ScenarioError("'spawn' needs at least one point")
+        for point in spawn:
+            if not isinstance(point, dict):
+                raise ScenarioError(f"Invalid spawn point: {point!r}")
+            for key in ("at_s", "probability"):
+                if key not in point:
+                    raise ScenarioError(f"spawn point needs '{key}'")
+        spawn = sorted(spawn, key=lambda point: point["at_s"])
+        self.spawn_times = [float(point["at_s"]) for point in spawn]
+        self.spawn_probabilities = [float(point["probability"]) for point in spawn]
+
+        vehicle_mix = definition.get("vehicle_mix")
+        self.vehicle_mix = None # None: every vehicle type equally likely (Road default)
+        if vehicle_mix is not None:
+            unknown = set(vehicle_mix) - set(VEHICLE_CLASSES_BY_NAME)
+            if unknown:
+                raise ScenarioError(f"Unknown vehicle types in 'vehicle_mix': {', '.join(sorted(unknown))}")
+            self.vehicle_mix = tuple(float(vehicle_mix.get(vehicle_class.__name__, 0)) for vehicle_class in ROAD_VEHICLE_CLASSES)
+
+        arrivals = definition.get("arrivals")
+        self.arrivals_path = os.path.join(base_directory, arrivals) if arrivals else None
+
+    def spawn_probability(self, time_s):
+        """Random spawn probability per step at simulated time time_s."""
+        times, probabilities = self.spawn_times, self.spawn_probabilities
+        index = bisect_right(times, time_s)
+        if index == 0:
+            return probabilities[0]
+        if index == len(times):
+            return probabilities[-1]
+        start_time, end_time = times[index - 1], times[index]
+        fraction = (time_s - start_time) / (end_time - start_time)
+        return probabilities[index - 1] + (probabilities[index] - probabilities[index - 1]) * fraction
+
+    def create_road(self, enable_music=True):
+        """(road, kitt) at the scenario's start, with the initial traffic."""
+        road = Road(self.length_meters, self.lane_count, self.speed_limit_kmh,
+                    max_ai_vehicles=self.max_ai_vehicles, intersection_positions=self.intersection_positions)
+        road.vehicle_mix = self.vehicle_mix
+        kitt_lane = self.kitt_lane if self.kitt_lane is not None else random.randint(1, road.lane_count)
+        kitt = KITT(lane=kitt_lane, position=self.kitt_position_m, enable_music=enable_music)
+        kitt.speed = self.kitt_speed_kmh
+        road.add_kitt_reference(kitt)
+        for _ in range(random.randint(*self.initial_vehicles)):
+            road.add_random_ai_vehicle()
+        return road, kitt
+
+    def start_traffic(self):
+        """New ScenarioTraffic for one run of this scenario."""
+        return ScenarioTraffic(self)
+
+
+class ScenarioTraffic:
+    """
+    Drives a scenario's traffic over a run: before each step it adds the arrivals that are
+    due and returns the current spawn probability. Arrivals are read one row ahead, so
+    files with millions of vehicles need no more memory than a single row. An arrival whose
+    spot is taken (KITT or a vehicle within the spawn gap in its lane) waits until it is free.
+    """
+    def __init__(self, scenario):
+        self.scenario = scenario
+        self.time_s = 0.0
+        self.injected_count = 0
+        self.deferred_count = 0 # Arrivals that had to wait for their spot at least one step
+        self._deferred = [] # Due arrivals whose spot was taken, oldest first
+        self._arrivals = read_arrivals(scenario.arrivals_path) if scenario.arrivals_path else iter(())
+        self._next_arrival = next(self._arrivals, None)
+
+    def before_step(self, road, time_step_seconds):
+        """Adds due arrivals to road and returns this step's spawn probability."""
+        self.time_s += time_step_seconds
+        if self._deferred:
+            self._deferred = [arrival for arrival in self._deferred if not self._inject(road, arrival)]
+        arrival = self._next_arrival
+        while arrival is not None and arrival[0] <= self.time_s:
+            if not self._inject(road, arrival):
+                self._deferred.append(arrival)
+                self.deferred_count += 1
+            arrival = next(self._arrivals, None)
+        self._next_arrival = arrival
+        return self.scenario.spawn_probability(self.time_s)
+
+    @property
+    def finished(self):
+        """True when every scheduled arrival has been added."""
+        return self._next_arrival is None and not self._deferred
+
+    def _inject(self, road, arrival):
+        """Adds an arrival to road. Returns False (nothing added) if its spot is taken."""
+        _, lane, position_m, speed_kmh, vehicle_class, brand, model, max_speed_kmh = arrival
+        lane = min(max(lane, 1), road.lane_count)
+        if not road.spawn_position_free(lane, position_m):
+            return False
+        if brand is None or model is None or max_speed_kmh is None:
+            drawn_brand, drawn_model, drawn_max_speed = draw_vehicle_model(vehicle_class)
+            brand = brand if brand is not None else drawn_brand
+            model = model if model is not None else drawn_model
+            max_speed_kmh = max_speed_kmh if max_speed_kmh is not None else drawn_max_speed
+        vehicle = road.vehicle_store.acquire(vehicle_class, generate_unique_ai_vehicle_id(), brand, model,
+                                             max_speed_kmh, lane, position_m)
+        vehicle.speed = min(speed_kmh, max_speed_kmh)
+        self.injected_count += 1
+        return True
+
+
+# --- Files ---
+def load_scenario(path):
+    """Reads a .json or .toml scenario file."""
+    base_directory = os.path.dirname(os.path.abspath(path))
+    if path.endswith(".toml"):
+        if tomllib is None:
+            raise ScenarioError("TOML scenarios need Python 3.11+ (tomllib); use JSON instead")
+        with open(path, "rb") as scenario_file:
+            return Scenario(tomllib.load(scenario_file), base_directory)
+    with open(path, "r", encoding="utf-8") as scenario_file:
+        return Scenario(json.load(scenario_file), base_directory)
+
+
+def _arrival_tuple(record, source):
+    """(time_s, lane, position_m, speed_kmh, vehicle class, brand, model, max_speed_kmh) from a CSV/NDJSON record."""
+    try:
+        vehicle_class = VEHICLE_CLASSES_BY_NAME[record.get("type") or "Car"]
+        max_speed_kmh = record.get("max_speed_kmh")
+        return (float(record["time_s"]), int(record["lane"]), float(record.get("position_m") or 0.0),
+                float(record["speed_kmh"]), vehicle_class, record.get("brand") or None, record.get("model") or None,
+                int(float(max_speed_kmh)) if max_speed_kmh not in (None, "") else None)
+    except (KeyError, ValueError, TypeError) as e:
+        raise ScenarioError(f"Invalid arrival in {source}: {record} ({e})") from e
+
+
+def read_arrivals(path):
+    """Yields the arrivals of a CSV (with header) or NDJSON file one at a time, checking they are sorted by time."""
+    previous_time_s = float("-inf")
+    with open(path, "r", encoding="utf-8", newline="") as arrivals_file:
+        if path.endswith((".ndjson", ".jsonl")):
+            records = (json.loads(line) for line in arrivals_file if line.strip())
+        else:
+            records = csv.DictReader(arrivals_file)
+        for line_number, record in enumerate(records, 1):
+            arrival = _arrival_tuple(record, f"{path}, record {line_number}")
+            if arrival[0] < previous_time_s:
+                raise ScenarioError(f"Arrivals in {path} must be sorted by time_s (record {line_number})")
+            previous_time_s = arrival[0]
+            yield arrival
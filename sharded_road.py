@@ -0,0 +1,428 @@
+# sharded_road.py
+#
+# Very long roads stepped in parallel: the road is split into longitudinal shards, each
+# owned by a worker process. Vehicle state lives in shared memory arrays.
+#   python sharded_road.py --length-km 100 --shards 4 --ticks 200 --verify
+#
+# Each tick has one barrier (the coordinator waits for every shard's reply):
+#   1. Every shard reads the state of tick t (buffer t % 2) for its own vehicles plus the
+#      halo (vehicles of the next shard within HALO_M of the border) and writes tick t+1
+#      into the other buffer, so no shard ever sees a half-updated neighbour.
+#   2. Shards report vehicles that crossed their end (migration), left the road, and their
+#      new halo; the coordinator spawns new traffic and routes all of it for the next tick.
+# All random decisions come from a counter-based generator keyed by (seed, tick, vehicle),
+# so the result does not depend on how vehicles are split over shards: any shard_count
+# (including 1, stepped in-process) gives identical results for the same seed.
+
+import argparse
+import bisect
+import multiprocessing
+import sys
+import time
+from array import array
+from multiprocessing import shared_memory
+
+from road_management import Road
+from spawn_catalogue import CLASS_SECTIONS, get_catalogue
+from vehicles import Vehicle
+
+HALO_M = 200.0 # Longest distance a vehicle looks ahead (car-following and collisions)
+HEADWAY_S = 2.0 # Followers slow down to their leader's speed when closer than this time gap
+MIN_GAP_M = 8.0
+COLLISION_DISTANCE_M = 4.0
+ENTRY_GAP_M = 10.0 # New vehicles enter a lane only if nobody is closer than this to the road start
+
+# Shared memory columns: name -> (typecode, copies). Position and speed are double buffered.
+COLUMNS = (
+    ("vehicle_number", "q", 1),
+    ("kind_code", "q", 1),
+    ("model_index", "q", 1),
+    ("lane", "q", 1),
+    ("max_speed", "d", 1),
+    ("position", "d", 2),
+    ("speed", "d", 2),
+)
+
+# (class, min max_speed, max max_speed) by kind code, as in the spawn catalogue
+VEHICLE_KINDS = {vehicle_class.kind_code: (vehicle_class, min_speed, max_speed)
+                 for _, vehicle_class, min_speed, max_speed in CLASS_SECTIONS}
+
+_MASK64 = (1 << 64) - 1
+_UNIT_21 = 1.0 / (1 << 21)
+
+
+def counter_hash(seed, tick, key):
+    """64-bit hash of (seed, tick, key) (splitmix64 finaliser); the same inputs always give the same bits."""
+    x = (seed * 0x9E3779B97F4A7C15 + tick * 0xC2B2AE3D27D4EB4F + key * 0x165667B19E3779F9) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+def counter_uniforms(seed, tick, key):
+    """Three independent uniforms in [0, 1) for (seed, tick, key)."""
+    bits = counter_hash(seed, tick, key)
+    return (bits & 0x1FFFFF) * _UNIT_21, ((bits >> 21) & 0x1FFFFF) * _UNIT_21, ((bits >> 42) & 0x1FFFFF) * _UNIT_21
+
+
+class SharedColumns:
+    """Vehicle state arrays (structure of arrays) in one shared memory block."""
+    def __init__(self, capacity, name=None):
+        self.capacity = int(capacity)
+        size = sum(array(typecode).itemsize * copies for _, typecode, copies in COLUMNS) * self.capacity
+        self.owner = name is None
+        self.memory = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        offset = 0
+        for column_name, typecode, copies in COLUMNS:
+            column_bytes = array(typecode).itemsize * self.capacity
+            views = [self.memory.buf[offset + copy * column_bytes:offset + (copy + 1) * column_bytes].cast(typecode)
+                     for copy in range(copies)]
+            offset += column_bytes * copies
+            setattr(self, column_name, views if copies > 1 else views[0])
+
+    def close(self):
+        for column_name, _, copies in COLUMNS:
+            views = getattr(self, column_name)
+            for view in (views if copies > 1 else [views]):
+                view.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+class RoadShard:
+    """Vehicles in [start_m, end_m) of the road and the kernel that steps them."""
+    def __init__(self, shard_index, start_m, end_m, length_meters, speed_limit_kmh, seed):
+        self.shard_index = shard_index
+        self.start_m = float(start_m)
+        self.end_m = float(end_m)
+        self.length_meters = float(length_meters)
+        self.speed_limit_kmh = float(speed_limit_kmh)
+        self.seed = int(seed)
+        self.owned_slots = []
+
+    def step(self, columns, tick, time_step_seconds, adopted_slots, halo_slots):
+        """
+        Steps the owned vehicles from tick to tick + 1.
+        Returns (emigrant slots, departed slots, own halo slots, collisions).
+        """
+        self.owned_slots.extend(adopted_slots)
+        read = tick % 2
+        write = 1 - read
+        read_position, write_position = columns.position[read], columns.position[write]
+        read_speed, write_speed = columns.speed[read], columns.speed[write]
+        numbers, lanes, max_speeds = columns.vehicle_number, columns.lane, columns.max_speed
+
+        # Per-lane (position, vehicle_number, slot) lists of the state at tick, own vehicles plus halo
+        lane_rows = {}
+        for slot in self.owned_slots:
+            lane_rows.setdefault(lanes[slot], []).append((read_position[slot], numbers[slot], slot))
+        for slot in halo_slots:
+            lane_rows.setdefault(lanes[slot], []).append((read_position[slot], numbers[slot], slot))
+        for rows in lane_rows.values():
+            rows.sort()
+
+        seed = self.seed
+        speed_limit = self.speed_limit_kmh
+        distance_factor = 1000.0 / 3600.0 * time_step_seconds
+        kept_slots, emigrant_slots, departed_slots, halo_out = [], [], [], []
+        collisions = 0
+        halo_end_m = self.start_m + HALO_M
+        for slot in self.owned_slots:
+            position = read_position[slot]
+            speed = read_speed[slot]
+            vehicle_number = numbers[slot]
+            new_position = position + speed * distance_factor
+
+            # Same behaviour as Road.advance_simulation_step without KITT
+            u_target, u_choice, u_amount = counter_uniforms(seed, tick, vehicle_number)
+            target_speed = speed_limit - int(u_target * 31)
+            amount = 3 + int(u_amount * 6)
+            if speed < target_speed - 5 and u_choice < 0.1:
+                speed = min(speed + amount, max_speeds[slot])
+            elif speed > target_speed + 5 and u_choice < 0.15:
+                speed = max(speed - amount, 0.0)
+
+            # Car-following: don't close in on the leader inside the safe gap
+            rows = lane_rows[lanes[slot]]
+            leader_index = bisect.bisect_right(rows, (position, sys.maxsize))
+            if leader_index < len(rows):
+                leader_position, _, leader_slot = rows[leader_index]
+                gap = leader_position - position
+                if gap < COLLISION_DISTANCE_M:
+                    collisions += 1
+                safe_gap = min(HALO_M, max(MIN_GAP_M, read_speed[slot] / 3.6 * HEADWAY_S))
+                if gap < safe_gap and speed > read_speed[leader_slot]:
+                    speed = read_speed[leader_slot]
+
+            write_position[slot] = new_position
+            write_speed[slot] = speed
+            if new_position >= self.length_meters:
+                departed_slots.append(slot)
+            elif new_position >= self.end_m:
+                emigrant_slots.append(slot)
+            else:
+                kept_slots.append(slot)
+                if new_position < halo_end_m:
+                    halo_out.append(slot)
+        self.owned_slots = kept_slots
+        return emigrant_slots, departed_slots, halo_out, collisions
+
+
+def _shard_worker(connection, memory_name, capacity, shard_arguments):
+    """Worker process loop: one message per tick, None to stop."""
+    columns = SharedColumns(capacity, name=memory_name)
+    shard = RoadShard(*shard_arguments)
+    try:
+        while True:
+            message = connection.recv()
+            if message is None:
+                break
+            connection.send(shard.step(columns, *message))
+    finally:
+        columns.close()
+        connection.close()
+
+
+class ShardedRoad:
+    """
+    AI traffic on a very long road, split into shard_count shards. With use_processes=True
+    (and more than one shard) every shard is stepped by its own worker process; otherwise
+    the shards are stepped one after another in this process with the same kernel.
+    KITT is not part of a sharded road; use to_road() to render or snapshot the traffic.
+    """
+    def __init__(self, length_meters, lane_count, speed_limit_kmh=120, shard_count=4, seed=0,
+                 capacity=200000, spawn_probability=0.3, use_processes=True):
+        self.length_meters = int(length_meters)
+        self.lane_count = int(lane_count)
+        self.speed_limit_kmh = int(speed_limit_kmh)
+        self.seed = int(seed)
+        self.spawn_probability = float(spawn_probability) # Per lane and tick, at the road start
+        shard_length_m = self.length_meters / max(1, int(shard_count))
+        if shard_count > 1 and shard_length_m < HALO_M:
+            raise ValueError(f"Shards must be at least {HALO_M:.0f} m long (halo only reaches the next shard)")
+        self.shard_starts = [index * shard_length_m for index in range(max(1, int(shard_count)))]
+        self.shards = [RoadShard(index, start, start + shard_length_m, self.length_meters, self.speed_limit_kmh, self.seed)
+                       for index, start in enumerate(self.shard_starts)]
+        self.shards[-1].end_m = float(self.length_meters)
+
+        self.columns = SharedColumns(capacity)
+        self.free_slots = list(range(self.columns.capacity - 1, -1, -1))
+        self.pending_slots = [[] for _ in self.shards] # Slots each shard takes over at the next step
+        self.halo_slots = [[] for _ in self.shards] # Halo each shard sees at the next step
+        self.entry_blocked_until = {} # lane -> tick; vehicles spawned there are still near the start
+        self.next_vehicle_number = 1
+        self.tick = 0
+        self.time_step_seconds = 1.0
+        self.collisions = 0
+        self.departed_count = 0
+        self.spawns_dropped = 0
+
+        self.use_processes = bool(use_processes) and len(self.shards) > 1
+        self._connections = []
+        self._processes = []
+        self._model_choices = {kind: self._configured_models(cls) for kind, (cls, _, _) in VEHICLE_KINDS.items()}
+
+    @staticmethod
+    def _configured_models(vehicle_class):
+        return get_catalogue().model_indexes(vehicle_class)
+
+    # --- Workers ---
+    def _start_workers(self):
+        for shard in self.shards:
+            parent_connection, child_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_shard_worker, name=f"kitt-road-shard-{shard.shard_index}", daemon=True,
+                args=(child_connection, self.columns.memory.name, self.columns.capacity,
+                      (shard.shard_index, shard.start_m, shard.end_m, shard.length_meters, shard.speed_limit_kmh, shard.seed)))
+            process.start()
+            child_connection.close()
+            self._connections.append(parent_connection)
+            self._processes.append(process)
+
+    def close(self):
+        for connection in self._connections:
+            connection.send(None)
+        for process in self._processes:
+            process.join()
+        for connection in self._connections:
+            connection.close()
+        self._connections, self._processes = [], []
+        if self.columns is not None:
+            self.columns.close()
+            self.columns = None
+
+    def __del__(self):
+        if getattr(self, "columns", None) is not None:
+            self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    # --- Traffic ---
+    def _shard_of(self, position):
+        return bisect.bisect_right(self.shard_starts, position) - 1
+
+    def add_vehicle(self, kind_code, lane, position, speed, max_speed, model_index):
+        """Places a vehicle in the state of the current tick. Returns its vehicle_number, or None when full."""
+        if not self.free_slots:
+            self.spawns_dropped += 1
+            return None
+        slot = self.free_slots.pop()
+        columns = self.columns
+        buffer = self.tick % 2
+        vehicle_number = self.next_vehicle_number
+        self.next_vehicle_number += 1
+        columns.vehicle_number[slot] = vehicle_number
+        columns.kind_code[slot] = kind_code
+        columns.model_index[slot] = model_index
+        columns.lane[slot] = lane
+        columns.max_speed[slot] = max_speed
+        columns.position[buffer][slot] = position
+        columns.speed[buffer][slot] = speed
+        self.pending_slots[self._shard_of(position)].append(slot)
+        return vehicle_number
+
+    def _random_vehicle(self, bits):
+        """(kind_code, max_speed, model_index) chosen from 64 random bits."""
+        kind_codes = list(VEHICLE_KINDS)
+        kind_code = kind_codes[bits % len(kind_codes)]
+        _, min_speed, max_speed = VEHICLE_KINDS[kind_code]
+        models = self._model_choices[kind_code]
+        return kind_code, float(min_speed + (bits >> 8) % (max_speed - min_speed + 1)), models[(bits >> 16) % len(models)]
+
+    def populate(self, vehicles_per_km_per_lane):
+        """Spreads initial traffic evenly (with random jitter) over the whole road."""
+        spacing_m = 1000.0 / vehicles_per_km_per_lane
+        key = 0
+        for lane in range(1, self.lane_count + 1):
+            position = spacing_m / 2
+            while position < self.length_meters - spacing_m / 2:
+                key += 1
+                bits = counter_hash(self.seed, -1, key)
+                kind_code, max_speed, model_index = self._random_vehicle(bits)
+                jitter_m = ((bits >> 40) & 0xFFFF) / 0x10000 * spacing_m * 0.3
+                speed = max(30.0, min(max_speed, self.speed_limit_kmh - (bits >> 56) % 21))
+                self.add_vehicle(kind_code, lane, position + jitter_m, speed, max_speed, model_index)
+                position += spacing_m
+
+    def _spawn_vehicles(self):
+        """New traffic at the road start (decided by the coordinator, so it is the same for any shard count)."""
+        for lane in range(1, self.lane_count + 1):
+            if self.entry_blocked_until.get(lane, -1) >= self.tick:
+                continue
+            bits = counter_hash(self.seed, self.tick, -lane)
+            if (bits & 0xFFFFFF) / 0x1000000 >= self.spawn_probability:
+                continue
+            kind_code, max_speed, model_index = self._random_vehicle(bits >> 24)
+            speed = max(30.0, min(max_speed, self.speed_limit_kmh - (bits >> 58) % 21))
+            self.add_vehicle(kind_code, lane, 0.0, speed, max_speed, model_index)
+            # A vehicle needs ENTRY_GAP_M / speed seconds to clear the entry; block the lane until then
+            self.entry_blocked_until[lane] = self.tick + int(ENTRY_GAP_M / (speed / 3.6) / self.time_step_seconds)
+
+    def step(self, time_step_seconds=1.0):
+        """Advances all shards by one tick (the coordinator waits for all of them)."""
+        self.time_step_seconds = float(time_step_seconds)
+        if self.use_processes and not self._processes:
+            self._start_workers()
+        # Vehicles a shard takes over (migrated, spawned or added) belong to the halo of the shard behind it, too
+        positions = self.columns.position[self.tick % 2]
+        for index in range(1, len(self.shards)):
+            halo_end_m = self.shard_starts[index] + HALO_M
+            self.halo_slots[index - 1].extend(slot for slot in self.pending_slots[index] if positions[slot] < halo_end_m)
+        messages = [(self.tick, self.time_step_seconds, self.pending_slots[index], self.halo_slots[index])
+                    for index in range(len(self.shards))]
+        if self.use_processes:
+            for connection, message in zip(self._connections, messages):
+                connection.send(message)
+            replies = [connection.recv() for connection in self._connections]
+        else:
+            replies = [shard.step(self.columns, *message) for shard, message in zip(self.shards, messages)]
+
+        self.tick += 1
+        self.pending_slots = [[] for _ in self.shards]
+        self.halo_slots = [[] for _ in self.shards]
+        new_positions = self.columns.position[self.tick % 2]
+        for index, (emigrant_slots, departed_slots, halo_out, collisions) in enumerate(replies):
+            self.collisions += collisions
+            self.departed_count += len(departed_slots)
+            self.free_slots.extend(departed_slots)
+            for slot in emigrant_slots:
+                self.pending_slots[self._shard_of(new_positions[slot])].append(slot)
+            if index > 0:
+                self.halo_slots[index - 1].extend(halo_out)
+        self._spawn_vehicles()
+
+    # --- Inspection ---
+    def vehicle_states(self):
+        """Sorted (vehicle_number, lane, position, speed) of all vehicles at the current tick."""
+        used = set(range(self.columns.capacity)) - set(self.free_slots)
+        buffer = self.tick % 2
+        columns = self.columns
+        return sorted((columns.vehicle_number[slot], columns.lane[slot], columns.position[buffer][slot], columns.speed[buffer][slot])
+                      for slot in used)
+
+    def vehicle_count(self):
+        return self.columns.capacity - len(self.free_slots)
+
+    def to_road(self, first_meter=0, last_meter=None):
+        """Road with the vehicles in [first_meter, last_meter) as vehicle objects (for rendering/snapshots)."""
+        last_meter = self.length_meters if last_meter is None else last_meter
+        road = Road(self.length_meters, self.lane_count, self.speed_limit_kmh, max_ai_vehicles=0, intersection_positions=[])
+        columns = self.columns
+        buffer = self.tick % 2
+        for slot in sorted(set(range(columns.capacity)) - set(self.free_slots)):
+            position = columns.position[buffer][slot]
+            if not first_meter <= position < last_meter:
+                continue
+            vehicle_class = VEHICLE_KINDS.get(columns.kind_code[slot], (Vehicle,))[0]
+            vehicle = vehicle_class.__new__(vehicle_class)
+            vehicle.vehicle_number = columns.vehicle_number[slot]
+            vehicle.model_index = columns.model_index[slot]
+            vehicle.max_speed = columns.max_speed[slot]
+            vehicle.speed = columns.speed[buffer][slot]
+            vehicle.lane = columns.lane[slot]
+            vehicle.position = position
+            road.add_ai_vehicle(vehicle)
+        return road
+
+
+def run(length_meters, lane_count, shard_count, ticks, seed, density, use_processes, time_step_seconds=0.4):
+    with ShardedRoad(length_meters, lane_count, shard_count=shard_count, seed=seed, use_processes=use_processes) as road:
+        road.populate(density)
+        start = time.perf_counter()
+        for _ in range(ticks):
+            road.step(time_step_seconds)
+        elapsed = time.perf_counter() - start
+        return road.vehicle_states(), road.collisions, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded multi-process stepping of a very long road")
+    parser.add_argument("--length-km", type=float, default=100.0)
+    parser.add_argument("--lanes", type=int, default=3)
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--density", type=float, default=15.0, help="Initial vehicles per km and lane")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verify", action="store_true", help="Also run single-process and compare the results")
+    args = parser.parse_args()
+
+    length_meters = int(args.length_km * 1000)
+    states, collisions, elapsed = run(length_meters, args.lanes, args.shards, args.ticks, args.seed, args.density, True)
+    print(f"{args.shards} shards: {len(states)} vehicles, {collisions} collisions, {elapsed * 1e3 / args.ticks:.2f} ms/tick")
+    if args.verify:
+        reference_states, reference_collisions, reference_elapsed = run(length_meters, args.lanes, 1, args.ticks, args.seed, args.density, False)
+        print(f"1 shard : {len(reference_states)} vehicles, {reference_collisions} collisions, {reference_elapsed * 1e3 / args.ticks:.2f} ms/tick")
+        identical = states == reference_states and collisions == reference_collisions
+        print("Results identical." if identical else "RESULTS DIFFER!")
+        if not identical:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# snapshot.py
+
+import pickle
+import random
+import zlib
+from collections import deque
+from operator import attrgetter
+
+import road_management
+from road_management import Road
+from vehicles import Vehicle, Car, Truck, Motorcycle, KITT, intern_vehicle_model
+
+# Plain attributes saved for every vehicle and restored in the same order.
+# Brand and model are saved by name, since model table indexes are only valid in one process.
+VEHICLE_FIELDS = ("vehicle_number", "max_speed", "speed", "lane", "position")
+# Additional KITT state (turbo/shield/autopilot timers, score, ...). The music player is not saved.
+KITT_FIELDS = VEHICLE_FIELDS + (
+    "score", "damage",
+    "shield_active", "shield_power",
+    "normal_max_speed", "turbo_active", "turbo_remaining_steps", "turbo_cooldown_steps",
+    "turbo_speed_increase", "turbo_duration_steps", "turbo_cooldown_duration",
+    "autopilot_active", "autopilot_target_speed", "autopilot_target_lane",
+    "drift_mode_active_temporary", "chatbot_message", "radar_max_range_m",
+)
+ROAD_FIELDS = ("max_ai_vehicles", "display_scale", "viewport_width_characters", "clear_screen", "active_intersection_message",
+               "vehicle_mix", "max_substeps")
+
+VEHICLE_CLASSES_BY_KIND = {cls.kind_code: cls for cls in (Vehicle, Car, Truck, Motorcycle)}
+
+_get_model_names = attrgetter("brand", "model")
+_get_vehicle_state = attrgetter(*VEHICLE_FIELDS)
+_get_kitt_state = attrgetter(*KITT_FIELDS)
+_get_road_state = attrgetter(*ROAD_FIELDS)
+
+
+def _build_vehicle(cls, field_names, row):
+    """
+    Creates a vehicle from (brand, model, *field values) without calling __init__
+    (no random draws, no music player start).
+    """
+    vehicle = cls.__new__(cls)
+    vehicle.model_index = intern_vehicle_model(row[0], row[1])
+    for name, value in zip(field_names, row[2:]):
+        setattr(vehicle, name, value)
+    return vehicle
+
+
+class SimulationSnapshot:
+    """
+    Frozen state of a Road, its AI vehicles, KITT and the random generator.
+    The state is held as immutable tuples that every restored branch shares; a branch
+    only allocates its own mutable Road/vehicle/KITT objects when it is restored.
+    """
+    def __init__(self, road_geometry, road_state, intersection_drift_done, vehicle_rows,
+                 kitt_state, random_state, vehicle_id_counter):
+        self.road_geometry = road_geometry # (length_meters, lane_count, speed_limit_kmh, intersection_positions)
+        self.road_state = road_state
+        self.intersection_drift_done = intersection_drift_done # tuple of (position, done) pairs
+        self.vehicle_rows = vehicle_rows # tuple of (kind_code, brand, model, *VEHICLE_FIELDS)
+        self.kitt_state = kitt_state # tuple of (brand, model, *KITT_FIELDS), or None
+        self.random_state = random_state
+        self.vehicle_id_counter = vehicle_id_counter
+
+    def restore(self, music_player=None, seed=None):
+        """
+        Builds a new, independent (road, kitt) pair from this snapshot.
+        The module-level random generator is reset to the saved state, or reseeded
+        with seed to explore a different continuation from the same point. New vehicles
+        get numbers above every number handed out so far, in this or any other road.
+        """
+        length_meters, lane_count, speed_limit_kmh, intersection_positions = self.road_geometry
+        road = Road(length_meters, lane_count, speed_limit_kmh, intersection_positions=intersection_positions)
+        road.intersection_drift_done = dict(self.intersection_drift_done)
+        for name, value in zip(ROAD_FIELDS, self.road_state):
+            setattr(road, name, value)
+
+        classes = VEHICLE_CLASSES_BY_KIND
+        for row in self.vehicle_rows:
+            road.add_ai_vehicle(_build_vehicle(classes.get(row[0], Vehicle), VEHICLE_FIELDS, row[1:]))
+
+        kitt = None
+        if self.kitt_state is not None:
+            kitt = _build_vehicle(KITT, KITT_FIELDS, self.kitt_state)
+            kitt.music_player = music_player
+            road.add_kitt_reference(kitt)
+
+        # Never moved back: roads that keep running (the original of a branch) would reuse vehicle numbers
+        road_management.VEHICLE_ID_COUNTER_ROAD = max(road_management.VEHICLE_ID_COUNTER_ROAD, self.vehicle_id_counter)
+        if seed is None:
+            random.setstate(self.random_state)
+        else:
+            random.seed(seed)
+        return road, kitt
+
+    def branch(self, seed):
+        """Restores a "what if" continuation that diverges from the saved point through its own seed."""
+        return self.restore(seed=seed)
+
+    def to_bytes(self):
+        """Compact serialised form (compressed pickle of the state tuples)."""
+        state = (self.road_geometry, self.road_state, self.intersection_drift_done, self.vehicle_rows,
+                 self.kitt_state, self.random_state, self.vehicle_id_counter)
+        return zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(*pickle.loads(zlib.decompress(data)))
+
+
+def take_snapshot(road, kitt=None):
+    """Captures the full simulation state. kitt defaults to the KITT registered on the road."""
+    if kitt is None:
+        kitt = road.kitt_vehicle
+    road_geometry = (road.length_meters, road.lane_count, road.speed_limit_kmh, tuple(road.intersection_positions))
+    vehicle_rows = tuple((vehicle.kind_code,) + _get_model_names(vehicle) + _get_vehicle_state(vehicle)
+                         for vehicle in road.ai_vehicles)
+    return SimulationSnapshot(
+        road_geometry,
+        _get_road_state(road),
+        tuple(road.intersection_drift_done.items()),
+        vehicle_rows,
+        _get_model_names(kitt) + _get_kitt_state(kitt) if kitt else None,
+        random.getstate(),
+        road_management.VEHICLE_ID_COUNTER_ROAD,
+    )
+
+
+class Checkpointer:
+    """
+    Takes a snapshot every interval_ticks steps and keeps the last max_snapshots of them,
+    so a run can be rewound or forked without replaying from tick 0.
+    """
+    def __init__(self, interval_ticks=50, max_snapshots=20):
+        self.interval_ticks = int(interval_ticks)
+        self.snapshots = deque(maxlen=int(max_snapshots)) # (tick, SimulationSnapshot), oldest first
+
+    def step(self, tick, road, kitt=None):
+        """Call once per simulation step; returns the snapshot if one was taken."""
+        if tick % self.interval_ticks:
+            return None
+        snapshot = take_snapshot(road, kitt)
+        self.snapshots.append((tick, snapshot))
+        return snapshot
+
+    def latest_before(self, tick):
+        """Returns (tick, snapshot) of the newest checkpoint at or before tick, or None."""
+        for checkpoint_tick, snapshot in reversed(self.snapshots):
+            if checkpoint_tick <= tick:
+                return checkpoint_tick, snapshot
+        return None
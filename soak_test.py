@@ -0,0 +1,197 @@
+# soak_test.py
+#
+# Soak test: runs the headless simulation for a very long time (KITT on autopilot, the
+# run restarting at the start of the same road whenever it ends) and samples memory at
+# intervals: tracemalloc's traced memory, the process RSS and the number of GC-tracked
+# objects. At the end it reports the allocation sites and object types that grew the
+# most after the warm-up, and fails (exit code 1) when memory keeps growing with the
+# tick count: the least-squares slope of traced memory (RSS with --no-tracemalloc) over
+# the samples after the warm-up must stay below --max-bytes-per-tick.
+#   python soak_test.py --ticks 1000000
+#   python soak_test.py --ticks 200000 --sample-every 5000 --no-tracemalloc
+
+import argparse
+import contextlib
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+from events import EventBus, EventCounter
+from instrumentation import PhaseProfiler
+from main_simulation import run_simulation_step
+from road_management import Road
+from traffic_detectors import attach_traffic_detectors
+from vehicles import KITT
+
+DEFAULT_TICKS = 1_000_000
+SAMPLE_EVERY_TICKS = 10_000
+WARMUP_SHARE = 0.2 # Samples in the first 20% of the run are not used for the trend
+MAX_BYTES_PER_TICK = 1.0 # Allowed memory trend: 1 MB per million ticks
+TOP_COUNT = 10
+
+
+def rss_bytes():
+    """Resident set size of this process (peak RSS where the current one is not available)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError: # Windows
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def object_counts():
+    """GC-tracked objects by type name."""
+    return Counter(type(tracked_object).__name__ for tracked_object in gc.get_objects())
+
+
+def trend_per_tick(samples, value_index):
+    """Least-squares slope of samples[i][value_index] over samples[i][0] (the tick)."""
+    if len(samples) < 2:
+        return 0.0
+    ticks = [sample[0] for sample in samples]
+    values = [sample[value_index] for sample in samples]
+    mean_tick = sum(ticks) / len(ticks)
+    mean_value = sum(values) / len(values)
+    variance = sum((tick - mean_tick) ** 2 for tick in ticks)
+    covariance = sum((tick - mean_tick) * (value - mean_value) for tick, value in zip(ticks, values))
+    return covariance / variance if variance else 0.0
+
+
+class SoakRun:
+    """One long headless session: a road with detectors, metrics and KITT on autopilot."""
+    def __init__(self, seed=0, road_length_m=5000, lane_count=3, max_ai_vehicles=None,
+                 spawn_probability=0.3, time_step_seconds=0.4):
+        random.seed(seed)
+        self.time_step_seconds = time_step_seconds
+        self.spawn_probability = spawn_probability
+        self.road = Road(road_length_m, lane_count, 120, max_ai_vehicles=max_ai_vehicles)
+        self.road.clear_screen = False
+        self.road.events = EventBus() # Metrics only: nothing is printed
+        self.event_counter = EventCounter(self.road.events)
+        self.profiler = PhaseProfiler()
+        self.detectors = attach_traffic_detectors(self.road, self.profiler)
+        self.kitt = KITT(lane=2, position=50.0, enable_music=False)
+        self.road.add_kitt_reference(self.kitt)
+        self.tick = 0
+        self.restarts = 0
+        with open(os.devnull, "w") as null_stream, contextlib.redirect_stdout(null_stream):
+            self.kitt.toggle_autopilot()
+
+    def _restart_kitt(self):
+        """Puts KITT back at the start of the road, as a new run in the same session."""
+        kitt = self.kitt
+        kitt.position = 50.0
+        kitt.speed = 0.0
+        kitt.damage = 0
+        kitt.shield_active = True
+        kitt.shield_power = 100
+        self.restarts += 1
+
+    def run(self, ticks):
+        road, kitt, profiler = self.road, self.kitt, self.profiler
+        with open(os.devnull, "w") as null_stream, contextlib.redirect_stdout(null_stream):
+            for _ in range(ticks):
+                if kitt.autopilot_active:
+                    with profiler.phase("run_autopilot_logic"):
+                        kitt.run_autopilot_logic(road)
+                if not run_simulation_step(road, kitt, profiler, self.time_step_seconds, self.spawn_probability):
+                    self._restart_kitt()
+                at_intersection, intersection_pos = road.check_intersection_for_kitt()
+                if at_intersection and not road.intersection_drift_done.get(intersection_pos):
+                    road.intersection_drift_done[intersection_pos] = True # As after a drift
+                road.calculate_crash_risk()
+                self.tick += 1
+
+
+def soak(ticks=DEFAULT_TICKS, sample_every=SAMPLE_EVERY_TICKS, use_tracemalloc=True,
+         max_bytes_per_tick=MAX_BYTES_PER_TICK, warmup_share=WARMUP_SHARE, **run_options):
+    """Runs the soak test and prints its report. Returns True if memory did not trend upward."""
+    if use_tracemalloc:
+        tracemalloc.start()
+    soak_run = SoakRun(**run_options)
+    warmup_ticks = int(ticks * warmup_share)
+    samples = [] # (tick, traced bytes, RSS bytes, GC-tracked objects)
+    baseline_snapshot = baseline_objects = None
+    start_time = time.perf_counter()
+    print(f"{'tick':>10}{'traced MB':>11}{'RSS MB':>9}{'objects':>10}{'vehicles':>10}{'ticks/s':>9}")
+    while soak_run.tick < ticks:
+        chunk_start = time.perf_counter()
+        chunk = min(sample_every, ticks - soak_run.tick)
+        soak_run.run(chunk)
+        ticks_per_second = chunk / (time.perf_counter() - chunk_start)
+        gc.collect()
+        traced = tracemalloc.get_traced_memory()[0] if use_tracemalloc else 0
+        tracked_objects = len(gc.get_objects())
+        sample = (soak_run.tick, traced, rss_bytes(), tracked_objects)
+        print(f"{sample[0]:>10}{traced / 2**20:>11.2f}{sample[2] / 2**20:>9.1f}{tracked_objects:>10}"
+              f"{len(soak_run.road.ai_vehicles):>10}{ticks_per_second:>9.0f}")
+        if soak_run.tick >= warmup_ticks:
+            if baseline_objects is None: # First sample after the warm-up: growth is measured from here
+                baseline_objects = object_counts()
+                baseline_snapshot = tracemalloc.take_snapshot() if use_tracemalloc else None
+            samples.append(sample)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"\n{soak_run.tick} ticks in {elapsed:.0f} s ({soak_run.tick / elapsed:.0f} ticks/s), "
+          f"{soak_run.restarts} runs restarted, events: {dict(soak_run.event_counter.counts)}")
+    own_files = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    final_snapshot = tracemalloc.take_snapshot().filter_traces(own_files) if baseline_snapshot is not None else None
+    if baseline_objects is not None:
+        object_growth = object_counts()
+        object_growth.subtract(baseline_objects)
+        print(f"\n--- TOP GROWING OBJECT TYPES (since tick {samples[0][0]}) ---")
+        for type_name, count in [(type_name, count) for type_name, count in object_growth.most_common(TOP_COUNT) if count > 0]:
+            print(f"  {count:>+10} {type_name}")
+    if baseline_snapshot is not None:
+        print(f"\n--- TOP GROWING ALLOCATION SITES (since tick {samples[0][0]}) ---")
+        growth = final_snapshot.compare_to(baseline_snapshot.filter_traces(own_files), "lineno")
+        for statistic in [statistic for statistic in growth if statistic.size_diff > 0][:TOP_COUNT]:
+            frame = statistic.traceback[0]
+            print(f"  {statistic.size_diff / 1024:>+10.1f} KiB {statistic.count_diff:>+8} blocks  {frame.filename}:{frame.lineno}")
+    if use_tracemalloc:
+        tracemalloc.stop()
+
+    value_index, metric = (1, "traced memory") if use_tracemalloc else (2, "RSS")
+    slope = trend_per_tick(samples, value_index)
+    rss_slope = trend_per_tick(samples, 2)
+    object_slope = trend_per_tick(samples, 3)
+    print(f"\nTrend after warm-up: {metric} {slope:+.3f} B/tick (RSS {rss_slope:+.3f} B/tick, "
+          f"{object_slope * 1e6:+.0f} objects per million ticks) over {len(samples)} samples")
+    if len(samples) < 3:
+        print("SOAK INCONCLUSIVE: too few samples after the warm-up (lower --sample-every)")
+        return True
+    passed = slope <= max_bytes_per_tick
+    print(f"SOAK {'PASSED' if passed else 'FAILED'}: {metric} trend {slope:+.3f} B/tick "
+          f"(limit {max_bytes_per_tick:g} B/tick)")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long headless run that fails if memory keeps growing.")
+    parser.add_argument("--ticks", type=int, default=DEFAULT_TICKS, help="Simulation steps to run")
+    parser.add_argument("--sample-every", type=int, default=SAMPLE_EVERY_TICKS, help="Steps between memory samples")
+    parser.add_argument("--warmup", type=float, default=WARMUP_SHARE, help="Share of the run ignored for the trend")
+    parser.add_argument("--max-bytes-per-tick", type=float, default=MAX_BYTES_PER_TICK, help="Largest allowed memory trend")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Faster: judge the trend on RSS, no allocation sites")
+    parser.add_argument("--road-length", type=int, default=5000, help="Road length in meters")
+    parser.add_argument("--spawn-probability", type=float, default=0.3, help="New AI vehicle probability per step")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    passed = soak(args.ticks, args.sample_every, not args.no_tracemalloc, args.max_bytes_per_tick, args.warmup,
+                  seed=args.seed, road_length_m=args.road_length, spawn_probability=args.spawn_probability)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# spatial_index.py
+
+from bisect import bisect_left, bisect_right
+from operator import attrgetter
+
+_get_position = attrgetter("position")
+_get_lane = attrgetter("lane")
+_get_lane_and_position = attrgetter("lane", "position")
+
+
+class LaneIndex:
+    """
+    AI vehicles of a VehicleStore ordered by position in each lane, for viewport range
+    queries and leader/follower lookups in O(log n). The index is rebuilt lazily, only
+    when queried after the store changed: after a plain step each lane's previous order
+    is re-sorted (it is almost sorted already), which is a few C-level passes.
+    """
+    def __init__(self, vehicle_store):
+        self.vehicle_store = vehicle_store
+        self.lane_vehicles = {} # lane -> vehicles sorted by position
+        self.lane_positions = {} # lane -> their positions (for bisect)
+        self._version = None
+        self._membership_version = None
+
+    def refresh(self):
+        """Brings the index up to date with the store (no-op if nothing changed)."""
+        store = self.vehicle_store
+        if store.version == self._version:
+            return self
+        if store.membership_version != self._membership_version:
+            ordered_vehicles = sorted(store.vehicles, key=_get_lane_and_position)
+            lanes = list(map(_get_lane, ordered_vehicles))
+            self.lane_vehicles = {}
+            start = 0
+            while start < len(lanes):
+                end = bisect_right(lanes, lanes[start], start)
+                self.lane_vehicles[lanes[start]] = ordered_vehicles[start:end]
+                start = end
+            self._membership_version = store.membership_version
+        else:
+            for vehicles in self.lane_vehicles.values():
+                vehicles.sort(key=_get_position)
+        self.lane_positions = {lane: list(map(_get_position, vehicles)) for lane, vehicles in self.lane_vehicles.items()}
+        self._version = store.version
+        return self
+
+    def in_range(self, start_m, end_m, lane=None):
+        """Vehicles with start_m <= position < end_m (in one lane, or all lanes by lane number)."""
+        self.refresh()
+        lanes = [lane] if lane is not None else sorted(self.lane_vehicles)
+        vehicles = []
+        for lane in lanes:
+            positions = self.lane_positions.get(lane)
+            if positions:
+                first = bisect_left(positions, start_m)
+                vehicles.extend(self.lane_vehicles[lane][first:bisect_left(positions, end_m, first)])
+        return vehicles
+
+    def leader(self, lane, position):
+        """Nearest vehicle ahead of position (strictly greater) in lane, or None."""
+        self.refresh()
+        positions = self.lane_positions.get(lane)
+        if not positions:
+            return None
+        index = bisect_right(positions, position)
+        return self.lane_vehicles[lane][index] if index < len(positions) else None
+
+    def follower(self, lane, position):
+        """Nearest vehicle behind position (strictly smaller) in lane, or None."""
+        self.refresh()
+        positions = self.lane_positions.get(lane)
+        if not positions:
+            return None
+        index = bisect_left(positions, position)
+        return self.lane_vehicles[lane][index - 1] if index > 0 else None
+
+    def lane_counts_in_bins(self, start_m, end_m, bin_count):
+        """
+        {lane: number of vehicles in each of bin_count equal bins of [start_m, end_m)} for the lanes
+        with vehicles: one binary search per bin edge, so the cost depends on the bins, not the traffic.
+        """
+        self.refresh()
+        bin_width_m = (end_m - start_m) / bin_count
+        edges = [start_m + bin_width_m * index for index in range(1, bin_count)] + [end_m]
+        lane_counts = {}
+        for lane, positions in self.lane_positions.items():
+            previous = bisect_left(positions, start_m)
+            counts = lane_counts[lane] = [0] * bin_count
+            for index, edge in enumerate(edges):
+                current = bisect_left(positions, edge, previous)
+                counts[index] = current - previous
+                previous = current
+        return lane_counts
+
+    def counts_in_bins(self, start_m, end_m, bin_count):
+        """Number of vehicles (all lanes) in each of bin_count equal bins of [start_m, end_m)."""
+        lane_counts = self.lane_counts_in_bins(start_m, end_m, bin_count).values()
+        return [sum(counts) for counts in zip(*lane_counts)] if lane_counts else [0] * bin_count
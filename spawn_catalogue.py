@@ -0,0 +1,158 @@
+# spawn_catalogue.py
+
+import json
+import os
+import pickle
+import random
+from itertools import accumulate
+
+from vehicles import Car, Truck, Motorcycle, intern_vehicle_model
+
+CONFIG_FILE = "vehicle_config.cfg"
+CACHE_SUFFIX = ".catalogue.pickle" # Sidecar next to the config file
+CATALOGUE_FORMAT_VERSION = 1
+
+# (config section, class, min max_speed, max max_speed); Road.vehicle_mix weights use this class order
+CLASS_SECTIONS = (
+    ("CAR_MODELS_AI", Car, 90, 150),
+    ("TRUCK_MODELS_AI", Truck, 70, 100),
+    ("MOTORCYCLE_MODELS_AI", Motorcycle, 110, 170),
+)
+SPAWN_CLASSES = tuple(vehicle_class for _, vehicle_class, _, _ in CLASS_SECTIONS)
+_CLASS_POSITION = {vehicle_class: position for position, vehicle_class in enumerate(SPAWN_CLASSES)}
+DEFAULT_MODELS = {"CAR_MODELS_AI": {"Generic": ["Car"]}, "TRUCK_MODELS_AI": {"Generic": ["Truck"]},
+                  "MOTORCYCLE_MODELS_AI": {"Generic": ["Motorcycle"]}}
+
+
+class SpawnCatalogue:
+    """
+    Every spawnable (class, brand, model, max speed range) as flat parallel lists, with
+    the probability of each entry within its class. As before the config became a
+    catalogue, a class's brands are equally likely and so are a brand's models, unless
+    a model has a "weight". Draws pick entries by cumulative weight (binary search), so
+    their cost does not grow with the catalogue. Class weights (Road.vehicle_mix) are
+    folded into cumulative weight lists cached per mix.
+
+    Config models are names or {"model": name, "weight": w, "max_speed_kmh": [low, high]}.
+    """
+    def __init__(self, classes, brands, models, min_speeds, max_speeds, class_weights):
+        self.classes = classes # Position in SPAWN_CLASSES of each entry
+        self.brands = brands
+        self.models = models
+        self.min_speeds = min_speeds
+        self.max_speeds = max_speeds
+        self.class_weights = class_weights # Probability of each entry within its class
+        self._entry_indexes = range(len(classes))
+        self._cumulative_weights = {} # class mix -> cumulative entry weights
+
+    @classmethod
+    def from_config(cls, config_data):
+        classes, brands, models, min_speeds, max_speeds, class_weights = [], [], [], [], [], []
+        for position, (section, _, default_min_speed, default_max_speed) in enumerate(CLASS_SECTIONS):
+            models_by_brand = config_data.get(section) or DEFAULT_MODELS[section]
+            brand_share = 1.0 / len(models_by_brand)
+            for brand, brand_models in models_by_brand.items():
+                entries = [entry if isinstance(entry, dict) else {"model": entry} for entry in brand_models]
+                total_weight = sum(float(entry.get("weight", 1.0)) for entry in entries)
+                for entry in entries:
+                    low, high = entry.get("max_speed_kmh", (default_min_speed, default_max_speed))
+                    classes.append(position)
+                    brands.append(brand)
+                    models.append(entry["model"])
+                    min_speeds.append(int(low))
+                    max_speeds.append(int(high))
+                    class_weights.append(brand_share * float(entry.get("weight", 1.0)) / total_weight)
+        return cls(classes, brands, models, min_speeds, max_speeds, class_weights)
+
+    def __len__(self):
+        return len(self.classes)
+
+    def cumulative_weights(self, mix=None):
+        """Cumulative entry weights for class weights mix (Car, Truck, Motorcycle; None: equal)."""
+        weights = self._cumulative_weights.get(mix)
+        if weights is None:
+            class_shares = mix if mix is not None else (1.0,) * len(SPAWN_CLASSES)
+            weights = list(accumulate(class_shares[position] * weight
+                                      for position, weight in zip(self.classes, self.class_weights)))
+            if not weights or weights[-1] <= 0:
+                raise ValueError(f"Vehicle mix {mix} selects no catalogue entries")
+            self._cumulative_weights[mix] = weights
+        return weights
+
+    def _vehicle(self, index, random_value):
+        min_speed = self.min_speeds[index]
+        max_speed = min_speed + int(random_value * (self.max_speeds[index] - min_speed + 1))
+        return SPAWN_CLASSES[self.classes[index]], self.brands[index], self.models[index], max_speed
+
+    def draw_batch(self, count, mix=None):
+        """count random (vehicle class, brand, model, max_speed) spawns in one call."""
+        indexes = random.choices(self._entry_indexes, cum_weights=self.cumulative_weights(mix), k=count)
+        random_value = random.random
+        return [self._vehicle(index, random_value()) for index in indexes]
+
+    def draw(self, mix=None):
+        return self.draw_batch(1, mix)[0]
+
+    def draw_for_class(self, vehicle_class):
+        """(brand, model, max_speed) of a random model of vehicle_class."""
+        mix = tuple(float(spawn_class is vehicle_class) for spawn_class in SPAWN_CLASSES)
+        return self.draw(mix)[1:]
+
+    def model_indexes(self, vehicle_class):
+        """VEHICLE_MODEL_TABLE indexes of every model of vehicle_class."""
+        position = _CLASS_POSITION[vehicle_class]
+        return [intern_vehicle_model(brand, model)
+                for entry_class, brand, model in zip(self.classes, self.brands, self.models) if entry_class == position]
+
+    def to_state(self):
+        return (CATALOGUE_FORMAT_VERSION, self.classes, self.brands, self.models, self.min_speeds, self.max_speeds, self.class_weights)
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(*state[1:])
+
+
+def load_catalogue(config_path=CONFIG_FILE, use_cache=True):
+    """
+    Builds the catalogue of config_path, reusing the pickled sidecar (config_path + CACHE_SUFFIX)
+    while the config file is unchanged. A missing or invalid config gives the generic models.
+    """
+    try:
+        config_stat = os.stat(config_path)
+    except OSError:
+        print(f"WARNING: Configuration file ({config_path}) not found. Default empty model lists will be used.")
+        return SpawnCatalogue.from_config({})
+    config_stamp = (config_stat.st_mtime_ns, config_stat.st_size)
+    cache_path = config_path + CACHE_SUFFIX
+    if use_cache:
+        try:
+            with open(cache_path, "rb") as cache_file:
+                cached_stamp, state = pickle.load(cache_file)
+            if cached_stamp == config_stamp and state[0] == CATALOGUE_FORMAT_VERSION:
+                return SpawnCatalogue.from_state(state)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError, IndexError):
+            pass # No usable cache: parse the config
+
+    try:
+        with open(config_path, "r", encoding="utf-8") as config_file:
+            catalogue = SpawnCatalogue.from_config(json.load(config_file))
+    except json.JSONDecodeError:
+        print(f"WARNING: Configuration file ({config_path}) is not in valid JSON format. Default empty model lists will be used.")
+        return SpawnCatalogue.from_config({})
+    if use_cache:
+        try:
+            with open(cache_path, "wb") as cache_file:
+                pickle.dump((config_stamp, catalogue.to_state()), cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            pass # Read-only location: parse again next time
+    return catalogue
+
+
+_catalogue = None
+
+def get_catalogue():
+    """The spawn catalogue of CONFIG_FILE, loaded on first use."""
+    global _catalogue
+    if _catalogue is None:
+        _catalogue = load_catalogue()
+    return _catalogue
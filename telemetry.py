@@ -0,0 +1,270 @@
+# telemetry.py
+#
+# Optional live telemetry of a running simulation over HTTP, served by its own threads:
+#   GET /          small page showing the live state
+#   GET /state     latest snapshot as JSON
+#   GET /events    Server-Sent Events stream, one "state" event per new snapshot
+#   GET /health    sequence number and connected stream clients
+# Snapshots hold KITT's status (show_status/show_extra_status and the raw values), the
+# crash risk, the phase timings of the PhaseProfiler and traffic aggregates (vehicle count,
+# traffic risk statistics, traffic detectors). The simulation thread builds and encodes a
+# snapshot at most once per min_interval_s into a back buffer and swaps it with the front
+# buffer the HTTP threads read; it never waits for a client. A slow stream client only
+# gets the latest snapshot when it catches up.
+#   python main_simulation.py --telemetry 8080
+#   python telemetry.py --address 0.0.0.0:8080 --steps 5000 (headless autopilot run to watch)
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from events import EventCounter
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+MIN_INTERVAL_S = 0.25 # At most 4 snapshots per second of wall time
+KEEPALIVE_S = 15.0 # SSE comment sent when no snapshot arrives for this long
+MAX_STREAM_CLIENTS = 32
+CLIENT_TIMEOUT_S = 30.0 # A client that does not read for this long is dropped
+
+INDEX_PAGE = b"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>KITT telemetry</title></head>
+<body style="background:#111;color:#e33;font-family:monospace">
+<h3>KITT telemetry</h3><pre id="state">waiting for the simulation...</pre>
+<script>
+new EventSource("/events").addEventListener("state", function (event) {
+  document.getElementById("state").textContent = JSON.stringify(JSON.parse(event.data), null, 2);
+});
+</script></body></html>
+"""
+
+
+def parse_address(address, default_host=DEFAULT_HOST):
+    """"[HOST:]PORT" -> (host, port)."""
+    host, _, port = str(address).rpartition(":")
+    return host or default_host, int(port)
+
+
+class TelemetryServer:
+    """
+    HTTP/SSE telemetry endpoint. attach() it to a road (Road.attach_telemetry): the road calls
+    publish() after every simulation step, which is rate limited to min_interval_s.
+    """
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, min_interval_s=MIN_INTERVAL_S):
+        self.min_interval_s = float(min_interval_s)
+        self.profiler = None
+        self.event_counter = None
+        self.ticks = 0
+        self.simulated_s = 0.0
+        self.stream_clients = 0
+        self._next_publish_time = 0.0
+        self._front = (0, None) # (sequence, encoded snapshot) read by the HTTP threads
+        self._back = {} # Snapshot being built by the simulation thread
+        self._condition = threading.Condition()
+        self._closed = False
+        self._httpd = ThreadingHTTPServer((host, port), _TelemetryRequestHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.telemetry = self
+        self._thread = None
+
+    @property
+    def address(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="telemetry", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def attach(self, road, profiler=None):
+        """Publishes road's steps (with profiler's phase timings and the road's detectors, if any)."""
+        self.profiler = profiler
+        self.event_counter = EventCounter(road.events)
+        road.attach_telemetry(self)
+        self.publish_now(road)
+
+    # --- Simulation thread ---
+    def publish(self, road, time_step_seconds):
+        """Counts the step and, once min_interval_s passed since the last snapshot, publishes a new one."""
+        self.ticks += 1
+        self.simulated_s += time_step_seconds
+        now = time.monotonic()
+        if now >= self._next_publish_time:
+            self._next_publish_time = now + self.min_interval_s
+            self.publish_now(road)
+
+    def publish_now(self, road):
+        """Builds a snapshot of road in the back buffer and swaps it in for the HTTP threads."""
+        snapshot = self._back
+        snapshot.clear()
+        self._fill_snapshot(snapshot, road)
+        encoded = json.dumps(snapshot, separators=(",", ":")).encode("utf-8")
+        with self._condition: # Held only for the swap: readers copy the reference and let go
+            sequence = self._front[0] + 1
+            self._front = (sequence, encoded)
+            self._condition.notify_all()
+
+    def _fill_snapshot(self, snapshot, road):
+        snapshot["sequence"] = self._front[0] + 1
+        snapshot["time"] = time.time()
+        snapshot["tick"] = self.ticks
+        snapshot["simulated_s"] = round(self.simulated_s, 3)
+        kitt = road.kitt_vehicle
+        if kitt is not None:
+            snapshot["kitt"] = {
+                "status": kitt.show_status() + kitt.show_extra_status(),
+                "lane": kitt.lane,
+                "position_m": round(kitt.position, 2),
+                "speed_kmh": round(kitt.speed, 2),
+                "score": kitt.score,
+                "damage": kitt.damage,
+                "shield_active": kitt.shield_active,
+                "shield_power": kitt.shield_power,
+                "turbo_active": kitt.turbo_active,
+                "turbo_cooldown_steps": kitt.turbo_cooldown_steps,
+                "autopilot_active": kitt.autopilot_active,
+            }
+            risk_level, vehicle_ahead = road.calculate_crash_risk()
+            snapshot["crash_risk"] = {
+                "level": risk_level,
+                "vehicle_ahead": vehicle_ahead.vehicle_id if vehicle_ahead is not None else None,
+                "gap_m": round(vehicle_ahead.position - kitt.position, 2) if vehicle_ahead is not None else None,
+            }
+        traffic = {"ai_vehicles": len(road.ai_vehicles), "risk": road.traffic_risk_statistics()}
+        if road.detectors is not None:
+            traffic["detectors"] = road.detectors.to_dict()
+        snapshot["traffic"] = traffic
+        if self.profiler is not None and self.profiler.enabled:
+            snapshot["phases"] = self.profiler.to_dict()
+        if self.event_counter is not None:
+            snapshot["events"] = dict(self.event_counter.counts)
+
+    # --- HTTP threads ---
+    def latest(self):
+        """(sequence, encoded JSON snapshot); (0, None) before the first publish."""
+        return self._front
+
+    def wait_newer(self, sequence, timeout):
+        """Waits up to timeout for a snapshot newer than sequence; returns latest() (None when closed)."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._closed or self._front[0] > sequence, timeout)
+            return None if self._closed else self._front
+
+
+class _TelemetryRequestHandler(BaseHTTPRequestHandler):
+    timeout = CLIENT_TIMEOUT_S
+    server_version = "KITTTelemetry/1"
+
+    def log_message(self, format, *args):
+        pass # Keep the simulation's terminal clean
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        telemetry = self.server.telemetry
+        path = self.path.split("?", 1)[0]
+        if path == "/":
+            self._send(200, "text/html; charset=utf-8", INDEX_PAGE)
+        elif path == "/state":
+            sequence, encoded = telemetry.latest()
+            if encoded is None:
+                self._send(503, "application/json", b'{"error":"no snapshot yet"}')
+            else:
+                self._send(200, "application/json", encoded)
+        elif path == "/health":
+            body = {"sequence": telemetry.latest()[0], "stream_clients": telemetry.stream_clients}
+            self._send(200, "application/json", json.dumps(body).encode("utf-8"))
+        elif path == "/events":
+            self._stream(telemetry)
+        else:
+            self._send(404, "application/json", b'{"error":"not found"}')
+
+    def _stream(self, telemetry):
+        if telemetry.stream_clients >= MAX_STREAM_CLIENTS:
+            self._send(503, "application/json", b'{"error":"too many stream clients"}')
+            return
+        with telemetry._condition:
+            telemetry.stream_clients += 1
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            sequence = 0
+            while True:
+                latest = telemetry.wait_newer(sequence, KEEPALIVE_S)
+                if latest is None:
+                    return
+                if latest[0] > sequence:
+                    sequence, encoded = latest
+                    self.wfile.write(b"id: %d\nevent: state\ndata: %s\n\n" % (sequence, encoded))
+                else:
+                    self.wfile.write(b": keepalive\n\n")
+                self.wfile.flush()
+        except (OSError, ValueError):
+            pass # Client went away or timed out
+        finally:
+            with telemetry._condition:
+                telemetry.stream_clients -= 1
+
+
+def start_telemetry(address, road, profiler=None, min_interval_s=MIN_INTERVAL_S):
+    """Starts a TelemetryServer on "[HOST:]PORT" publishing road's steps."""
+    host, port = parse_address(address)
+    telemetry = TelemetryServer(host, port, min_interval_s).start()
+    telemetry.attach(road, profiler)
+    return telemetry
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from instrumentation import PhaseProfiler
+    from main_simulation import setup_simulation, run_simulation_step, SIM_TIME_STEP_S
+    from traffic_detectors import attach_traffic_detectors
+
+    parser = argparse.ArgumentParser(description="Headless autopilot run with live telemetry.")
+    parser.add_argument("--address", default=f"{DEFAULT_HOST}:{DEFAULT_PORT}", help="[HOST:]PORT to listen on")
+    parser.add_argument("--steps", type=int, default=3000, help="Simulation steps to run")
+    parser.add_argument("--speed", type=float, default=1.0, help="Steps run this many times faster than real time (0: as fast as possible)")
+    parser.add_argument("--interval", type=float, default=MIN_INTERVAL_S, help="Minimum seconds between snapshots")
+    args = parser.parse_args()
+
+    profiler = PhaseProfiler()
+    main_road, kitt, _ = setup_simulation()
+    main_road.clear_screen = False
+    attach_traffic_detectors(main_road, profiler)
+    telemetry = start_telemetry(args.address, main_road, profiler, args.interval)
+    print(f"Telemetry on {telemetry.address} (state, events, health)")
+    kitt.toggle_autopilot()
+    step_seconds = SIM_TIME_STEP_S / args.speed if args.speed > 0 else 0.0
+    try:
+        for step in range(args.steps):
+            start_time = time.perf_counter()
+            if kitt.autopilot_active:
+                with profiler.phase("run_autopilot_logic"):
+                    kitt.run_autopilot_logic(main_road)
+            if not run_simulation_step(main_road, kitt, profiler):
+                break
+            time.sleep(max(0.0, step_seconds - (time.perf_counter() - start_time)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        telemetry.publish_now(main_road)
+        print(f"Ran {telemetry.ticks} steps. Score: {kitt.score}, Damage: {kitt.damage:.0f}%")
+        telemetry.close()
@@ -0,0 +1,65 @@
+# test_snapshot.py
+#
+#   python -m pytest -q test_snapshot.py
+
+import contextlib
+import io
+import random
+
+from road_management import Road
+from snapshot import take_snapshot
+from vehicles import KITT
+
+
+def _build_road(seed):
+    random.seed(seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        road = Road(20000, 3, 120, max_ai_vehicles=60)
+        kitt = KITT(lane=2, position=50.0, enable_music=False)
+        road.add_kitt_reference(kitt)
+        road.add_random_ai_vehicle(20)
+    return road
+
+
+def _step(road, ticks):
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(ticks):
+            road.advance_simulation_step(time_step_seconds=0.4, new_ai_vehicle_probability=0.5)
+
+
+def _vehicle_numbers(road):
+    return [vehicle.vehicle_number for vehicle in road.ai_vehicles]
+
+
+def test_branch_keeps_vehicle_numbers_of_running_road_unique():
+    road = _build_road(7)
+    _step(road, 5)
+    snapshot = take_snapshot(road)
+    _step(road, 20) # The original runs ahead of the snapshot...
+    branch_road, _ = snapshot.branch(seed=1) # ...and is kept running after the branch
+    _step(road, 40)
+    _step(branch_road, 40)
+
+    for stepped_road in (road, branch_road):
+        numbers = _vehicle_numbers(stepped_road)
+        assert len(numbers) == len(set(numbers))
+        assert len(stepped_road.ai_vehicles) > 25
+
+    # Removals hit the vehicle passed in, and the store stays consistent
+    for vehicle in list(road.ai_vehicles)[:10]:
+        others = [other for other in road.ai_vehicles if other is not vehicle]
+        road.remove_ai_vehicle(vehicle)
+        assert road.vehicle_store.get(vehicle.vehicle_number) is None
+        assert all(road.vehicle_store.get(other.vehicle_number) is other for other in others)
+
+
+def test_restore_reproduces_the_saved_continuation():
+    road = _build_road(11)
+    _step(road, 10)
+    snapshot = take_snapshot(road)
+    first_road, _ = snapshot.restore()
+    _step(first_road, 30)
+    second_road, _ = snapshot.restore()
+    _step(second_road, 30)
+    assert [(vehicle.lane, vehicle.position) for vehicle in first_road.ai_vehicles] == \
+           [(vehicle.lane, vehicle.position) for vehicle in second_road.ai_vehicles]
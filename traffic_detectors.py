@@ -0,0 +1,222 @@
+# traffic_detectors.py
+#
+# Virtual loop detectors and road segment aggregates, updated incrementally by
+# Road.advance_simulation_step (Road.attach_detectors). Per tick, a detector only looks
+# at the AI vehicles that can reach it during the tick, and segment densities come from
+# the lane index (binary search per segment), so the cost does not grow with traffic.
+# Everything is kept over a rolling window of ticks in fixed-size ring buffers.
+
+import math
+
+DETECTOR_SPACING_M = 500 # Default detector positions: every 500 m
+SEGMENT_LENGTH_M = 250
+WINDOW_TICKS = 150 # Rolling window (60 s of 0.4 s steps)
+MAX_AI_SPEED_KMH = 250 # As road_management.MAX_AI_SPEED_KMH: bounds the distance a vehicle covers in a tick
+
+
+class RingBuffer:
+    """The last size values and their running total; push() is O(1)."""
+    __slots__ = ("values", "index", "total", "filled")
+
+    def __init__(self, size):
+        self.values = [0] * size
+        self.index = 0
+        self.total = 0
+        self.filled = 0
+
+    def push(self, value):
+        values = self.values
+        self.total += value - values[self.index]
+        values[self.index] = value
+        self.index = (self.index + 1) % len(values)
+        if self.filled < len(values):
+            self.filled += 1
+
+    def __iter__(self):
+        """Values from oldest to newest."""
+        values = self.values
+        start = self.index if self.filled == len(values) else 0
+        return iter([values[(start + offset) % len(values)] for offset in range(self.filled)])
+
+    def mean(self):
+        return self.total / self.filled if self.filled else 0.0
+
+
+class LaneCounts:
+    """Crossings of one detector lane: per-tick count, speed sum and inverse speed sum windows."""
+    __slots__ = ("total_crossings", "crossings", "speed_sums", "inverse_speed_sums")
+
+    def __init__(self, window_ticks):
+        self.total_crossings = 0
+        self.crossings = RingBuffer(window_ticks)
+        self.speed_sums = RingBuffer(window_ticks)
+        self.inverse_speed_sums = RingBuffer(window_ticks)
+
+
+class LoopDetector:
+    """A virtual induction loop across every lane at position_m."""
+    def __init__(self, position_m, lane_count, window_ticks=WINDOW_TICKS):
+        self.position_m = float(position_m)
+        self.lanes = {lane: LaneCounts(window_ticks) for lane in range(1, lane_count + 1)}
+        self._tick_counts = {} # lane -> [count, speed sum, inverse speed sum] of the current tick
+
+    def record_crossing(self, lane, speed_kmh):
+        counts = self._tick_counts.get(lane)
+        if counts is None:
+            counts = self._tick_counts[lane] = [0, 0.0, 0.0]
+        counts[0] += 1
+        counts[1] += speed_kmh
+        counts[2] += 1.0 / max(speed_kmh, 1.0) # Stopped vehicles count as 1 km/h in the harmonic mean
+
+    def end_tick(self):
+        tick_counts = self._tick_counts
+        for lane, lane_counts in self.lanes.items():
+            count, speed_sum, inverse_speed_sum = tick_counts.get(lane, (0, 0.0, 0.0))
+            lane_counts.total_crossings += count
+            lane_counts.crossings.push(count)
+            lane_counts.speed_sums.push(speed_sum)
+            lane_counts.inverse_speed_sums.push(inverse_speed_sum)
+        tick_counts.clear()
+
+    def _selected(self, lane):
+        return self.lanes.values() if lane is None else (self.lanes[lane],)
+
+    def crossings(self, lane=None):
+        """Crossings within the window (all lanes, or one lane)."""
+        return sum(lane_counts.crossings.total for lane_counts in self._selected(lane))
+
+    def total_crossings(self, lane=None):
+        return sum(lane_counts.total_crossings for lane_counts in self._selected(lane))
+
+    def flow_per_hour(self, tick_seconds, lane=None):
+        """Vehicles per hour over the window."""
+        window_ticks = next(iter(self.lanes.values())).crossings.filled if self.lanes else 0
+        return self.crossings(lane) * 3600.0 / (window_ticks * tick_seconds) if window_ticks else 0.0
+
+    def time_mean_speed(self, lane=None):
+        """Arithmetic mean speed (km/h) of the vehicles that crossed within the window."""
+        count = self.crossings(lane)
+        return sum(lane_counts.speed_sums.total for lane_counts in self._selected(lane)) / count if count else 0.0
+
+    def space_mean_speed(self, lane=None):
+        """Harmonic mean speed (km/h) of the crossings: the speed that relates flow and density."""
+        inverse_speed_sum = sum(lane_counts.inverse_speed_sums.total for lane_counts in self._selected(lane))
+        return self.crossings(lane) / inverse_speed_sum if inverse_speed_sum > 0 else 0.0
+
+
+class TrafficDetectors:
+    """
+    Loop detectors (crossings, flow, time and space mean speeds per lane) and per-segment
+    rolling densities of one road. Road.advance_simulation_step calls before_step() and
+    after_step() every tick once attached with Road.attach_detectors().
+    """
+    def __init__(self, road_length_m, lane_count, detector_positions=None, segment_length_m=SEGMENT_LENGTH_M,
+                 window_ticks=WINDOW_TICKS):
+        if detector_positions is None:
+            detector_positions = range(DETECTOR_SPACING_M, int(road_length_m), DETECTOR_SPACING_M)
+        self.road_length_m = float(road_length_m)
+        self.lane_count = int(lane_count)
+        self.window_ticks = int(window_ticks)
+        self.detectors = [LoopDetector(position_m, lane_count, window_ticks) for position_m in sorted(detector_positions)]
+        self.segment_count = max(1, math.ceil(road_length_m / segment_length_m))
+        self.segment_length_m = self.road_length_m / self.segment_count
+        self.segment_counts = [RingBuffer(window_ticks) for _ in range(self.segment_count)]
+        self.tick = 0
+        self.tick_seconds = 0.0
+        self._candidates = [] # (detector, vehicle, vehicle_number) that may cross a detector this tick
+
+    @classmethod
+    def for_road(cls, road, **options):
+        return cls(road.length_meters, road.lane_count, **options)
+
+    def before_step(self, road, time_step_seconds):
+        """Notes the vehicles that can reach a detector during the tick and samples segment counts."""
+        self.tick_seconds = time_step_seconds
+        lane_index = road.lane_index
+        reach_m = MAX_AI_SPEED_KMH * time_step_seconds / 3.6
+        candidates = self._candidates
+        candidates.clear() # Left over if the last tick ended the run before after_step()
+        for detector in self.detectors:
+            for vehicle in lane_index.in_range(detector.position_m - reach_m, detector.position_m):
+                candidates.append((detector, vehicle, vehicle.vehicle_number))
+        counts = lane_index.counts_in_bins(0.0, self.road_length_m, self.segment_count)
+        for segment_counts, count in zip(self.segment_counts, counts):
+            segment_counts.push(count)
+
+    def after_step(self, road):
+        """Records the noted vehicles that crossed their detector and are still on the road (not collided or reused)."""
+        get_vehicle = road.vehicle_store.get
+        for detector, vehicle, vehicle_number in self._candidates:
+            if vehicle.position >= detector.position_m and get_vehicle(vehicle_number) is vehicle:
+                detector.record_crossing(vehicle.lane, vehicle.speed)
+        self._candidates.clear()
+        for detector in self.detectors:
+            detector.end_tick()
+        self.tick += 1
+
+    def segment_density(self, segment):
+        """Mean vehicles per km and lane in segment over the window."""
+        return self.segment_counts[segment].mean() / (self.segment_length_m / 1000.0) / self.lane_count
+
+    def to_dict(self):
+        return {
+            "tick": self.tick,
+            "window_ticks": self.window_ticks,
+            "detectors": [{
+                "position_m": detector.position_m,
+                "total_crossings": detector.total_crossings(),
+                "flow_veh_h": round(detector.flow_per_hour(self.tick_seconds), 1) if self.tick_seconds else 0.0,
+                "time_mean_speed_kmh": round(detector.time_mean_speed(), 2),
+                "space_mean_speed_kmh": round(detector.space_mean_speed(), 2),
+                "lanes": {str(lane): {"total_crossings": detector.total_crossings(lane),
+                                      "flow_veh_h": round(detector.flow_per_hour(self.tick_seconds, lane), 1) if self.tick_seconds else 0.0,
+                                      "time_mean_speed_kmh": round(detector.time_mean_speed(lane), 2),
+                                      "space_mean_speed_kmh": round(detector.space_mean_speed(lane), 2)}
+                          for lane in detector.lanes},
+            } for detector in self.detectors],
+            "segments": [{"start_m": round(segment * self.segment_length_m, 1),
+                          "density_veh_km_lane": round(self.segment_density(segment), 3)}
+                         for segment in range(self.segment_count)],
+        }
+
+    def to_prometheus(self, metric_prefix="kitt"):
+        """Prometheus text exposition: detector counters and gauges per lane, density per segment."""
+        name = f"{metric_prefix}_detector"
+        lines = [f"# HELP {name}_crossings_total AI vehicles that crossed the detector.",
+                 f"# TYPE {name}_crossings_total counter"]
+        for detector in self.detectors:
+            for lane in detector.lanes:
+                lines.append(f'{name}_crossings_total{{position_m="{detector.position_m:g}",lane="{lane}"}} {detector.total_crossings(lane)}')
+        for metric, help_text, value in (
+                ("flow_vehicles_per_hour", "Flow over the rolling window.", lambda detector, lane: detector.flow_per_hour(self.tick_seconds, lane) if self.tick_seconds else 0.0),
+                ("time_mean_speed_kmh", "Arithmetic mean speed of crossings in the window.", LoopDetector.time_mean_speed),
+                ("space_mean_speed_kmh", "Harmonic mean speed of crossings in the window.", LoopDetector.space_mean_speed)):
+            lines.append(f"# HELP {name}_{metric} {help_text}")
+            lines.append(f"# TYPE {name}_{metric} gauge")
+            for detector in self.detectors:
+                for lane in detector.lanes:
+                    lines.append(f'{name}_{metric}{{position_m="{detector.position_m:g}",lane="{lane}"}} {value(detector, lane):.6g}')
+        density_name = f"{metric_prefix}_segment_density_vehicles_per_km_lane"
+        lines.append(f"# HELP {density_name} Mean AI vehicle density of the road segment over the rolling window.")
+        lines.append(f"# TYPE {density_name} gauge")
+        for segment in range(self.segment_count):
+            lines.append(f'{density_name}{{start_m="{segment * self.segment_length_m:g}"}} {self.segment_density(segment):.6g}')
+        return "\n".join(lines) + "\n"
+
+    def report_lines(self):
+        """Human readable table of the detectors."""
+        lines = [f"{'Detector':<10}{'crossings':>10}{'veh/h':>9}{'mean km/h':>11}{'harm. km/h':>11}"]
+        for detector in self.detectors:
+            flow = detector.flow_per_hour(self.tick_seconds) if self.tick_seconds else 0.0
+            lines.append(f"{detector.position_m:>8.0f}m{detector.total_crossings():>11}{flow:>9.0f}"
+                         f"{detector.time_mean_speed():>11.1f}{detector.space_mean_speed():>11.1f}")
+        return lines
+
+
+def attach_traffic_detectors(road, profiler=None, **options):
+    """New TrafficDetectors on road; with a PhaseProfiler they are also written by its metrics export."""
+    detectors = TrafficDetectors.for_road(road, **options)
+    road.attach_detectors(detectors)
+    if profiler is not None:
+        profiler.exporters["traffic"] = detectors
+    return detectors
@@ -0,0 +1,153 @@
+# trajectory_analytics.py
+#
+# Common queries over the tables written by arrow_export.py (Parquet or Arrow IPC).
+# Large tables are read one row group / record batch at a time and only the needed
+# columns, and every query works on whole column arrays (numpy), so memory stays
+# bounded by the row group size however many runs were exported.
+#   python trajectory_analytics.py exports --hotspot-bin 100
+
+import os
+
+from arrow_export import FORMAT_EXTENSIONS, KIND_NAMES, ROW_GROUP_ROWS, np, pa, require_pyarrow
+
+SPEED_BIN_KMH = 5 # Speed histogram resolution (percentiles are bin upper bounds)
+MAX_SPEED_KMH = 500
+
+
+def export_format(directory):
+    """"parquet" or "arrow", from the files in an export directory."""
+    for file_format, extension in FORMAT_EXTENSIONS.items():
+        if os.path.exists(os.path.join(directory, "episodes" + extension)):
+            return file_format
+    raise FileNotFoundError(f"No exported tables in {directory} (see arrow_export.py)")
+
+
+def iter_batches(directory, table, columns):
+    """Yields record batches of the given columns of an exported table, at most ROW_GROUP_ROWS rows each."""
+    require_pyarrow()
+    file_format = export_format(directory)
+    path = os.path.join(directory, table + FORMAT_EXTENSIONS[file_format])
+    if file_format == "parquet":
+        yield from pa.parquet.ParquetFile(path).iter_batches(batch_size=ROW_GROUP_ROWS, columns=columns)
+    else:
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for batch_index in range(reader.num_record_batches):
+                yield reader.get_batch(batch_index).select(columns)
+
+
+def read_table(directory, table, columns=None):
+    """A small exported table (episodes, events) read whole."""
+    require_pyarrow()
+    file_format = export_format(directory)
+    path = os.path.join(directory, table + FORMAT_EXTENSIONS[file_format])
+    if file_format == "parquet":
+        return pa.parquet.read_table(path, columns=columns)
+    with pa.memory_map(path) as source:
+        arrow_table = pa.ipc.open_file(source).read_all()
+    return arrow_table.select(columns) if columns else arrow_table
+
+
+def _column(batch, name):
+    return batch.column(name).to_numpy(zero_copy_only=False)
+
+
+def collision_hotspots(directory, bin_m=100, top=10):
+    """[(bin start m, collisions)] of the road stretches with the most KITT collisions, over all runs."""
+    events = read_table(directory, "events", ["kind", "kitt_position_m"])
+    positions = events.filter(pa.compute.equal(events.column("kind"), "collision")).column("kitt_position_m").to_numpy()
+    if not len(positions):
+        return []
+    counts = np.bincount((np.maximum(positions, 0) // bin_m).astype(np.int64))
+    hot_bins = np.lexsort((np.arange(len(counts)), -counts))[:top] # Most collisions first, then nearest the start
+    return [(int(hot_bin) * bin_m, int(counts[hot_bin])) for hot_bin in hot_bins if counts[hot_bin] > 0]
+
+
+def speed_distribution_by_class(directory, bin_kmh=SPEED_BIN_KMH):
+    """
+    {class name: {"samples", "mean_kmh", "p10_kmh", "p50_kmh", "p90_kmh", "max_kmh"}} of AI vehicle
+    speeds (one sample per vehicle per tick), from histograms accumulated batch by batch.
+    """
+    bin_count = int(MAX_SPEED_KMH // bin_kmh) + 1
+    kind_count = max(KIND_NAMES) + 1
+    histogram = np.zeros(kind_count * bin_count, dtype=np.int64)
+    speed_sums = np.zeros(kind_count)
+    speed_maxima = np.zeros(kind_count)
+    for batch in iter_batches(directory, "vehicles", ["kind", "speed_kmh"]):
+        kinds = _column(batch, "kind").astype(np.int64)
+        speeds = _column(batch, "speed_kmh")
+        bins = np.minimum((np.maximum(speeds, 0) // bin_kmh).astype(np.int64), bin_count - 1)
+        histogram += np.bincount(kinds * bin_count + bins, minlength=len(histogram))
+        speed_sums += np.bincount(kinds, weights=speeds, minlength=kind_count)
+        np.maximum.at(speed_maxima, kinds, speeds)
+
+    distribution = {}
+    for kind, kind_histogram in enumerate(histogram.reshape(kind_count, bin_count)):
+        samples = int(kind_histogram.sum())
+        if not samples:
+            continue
+        cumulative = np.cumsum(kind_histogram)
+        percentile = lambda share: float((np.searchsorted(cumulative, share * samples) + 1) * bin_kmh)
+        distribution[KIND_NAMES.get(kind, str(kind))] = {
+            "samples": samples,
+            "mean_kmh": round(float(speed_sums[kind]) / samples, 2),
+            "p10_kmh": min(percentile(0.1), float(speed_maxima[kind])),
+            "p50_kmh": min(percentile(0.5), float(speed_maxima[kind])),
+            "p90_kmh": min(percentile(0.9), float(speed_maxima[kind])),
+            "max_kmh": round(float(speed_maxima[kind]), 2),
+        }
+    return distribution
+
+
+def time_to_goal(directory):
+    """Share of runs that reached the end of the road and their time to get there (s)."""
+    episodes = read_table(directory, "episodes", ["time_to_goal_s", "road_length_m"])
+    times = episodes.column("time_to_goal_s").drop_null().to_numpy()
+    summary = {"runs": episodes.num_rows, "reached_goal": len(times),
+               "reached_share": round(len(times) / episodes.num_rows, 4) if episodes.num_rows else 0.0}
+    if len(times):
+        summary.update({"mean_s": round(float(times.mean()), 2), "p50_s": round(float(np.percentile(times, 50)), 2),
+                        "p90_s": round(float(np.percentile(times, 90)), 2), "best_s": round(float(times.min()), 2)})
+    return summary
+
+
+def score_summary(directory):
+    """KITT's score, damage and collisions over all runs."""
+    episodes = read_table(directory, "episodes", ["final_score", "final_damage", "collisions", "distance_m"])
+    if not episodes.num_rows:
+        return {"runs": 0}
+    scores = episodes.column("final_score").to_numpy()
+    collisions = episodes.column("collisions").to_numpy()
+    distance_km = float(episodes.column("distance_m").to_numpy().sum()) / 1000.0
+    return {
+        "runs": episodes.num_rows,
+        "mean_score": round(float(scores.mean()), 2),
+        "best_score": int(scores.max()),
+        "mean_final_damage": round(float(episodes.column("final_damage").to_numpy().mean()), 2),
+        "collisions_per_km": round(float(collisions.sum()) / distance_km, 4) if distance_km > 0 else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Analyse runs exported with arrow_export.py.")
+    parser.add_argument("directory", help="Export directory")
+    parser.add_argument("--hotspot-bin", type=float, default=100, help="Road stretch length (m) of collision hotspots")
+    parser.add_argument("--top", type=int, default=10, help="Number of hotspots shown")
+    args = parser.parse_args()
+
+    print("--- RUNS ---")
+    for name, value in {**score_summary(args.directory), **time_to_goal(args.directory)}.items():
+        print(f"  {name:<18}: {value}")
+    print(f"\n--- COLLISION HOTSPOTS ({args.hotspot_bin:g} m) ---")
+    hotspots = collision_hotspots(args.directory, args.hotspot_bin, args.top)
+    for start_m, count in hotspots:
+        print(f"  {start_m:>8.0f} - {start_m + args.hotspot_bin:<8.0f} m: {count} collisions")
+    if not hotspots:
+        print("  No collisions")
+    print("\n--- AI SPEEDS BY CLASS (km/h) ---")
+    print(f"  {'Class':<12}{'samples':>10}{'mean':>8}{'p10':>7}{'p50':>7}{'p90':>7}{'max':>7}")
+    for class_name, stats in speed_distribution_by_class(args.directory).items():
+        print(f"  {class_name:<12}{stats['samples']:>10}{stats['mean_kmh']:>8.1f}{stats['p10_kmh']:>7.0f}"
+              f"{stats['p50_kmh']:>7.0f}{stats['p90_kmh']:>7.0f}{stats['max_kmh']:>7.1f}")
@@ -0,0 +1,115 @@
+# vehicle_store.py
+
+class VehicleStore:
+    """
+    Dense store of the AI vehicles on a road.
+    - remove() is O(1): the last vehicle is swapped into the freed slot.
+    - cull_outside() drops every vehicle outside a position range in one pass (order kept).
+    - Removed vehicles go to a per-class free list and are re-initialised by acquire(),
+      so spawn/despawn churn does not allocate new objects.
+    version changes whenever vehicles were added, removed or moved (see mark_moved), and
+    membership_version only when vehicles were added or removed; indexes use them to
+    rebuild lazily.
+    A vehicle keeps its vehicle_number for as long as it is on the road; a recycled object
+    gets a new number, so don't hold on to vehicle objects after they were removed.
+    """
+    def __init__(self, max_free_per_class=1024, free_vehicles=None):
+        self.vehicles = [] # Dense list, shared as Road.ai_vehicles (never rebound)
+        self._slot_by_number = {} # vehicle_number -> index in self.vehicles
+        # vehicle class -> retired objects ready for reuse (may be shared by the stores of a road network)
+        self._free_vehicles = free_vehicles if free_vehicles is not None else {}
+        self.max_free_per_class = int(max_free_per_class)
+        self.version = 0
+        self.membership_version = 0
+
+    def __len__(self):
+        return len(self.vehicles)
+
+    def __iter__(self):
+        return iter(self.vehicles)
+
+    def _membership_changed(self):
+        self.version += 1
+        self.membership_version += 1
+
+    def mark_moved(self, lanes_changed=False):
+        """Call after changing vehicle positions (Road.advance_simulation_step does) or lanes."""
+        self.version += 1
+        if lanes_changed:
+            self.membership_version += 1
+
+    def get(self, vehicle_number):
+        """Returns the vehicle with given number, or None if it is not on the road."""
+        slot = self._slot_by_number.get(vehicle_number)
+        return self.vehicles[slot] if slot is not None else None
+
+    def acquire(self, vehicle_class, vehicle_id, brand, model, max_speed, lane, position=0.0):
+        """Creates a vehicle (reusing a retired object when possible) and adds it to the store."""
+        free_vehicles = self._free_vehicles.get(vehicle_class)
+        if free_vehicles:
+            vehicle = free_vehicles.pop()
+            vehicle.__init__(vehicle_id, brand, model, max_speed, lane, position)
+        else:
+            vehicle = vehicle_class(vehicle_id, brand, model, max_speed, lane, position)
+        self.add(vehicle)
+        return vehicle
+
+    def add(self, vehicle):
+        self._slot_by_number[vehicle.vehicle_number] = len(self.vehicles)
+        self.vehicles.append(vehicle)
+        self._membership_changed()
+
+    def remove(self, vehicle):
+        """Removes a vehicle in O(1) (order of the remaining vehicles changes)."""
+        slot = self._slot_by_number.pop(vehicle.vehicle_number)
+        last_vehicle = self.vehicles.pop()
+        if last_vehicle is not vehicle:
+            self.vehicles[slot] = last_vehicle
+            self._slot_by_number[last_vehicle.vehicle_number] = slot
+        self._membership_changed()
+        self._retire(vehicle)
+
+    def cull_outside(self, min_position, max_position):
+        """
+        Removes all vehicles with position < min_position or >= max_position in one pass,
+        keeping the order of the remaining vehicles. Returns the number removed.
+        """
+        vehicles = self.vehicles
+        kept = [vehicle for vehicle in vehicles if min_position <= vehicle.position < max_position]
+        removed_count = len(vehicles) - len(kept)
+        if removed_count:
+            for vehicle in vehicles:
+                if not (min_position <= vehicle.position < max_position):
+                    self._retire(vehicle)
+            vehicles[:] = kept
+            self._slot_by_number = {vehicle.vehicle_number: slot for slot, vehicle in enumerate(kept)}
+            self._membership_changed()
+        return removed_count
+
+    def take_from(self, position):
+        """
+        Removes and returns all vehicles at or beyond position (order kept). They are not
+        recycled, since they continue on another road.
+        """
+        vehicles = self.vehicles
+        taken = [vehicle for vehicle in vehicles if vehicle.position >= position]
+        if taken:
+            vehicles[:] = [vehicle for vehicle in vehicles if vehicle.position < position]
+            self._slot_by_number = {vehicle.vehicle_number: slot for slot, vehicle in enumerate(vehicles)}
+            self._membership_changed()
+        return taken
+
+    def recycle(self, vehicle):
+        """Adds a vehicle that is no longer on any road to the free list."""
+        self._retire(vehicle)
+
+    def clear(self):
+        """Removes all vehicles (they are not recycled)."""
+        self.vehicles.clear()
+        self._slot_by_number.clear()
+        self._membership_changed()
+
+    def _retire(self, vehicle):
+        free_vehicles = self._free_vehicles.setdefault(type(vehicle), [])
+        if len(free_vehicles) < self.max_free_per_class:
+            free_vehicles.append(vehicle)
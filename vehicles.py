@@ -1,22 +1,64 @@
+import math
 import random
+import sys
 import time
 
+from autopilot_planner import AutopilotPlanner
+
 # If you have a separate drift_module.py file and KITT will use it:
 # import drift_module # Example import
 
+# Shared (brand, model) table. Vehicles keep an index into it instead of their own strings.
+VEHICLE_MODEL_TABLE = []
+_VEHICLE_MODEL_INDEX = {}
+
+def intern_vehicle_model(brand, model):
+    """Returns the VEHICLE_MODEL_TABLE index of (brand, model), adding it on first use."""
+    key = (brand, model)
+    model_index = _VEHICLE_MODEL_INDEX.get(key)
+    if model_index is None:
+        model_index = _VEHICLE_MODEL_INDEX[key] = len(VEHICLE_MODEL_TABLE)
+        VEHICLE_MODEL_TABLE.append((sys.intern(brand), sys.intern(model)))
+    return model_index
+
+AI_VEHICLE_ID_PREFIX = "ai_vehicle"
+
+def format_vehicle_id(vehicle_number):
+    """Display id of a vehicle: integer numbers get the AI prefix, names (e.g. "KITT") are kept."""
+    if isinstance(vehicle_number, int):
+        return f"{AI_VEHICLE_ID_PREFIX}{vehicle_number}"
+    return vehicle_number
+
 class Vehicle:
     """
     Base class for all vehicles in the simulation.
+    Slotted to keep per-vehicle memory small on busy roads: brand/model live in
+    VEHICLE_MODEL_TABLE and the display id is formatted from vehicle_number on demand.
     """
-    def __init__(self, vehicle_id, brand, model, max_speed, lane, position=0.0, vehicle_symbol="[A]"):
-        self.vehicle_id = vehicle_id
-        self.brand = brand
-        self.model = model
+    __slots__ = ("vehicle_number", "model_index", "max_speed", "speed", "lane", "position")
+
+    kind_code = 0 # Compact vehicle type code (used by the trajectory recorder)
+    vehicle_symbol = "[A]" # Symbol for text-based display
+
+    def __init__(self, vehicle_id, brand, model, max_speed, lane, position=0.0):
+        self.vehicle_number = vehicle_id # Integer for AI vehicles, or a name
+        self.model_index = intern_vehicle_model(brand, model)
         self.max_speed = float(max_speed) # Maximum speed (km/h)
         self.speed = float(random.randint(int(self.max_speed * 0.3), int(self.max_speed * 0.7))) # Current speed (km/h)
         self.lane = int(lane) # Lane number
         self.position = float(position) # Position on road (meters)
-        self.vehicle_symbol = vehicle_symbol # Symbol for text-based display
+
+    @property
+    def vehicle_id(self):
+        return format_vehicle_id(self.vehicle_number)
+
+    @property
+    def brand(self):
+        return VEHICLE_MODEL_TABLE[self.model_index][0]
+
+    @property
+    def model(self):
+        return VEHICLE_MODEL_TABLE[self.model_index][1]
 
     def accelerate(self, increase_kmh):
         self.speed = min(self.speed + float(increase_kmh), self.max_speed)
@@ -46,24 +88,37 @@ class Vehicle:
 
 # --- Other Vehicle Types ---
 class Car(Vehicle):
-    def __init__(self, vehicle_id, brand, model, max_speed, lane, position=0.0):
-        super().__init__(vehicle_id, brand, model, max_speed, lane, position, vehicle_symbol="o-o")
+    __slots__ = ()
+    kind_code = 1
+    vehicle_symbol = "o-o"
 
 class Truck(Vehicle):
-    def __init__(self, vehicle_id, brand, model, max_speed, lane, position=0.0):
-        super().__init__(vehicle_id, brand, model, max_speed, lane, position, vehicle_symbol="[T]")
+    __slots__ = ()
+    kind_code = 2
+    vehicle_symbol = "[T]"
 
 class Motorcycle(Vehicle):
-    def __init__(self, vehicle_id, brand, model, max_speed, lane, position=0.0):
-        super().__init__(vehicle_id, brand, model, max_speed, lane, position, vehicle_symbol="-M-")
+    __slots__ = ()
+    kind_code = 3
+    vehicle_symbol = "-M-"
 
 # --- KITT Class ---
-from music_player import MusicPlayer # Import MusicPlayer class
+from events import (simulation_events, ShieldAbsorbed, ShieldDepleted, DamageTaken, CriticalDamage,
+                    TurboStarted, TurboEnded, TurboNotReady, AutopilotManeuver, DriftResult)
+
+try:
+    from music_player import MusicPlayer # Import MusicPlayer class
+except ImportError as music_import_error: # pygame not installed, music features disabled
+    MusicPlayer = None
+    MUSIC_IMPORT_ERROR = music_import_error
 
 class KITT(Car):
-    def __init__(self, vehicle_id="KITT", brand="Knight Ind.", model="Industries 2000", max_speed=320, lane=1, position=0.0):
+    vehicle_symbol = ">K<"
+    autopilot_planner = None # Snapshots restore KITT without __init__
+    events = simulation_events # Event bus for collisions, turbo, shield, drift... (Road.add_kitt_reference shares the road's)
+
+    def __init__(self, vehicle_id="KITT", brand="Knight Ind.", model="Industries 2000", max_speed=320, lane=1, position=0.0, enable_music=True):
         super().__init__(vehicle_id, brand, model, max_speed, lane, position)
-        self.vehicle_symbol = ">K<"
         
         self.score = 0
         self.damage = 0 
@@ -82,15 +137,20 @@ class KITT(Car):
         self.autopilot_active = False
         self.autopilot_target_speed = 80.0
         self.autopilot_target_lane = self.lane
+        self.autopilot_planner = None # AutopilotPlanner, created on first use
 
         self.drift_mode_active_temporary = False
 
-        # Initialize MusicPlayer object
-        try:
-            self.music_player = MusicPlayer()
-        except Exception as e:
-            print(f"KITT WARNING: Music system could not be started: {e}. Music features disabled.")
-            self.music_player = None
+        # Initialize MusicPlayer object (headless runs pass enable_music=False)
+        self.music_player = None
+        if enable_music:
+            try:
+                if MusicPlayer is None:
+                    raise MUSIC_IMPORT_ERROR
+                self.music_player = MusicPlayer()
+            except Exception as e:
+                print(f"KITT WARNING: Music system could not be started: {e}. Music features disabled.")
+                self.music_player = None
         
         self.chatbot_message = None
         self.radar_max_range_m = 500 # Maximum radar range in meters
@@ -111,11 +171,11 @@ class KITT(Car):
             self.shield_power -= absorbed_damage
             remaining_damage = damage_amount - absorbed_damage
             
-            print(f"KITT: Shield absorbed {absorbed_damage:.0f} damage! Shield Power: {self.shield_power:.0f}%")
+            self.events.publish(ShieldAbsorbed, absorbed_damage, self.shield_power)
             
             if self.shield_power <= 0:
                 self.shield_active = False
-                print("KITT: Shield power depleted! Shield disabled!")
+                self.events.publish(ShieldDepleted)
             
             if remaining_damage > 0:
                 damage_taken = remaining_damage
@@ -125,24 +185,24 @@ class KITT(Car):
         if damage_taken > 0:
             self.damage += damage_taken
             self.damage = min(self.damage, 100)
-            print(f"KITT: {damage_taken:.0f} damage taken! Total Damage: {self.damage:.0f}%")
+            self.events.publish(DamageTaken, damage_taken, self.damage)
         
         if self.damage >= 100:
-            print("KITT: Critical damage! Systems in danger!")
+            self.events.publish(CriticalDamage, self.damage)
         
         return self.damage >= 100
 
     def activate_turbo_boost(self):
         if self.turbo_cooldown_steps > 0:
-            print(f"KITT: Turbo Boost not ready yet! Remaining time: {self.turbo_cooldown_steps} steps.")
+            self.events.publish(TurboNotReady, self.turbo_cooldown_steps)
             return False
         
         if not self.turbo_active:
-            print("KITT: TURBO BOOST ACTIVE!!!")
             self.turbo_active = True
             self.max_speed = self.normal_max_speed + self.turbo_speed_increase
             self.accelerate(self.turbo_speed_increase)
             self.speed = min(self.speed, self.max_speed)
+            self.events.publish(TurboStarted, self.speed)
             self.turbo_remaining_steps = self.turbo_duration_steps
             self.score += 25
             return True
@@ -158,7 +218,7 @@ class KITT(Car):
                 self.turbo_active = False
                 self.max_speed = self.normal_max_speed
                 self.speed = min(self.speed, self.normal_max_speed + 20)
-                print("KITT: Turbo Boost ended.")
+                self.events.publish(TurboEnded, self.speed)
                 self.turbo_cooldown_steps = self.turbo_cooldown_duration
 
     def toggle_autopilot(self):
@@ -173,49 +233,44 @@ class KITT(Car):
         return self.autopilot_active
 
     def run_autopilot_logic(self, road_object):
+        """Applies the action the predictive planner (autopilot_planner.py) picks for this tick."""
         if not self.autopilot_active:
             return
 
-        if abs(self.speed - self.autopilot_target_speed) > 5:
-            if self.speed < self.autopilot_target_speed:
-                self.accelerate(5)
-            else:
-                self.brake(5)
-        
-        risk, front_vehicle = road_object.calculate_crash_risk()
-        
-        if front_vehicle and (front_vehicle.position - self.position) < (self.speed / 3.6 * 4):
-            print("KITT (Autopilot): Slow vehicle detected ahead.")
-            lane_changed = False
-            if self.lane > 1 and self._autopilot_is_lane_safe(self.lane - 1, road_object):
-                self.change_lane(self.lane - 1, road_object.lane_count)
-                lane_changed = True
-            elif self.lane < road_object.lane_count and self._autopilot_is_lane_safe(self.lane + 1, road_object):
-                self.change_lane(self.lane + 1, road_object.lane_count)
-                lane_changed = True
-            
-            if not lane_changed:
-                self.autopilot_target_speed = max(30, front_vehicle.speed - 10)
-                self.brake(10)
-        elif not front_vehicle and self.speed < self.normal_max_speed - 30:
-             self.autopilot_target_speed = self.normal_max_speed - 30
-
-    def _autopilot_is_lane_safe(self, target_lane, road_object):
-        for vehicle in road_object.vehicles:
-            if vehicle.lane == target_lane and abs(vehicle.position - self.position) < 75:
-                return False
-        return True
+        if self.autopilot_planner is None:
+            self.autopilot_planner = AutopilotPlanner()
+        previous_action = self.autopilot_planner.last_action
+        action = self.autopilot_planner.plan(self, road_object)
+
+        if previous_action is None or previous_action.name != action.name:
+            self.events.publish(AutopilotManeuver, action.name, action.lane, action.safe)
+        if action.lane != self.lane:
+            self.change_lane(action.lane, road_object.lane_count)
+        if action.use_turbo:
+            self.activate_turbo_boost()
+        else:
+            speed_before = self.speed
+            profile_speed = self.autopilot_planner.speed_profile(self, action, self.autopilot_target_speed)[0]
+            if profile_speed > speed_before:
+                self.accelerate(profile_speed - speed_before)
+            elif profile_speed < speed_before:
+                self.brake(speed_before - profile_speed)
+
+        if self.speed < self.normal_max_speed - 30 and self.autopilot_target_speed < self.normal_max_speed - 30 \
+                and self.autopilot_planner.clear_ahead(self, road_object):
+            self.autopilot_target_speed = self.normal_max_speed - 30
 
     def speak(self, message="Analyzing..."):
         """
         KITT's AI-powered speech function.
         Takes user's message and responds through AI module.
         """
-        from AI import client, kitt_config, conversation_history # Import AI module and conversation_history
+        from AI import client, kitt_config, conversation_history, trim_conversation_history # Import AI module and conversation_history
         
         try:
             # 1. Add user's message to global history in AI module
             conversation_history.append({"role": "user", "parts": [{"text": message}]})
+            trim_conversation_history(conversation_history)
             
             response = client.models.generate_content(
                 model="gemini-2.0-flash", 
@@ -265,26 +320,18 @@ class KITT(Car):
             # Or decisions can be made here based on score ranges.
             # For example, let's give KITT-specific messages based on scoring in drift.py.
             if score >= 300: # Example threshold, can be adjusted based on "Perfect" x turn count in drift.py
-                print("KITT: Perfect drift Michael! Like a true master!")
-                self.score += 75 # Higher score
-                self.drift_mode_active_temporary = True # Main loop can set this to false
-                return True
+                points = 75 # Higher score
             elif score >= 150: # Example "Good" threshold
-                print("KITT: Good attempt Michael, you're improving!")
-                self.score += 40
-                self.drift_mode_active_temporary = True
-                return True
+                points = 40
             elif score > 0 : # At least positive score
-                print("KITT: Not bad Michael, keep practicing.")
-                self.score += 15
-                self.drift_mode_active_temporary = True # Drift was attempted.
-                return True
+                points = 15
             else: # Failed or negative score
-                print("KITT: Didn't work this time Michael, but don't worry, we can try again.")
                 # Can reduce score for failed drift or keep it same.
-                # self.score -= 10 
-                self.drift_mode_active_temporary = False
-                return False
+                points = 0
+            self.events.publish(DriftResult, score, points) # Message depends on the score range (see events.py)
+            self.score += points
+            self.drift_mode_active_temporary = points > 0 # Main loop can set this to false
+            return points > 0
                 
         except ImportError:
             print("KITT: Drift module (drift.py) not found Michael.")
@@ -306,18 +353,24 @@ class KITT(Car):
         else:
             print("KITT: Sorry Michael, there seems to be a problem with our music system.")
 
-    def radar_scan(self, road_object):
+    def radar_contacts(self, road_object):
         """
-        Scans surrounding AI vehicles and reports information to KITT.
-        Only shows vehicles within certain range in front and behind KITT.
+        AI vehicles within radar range in front of and behind KITT, nearest first.
+        Each contact is a dict with id, model, distance_m, direction, lane and speed_kmh
+        (plus the vehicle itself), or None if the road can't be scanned.
         """
         if not road_object or not hasattr(road_object, 'ai_vehicles'):
-            print("KITT: Radar system cannot access road information Michael.")
-            return
+            return None
+
+        range_start_m = self.position - self.radar_max_range_m
+        range_end_m = self.position + self.radar_max_range_m
+        if hasattr(road_object, 'lane_index'): # Only look at vehicles in range
+            candidates = road_object.lane_index.in_range(range_start_m, math.nextafter(range_end_m, math.inf))
+        else:
+            candidates = road_object.ai_vehicles
 
-        print(f"KITT: Starting radar scan... (Range: {self.radar_max_range_m}m)")
         nearby_vehicles = []
-        for ai_vehicle in road_object.ai_vehicles:
+        for ai_vehicle in candidates:
             if ai_vehicle == self: # Don't scan itself
                 continue
 
@@ -331,14 +384,26 @@ class KITT(Car):
                     "distance_m": abs(distance),
                     "direction": direction,
                     "lane": ai_vehicle.lane,
-                    "speed_kmh": ai_vehicle.speed
+                    "speed_kmh": ai_vehicle.speed,
+                    "vehicle": ai_vehicle,
                 })
-        
-        if not nearby_vehicles:
-            print("KITT: Radar scan complete. No other vehicles detected in vicinity Michael.")
+        nearby_vehicles.sort(key=lambda x: x["distance_m"])
+        return nearby_vehicles
+
+    def radar_scan(self, road_object):
+        """
+        Scans surrounding AI vehicles and reports information to KITT.
+        Only shows vehicles within certain range in front and behind KITT.
+        """
+        sorted_nearby_vehicles = self.radar_contacts(road_object)
+        if sorted_nearby_vehicles is None:
+            print("KITT: Radar system cannot access road information Michael.")
             return
 
-        sorted_nearby_vehicles = sorted(nearby_vehicles, key=lambda x: x["distance_m"])
+        print(f"KITT: Starting radar scan... (Range: {self.radar_max_range_m}m)")
+        if not sorted_nearby_vehicles:
+            print("KITT: Radar scan complete. No other vehicles detected in vicinity Michael.")
+            return
 
         print("\n--- KITT RADAR RESULTS ---")
         for vehicle_info in sorted_nearby_vehicles: